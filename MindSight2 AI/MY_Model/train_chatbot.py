@@ -16,6 +16,9 @@ def simple_preprocess(text):
     """Tokenize and convert to lowercase without lemmatization"""
     return ' '.join(tokenizer.tokenize(text.lower()))
 
+# Full retraining. To fold new patterns or intents into the published model
+# without retraining, use `python manage.py train_intents update` instead.
+
 # --- 1. Load and Preprocess Data ---
 print("Loading and preprocessing data...")
 
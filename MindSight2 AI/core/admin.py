@@ -1,6 +1,13 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, TextAnalysisSession, ImageReflectionTest, ChatMessage
+from django.db import connections
+from django.db.models.expressions import RawSQL
+from django.template.response import TemplateResponse
+from . import population
+from .admin_utils import LargeTableAdmin, UserAutocompleteFilter
+from .search import match_sql, supports_search
+from .models import (User, TextAnalysisSession, ImageReflectionTest, ChatMessage, ChatArchive, ConversationSession, Job,
+                     PopulationStat)
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
@@ -8,21 +15,75 @@ class CustomUserAdmin(UserAdmin):
     search_fields = ('username', 'email', 'first_name', 'last_name')
 
 @admin.register(ChatMessage)
-class ChatMessageAdmin(admin.ModelAdmin):
-    list_display = ('user', 'user_message_short', 'sentiment_score', 'risk_level', 'timestamp')
-    list_filter = ('timestamp', 'user')
+class ChatMessageAdmin(LargeTableAdmin):
+    list_display = ('user', 'user_message_short', 'sentiment_score', 'risk_level', 'analysis_tier', 'timestamp')
     search_fields = ('user_message', 'bot_response')
+    raw_id_fields = ('session',)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Match through the full-text index instead of ILIKE scans over search_fields"""
+        connection = connections[queryset.db]
+        if not search_term.strip() or not supports_search(connection):
+            return super().get_search_results(request, queryset, search_term)
+        match = match_sql(connection, search_term)
+        if match is None:
+            return queryset.none(), False
+        sql, params = match
+        return queryset.filter(pk__in=RawSQL(sql, params)), False
     
     def user_message_short(self, obj):
         return obj.user_message[:50] + '...' if len(obj.user_message) > 50 else obj.user_message
     user_message_short.short_description = 'Message'
 
+@admin.register(ConversationSession)
+class ConversationSessionAdmin(LargeTableAdmin):
+    list_display = ('user', 'started_at', 'last_message_at', 'message_count', 'risk_max', 'dominant_emotion')
+    list_filter = ('last_message_at', UserAutocompleteFilter)
+    readonly_fields = ('started_at', 'last_message_at', 'message_count', 'sentiment_sum', 'sentiment_min',
+                       'risk_max', 'dominant_emotion')
+
 @admin.register(TextAnalysisSession)
-class TextAnalysisSessionAdmin(admin.ModelAdmin):
+class TextAnalysisSessionAdmin(LargeTableAdmin):
     list_display = ('user', 'predicted_sentiment', 'confidence_score', 'timestamp')
-    list_filter = ('timestamp', 'user')
 
 @admin.register(ImageReflectionTest)
-class ImageReflectionTestAdmin(admin.ModelAdmin):
+class ImageReflectionTestAdmin(LargeTableAdmin):
     list_display = ('user', 'text_sentiment', 'timestamp')
-    list_filter = ('timestamp', 'user')
\ No newline at end of file
+
+@admin.register(ChatArchive)
+class ChatArchiveAdmin(admin.ModelAdmin):
+    list_display = ('month', 'row_count', 'size_bytes', 'path', 'created_at')
+    readonly_fields = ('month', 'path', 'row_count', 'size_bytes', 'created_at')
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'task', 'priority', 'status', 'attempts', 'run_at', 'started_at', 'finished_at', 'worker')
+    list_filter = ('status', 'priority', 'task')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'worker', 'last_error')
+    show_full_result_count = False
+
+@admin.register(PopulationStat)
+class PopulationStatAdmin(admin.ModelAdmin):
+    """Population analytics page: merges the sketches of one window (at most a few dozen rows)"""
+    change_list_template = 'admin/core/population_analytics.html'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        window = request.GET.get('window', '7d')
+        if window not in population.WINDOWS:
+            window = '7d'
+        summary = population.summary(window)
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Population analytics',
+            'windows': list(population.WINDOWS),
+            'summary': summary,
+            'peak_hour_messages': max([row['messages'] for row in summary['by_hour']] + [1]),
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, self.change_list_template, context)
@@ -0,0 +1,243 @@
+"""
+Tiered chat message analysis with load shedding.
+
+Tiers run cheapest first, each refining the result of the one before:
+
+- keyword (``ChatMessage.TIER_KEYWORD``): the keyword helpers in views.py,
+  including the crisis-keyword risk check. Always runs, synchronously.
+- lexicon: sentiment from the compiled sentiment lexicon.
+- full: ``RiskAssessor`` (weighted keywords, urgency patterns, sentiment).
+
+The richer tiers share a per-request deadline (``ANALYSIS_BUDGET_MS``) and
+run on a small thread pool, so a slow analyzer cannot hold a request past it.
+A tier is skipped when its recent average duration does not fit in what is
+left of the budget, and the richest tier allowed at all drops as pressure
+rises: the 1-minute load average per CPU against ``ANALYSIS_MAX_LOAD``, and
+the analyses already in flight against ``ANALYSIS_WORKERS``. Overloaded
+workers keep answering and risk-checking every message with the keyword
+tier; the tier reached is stored on the message so
+``rescore_messages --below-tier 2`` can fill in the rest later.
+
+Richer tiers never lower the keyword tier's risk level.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from django.conf import settings
+
+from .models import ChatMessage
+from .ratelimit import analysis_slots
+
+logger = logging.getLogger(__name__)
+
+TIER_NAMES = dict(ChatMessage.TIER_CHOICES)
+
+# Weight of the newest sample in a tier's moving average duration
+COST_SMOOTHING = 0.2
+LOAD_CHECK_SECONDS = 1.0
+
+
+def risk_category(risk_level):
+    if risk_level >= 7:
+        return 'high'
+    elif risk_level >= 4:
+        return 'medium'
+    return 'low'
+
+
+def keyword_tier(text):
+    from .views import analyze_emotions_simple, analyze_sentiment_simple, assess_risk_simple
+
+    risk_data = assess_risk_simple(text)
+    return {
+        'sentiment_score': analyze_sentiment_simple(text),
+        'risk_level': risk_data['risk_level'],
+        'risk_category': risk_data['risk_category'],
+        'emotions': analyze_emotions_simple(text),
+        'tier': ChatMessage.TIER_KEYWORD,
+    }
+
+
+def lexicon_update(polarity, subjectivity):
+    if not polarity and not subjectivity:
+        return {}  # no lexicon words, keep the keyword score
+    return {'sentiment_score': round(max(-1.0, min(1.0, polarity)), 3)}
+
+
+def full_update(result, assessment):
+    risk_level = max(result['risk_level'], round(assessment['risk_level']))
+    return {'risk_level': risk_level, 'risk_category': risk_category(risk_level)}
+
+
+def lexicon_tier(text, result):
+    from .ml import sentiment_analyzer
+
+    return lexicon_update(*sentiment_analyzer.polarity_subjectivity(text))
+
+
+def full_tier(text, result):
+    from .ml import risk_assessor
+
+    return full_update(result, risk_assessor.assess_risk_level(text))
+
+
+# Tiers above the keyword tier: (tier, function returning updates to the result)
+RICHER_TIERS = (
+    (ChatMessage.TIER_LEXICON, lexicon_tier),
+    (ChatMessage.TIER_FULL, full_tier),
+)
+
+
+class LoadShedder:
+    """Per-process state behind tier selection: the tier pool, analyses in
+    flight, moving average tier durations and the cached load average"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool = None
+        self.in_flight = 0
+        self.costs = {}
+        self._load = 0.0
+        self._load_checked = 0.0
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=settings.ANALYSIS_WORKERS,
+                                                    thread_name_prefix='analysis')
+        return self._pool
+
+    def cpu_load(self):
+        """1-minute load average per CPU, re-read at most every LOAD_CHECK_SECONDS"""
+        now = time.monotonic()
+        if now - self._load_checked >= LOAD_CHECK_SECONDS:
+            try:
+                self._load = os.getloadavg()[0] / (os.cpu_count() or 1)
+            except (AttributeError, OSError):  # no load average on this platform
+                self._load = 0.0
+            self._load_checked = now
+        return self._load
+
+    def max_tier(self):
+        """Richest tier allowed at the current pressure"""
+        pressure = max(self.cpu_load() / settings.ANALYSIS_MAX_LOAD,
+                       self.in_flight / settings.ANALYSIS_WORKERS)
+        if pressure >= 1:
+            return ChatMessage.TIER_KEYWORD
+        if pressure >= 0.75:
+            return ChatMessage.TIER_LEXICON
+        return ChatMessage.TIER_FULL
+
+    def fits(self, tier, remaining):
+        """Whether the tier's average duration fits in ``remaining`` seconds.
+        A skipped tier's estimate decays so it gets retried once things calm down."""
+        with self._lock:
+            cost = self.costs.get(tier, 0.0)
+            if cost <= remaining:
+                return True
+            self.costs[tier] = cost * (1 - COST_SMOOTHING)
+            return False
+
+    def submit(self, tier, func, text, result):
+        with self._lock:
+            self.in_flight += 1
+        return self.pool.submit(self._run, tier, func, text, dict(result))
+
+    def _run(self, tier, func, text, result):
+        started = time.perf_counter()
+        try:
+            return func(text, result)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.in_flight -= 1
+                previous = self.costs.get(tier)
+                self.costs[tier] = elapsed if previous is None else previous + COST_SMOOTHING * (elapsed - previous)
+
+
+shedder = LoadShedder()
+
+
+def analyze_text(text):
+    """Analysis for the chat path: the keyword tier, then as many richer tiers
+    as load and the ANALYSIS_BUDGET_MS deadline allow.
+
+    Returns a dict with sentiment_score, risk_level, risk_category, emotions
+    and tier (the richest ChatMessage.TIER_* that finished). Text longer than
+    ANALYSIS_CHUNKED_CHARS goes through the chunked analyzer instead.
+
+    The richer tiers also need one of the ANALYSIS_MAX_CONCURRENT analysis
+    slots (see core/ratelimit.py). Without one, the analysis stops at the
+    keyword tier, like any other shed message, and is never refused.
+    """
+    deadline = time.monotonic() + settings.ANALYSIS_BUDGET_MS / 1000
+    max_tier = shedder.max_tier()
+    if len(text) > settings.ANALYSIS_CHUNKED_CHARS:
+        from .chunked_analysis import analyze_long_text
+        # The chunked analyzer interleaves the tiers, so it holds a slot throughout
+        admitted = admit_richer_tiers(max_tier, deadline)
+        try:
+            return analyze_long_text(text, max_tier=max_tier if admitted else ChatMessage.TIER_KEYWORD,
+                                     deadline=deadline)
+        finally:
+            if admitted:
+                analysis_slots.release()
+
+    result = keyword_tier(text)
+    if not admit_richer_tiers(max_tier, deadline):
+        return result
+    try:
+        return richer_tiers(text, result, max_tier, deadline)
+    finally:
+        analysis_slots.release()
+
+
+def admit_richer_tiers(max_tier, deadline):
+    """Take an analysis slot for the richer tiers; False sheds to the keyword tier"""
+    if max_tier <= ChatMessage.TIER_KEYWORD:
+        return False
+    if not analysis_slots.acquire(deadline):
+        logger.debug("Load shedding: no analysis slot free, keyword tier only")
+        return False
+    return True
+
+
+def richer_tiers(text, result, max_tier, deadline):
+    for tier, func in RICHER_TIERS:
+        if tier > max_tier:
+            logger.debug(f"Load shedding: analysis capped at the {TIER_NAMES[max_tier]} tier")
+            break
+        remaining = deadline - time.monotonic()
+        if not shedder.fits(tier, remaining):
+            break
+        future = shedder.submit(tier, func, text, result)
+        try:
+            update = future.result(timeout=remaining)
+        except FutureTimeout:
+            # The tier keeps running in its thread and counts as in flight until it ends
+            logger.warning(f"Analysis tier {TIER_NAMES[tier]} missed the {settings.ANALYSIS_BUDGET_MS:g} ms budget")
+            break
+        except Exception as e:
+            logger.error(f"Analysis tier {TIER_NAMES[tier]} failed: {e}")
+            break
+        result.update(update)
+        result['tier'] = tier
+    return result
+
+
+def analyze_text_full(text):
+    """Every tier inline, without deadline or shedding (batch re-analysis)"""
+    if len(text) > settings.ANALYSIS_CHUNKED_CHARS:
+        from .chunked_analysis import analyze_long_text
+        return analyze_long_text(text)
+
+    result = keyword_tier(text)
+    for tier, func in RICHER_TIERS:
+        result.update(func(text, result))
+        result['tier'] = tier
+    return result
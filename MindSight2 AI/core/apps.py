@@ -1,10 +1,21 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+
+def check_search_index(sender, using, **kwargs):
+    """A migration may have rebuilt the chat table and dropped the SQLite search triggers"""
+    from core.search import ensure_search_index
+    ensure_search_index(connections[using], force=True)
+
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
 
     def ready(self):
+        post_migrate.connect(check_search_index, sender=self)
+
         # COMMENT OUT signals during migration
         # import core.signals  # noqa
 
@@ -0,0 +1,133 @@
+"""
+Archive tier for chat messages.
+
+Months older than ``CHAT_HOT_MONTHS`` are written to one gzip-compressed
+NDJSON file per month under ``CHAT_ARCHIVE_DIR``, recorded in ``ChatArchive``
+and then removed from the hot table (see ``core.partitions.drop_month``).
+The helpers below read archived months back so exports and reports can still
+cover the full history.
+
+Dropping a month also refreshes what was derived from its rows: conversation
+sessions are recomputed from the messages left in the hot table, and the
+month's mood buckets are rebuilt from the archived rows, the complete record
+of that month from then on.
+"""
+import gzip
+import json
+import logging
+import os
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.utils.dateparse import parse_datetime
+
+from .conditional import mark_chat_changed
+from .conversations import refresh as refresh_sessions
+from .models import ChatArchive, ChatMessage
+from .partitions import drop_month, month_bounds, month_start
+from .timeseries import add_to_buckets, raw_point, replace_buckets
+
+logger = logging.getLogger(__name__)
+
+
+def archive_path(month):
+    return os.path.join(settings.CHAT_ARCHIVE_DIR, 'chat_messages', f'{month:%Y-%m}.ndjson.gz')
+
+
+def archive_month(month, using='default', chunk_size=5000):
+    """Write every message of ``month`` to its archive file, record it and drop
+    the month from the hot table. Returns the ChatArchive row."""
+    month = month_start(month)
+    start, end = month_bounds(month)
+    path = archive_path(month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    fields = [field.attname for field in ChatMessage._meta.concrete_fields]
+    queryset = (
+        ChatMessage.objects.using(using)
+        .filter(timestamp__gte=start, timestamp__lt=end)
+        .order_by('pk')
+        .values(*fields)
+    )
+
+    tmp_path = f'{path}.tmp'
+    row_count = 0
+    user_ids = set()
+    session_ids = set()
+    buckets = {}
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as file:
+        # Re-archiving a month (late rows) keeps what was archived before
+        if os.path.exists(path):
+            with gzip.open(path, 'rt', encoding='utf-8') as existing:
+                for line in existing:
+                    file.write(line)
+                    row_count += 1
+                    add_to_buckets(buckets, raw_point(parse_row(line)))
+        for row in queryset.iterator(chunk_size=chunk_size):
+            file.write(json.dumps(row, cls=DjangoJSONEncoder))
+            file.write('\n')
+            row_count += 1
+            user_ids.add(row['user_id'])
+            session_ids.add(row['session_id'])
+            add_to_buckets(buckets, raw_point(row))
+    os.replace(tmp_path, path)
+
+    with transaction.atomic(using=using):
+        archive, _ = ChatArchive.objects.using(using).update_or_create(
+            month=month,
+            defaults={'path': path, 'row_count': row_count, 'size_bytes': os.path.getsize(path)},
+        )
+        drop_month(connections[using], month)
+        refresh_sessions(session_ids)
+        replace_buckets(user_ids, start, end, buckets)
+        mark_chat_changed(user_ids, using=using)
+
+    logger.info(f"Archived {row_count} chat messages for {month:%Y-%m} to {path}")
+    return archive
+
+
+def parse_row(line):
+    """One archived message line as a dict with its timestamp parsed"""
+    row = json.loads(line)
+    row['timestamp'] = parse_datetime(row['timestamp'])
+    return row
+
+
+def iter_archived_messages(user_id=None, start=None, end=None):
+    """Yield archived messages as dicts (timestamps parsed), oldest month first.
+    Only archive files overlapping ``[start, end)`` are opened."""
+    archives = ChatArchive.objects.order_by('month')
+    if start is not None:
+        archives = archives.filter(month__gte=month_start(start))
+    if end is not None:
+        archives = archives.filter(month__lte=month_start(end))
+
+    for archive in archives:
+        if not os.path.exists(archive.path):
+            logger.warning(f"Missing chat archive file {archive.path}")
+            continue
+        with gzip.open(archive.path, 'rt', encoding='utf-8') as file:
+            for line in file:
+                row = parse_row(line)
+                if user_id is not None and row['user_id'] != user_id:
+                    continue
+                if start is not None and row['timestamp'] < start:
+                    continue
+                if end is not None and row['timestamp'] >= end:
+                    continue
+                yield row
+
+
+def iter_chat_history(user, start=None, end=None):
+    """Yield a user's full message history as dicts, archived months first and
+    then the hot table, in ascending time order."""
+    yield from iter_archived_messages(user_id=user.pk, start=start, end=end)
+
+    fields = [field.attname for field in ChatMessage._meta.concrete_fields]
+    queryset = ChatMessage.objects.filter(user=user).order_by('timestamp', 'pk')
+    if start is not None:
+        queryset = queryset.filter(timestamp__gte=start)
+    if end is not None:
+        queryset = queryset.filter(timestamp__lt=end)
+    yield from queryset.values(*fields).iterator()
@@ -0,0 +1,181 @@
+"""
+Incremental analysis of long messages such as pasted journal entries.
+
+``ChunkedAnalyzer`` reads text in chunks of at most ``CHUNK_CHARS``
+characters, cut at sentence ends (or whitespace) where possible, and keeps
+running aggregates instead of making full-text passes:
+
+- which sentiment, emotion and risk keywords have been seen. Keywords are
+  only tested for presence, so the keyword tier result is the same as for the
+  whole text;
+- ``RiskAssessor`` keyword occurrences (capped at 3 like the assessor),
+  urgency pattern matches, words, question and exclamation marks;
+- lexicon polarity and subjectivity sums with their assessment counts.
+
+A keyword can straddle a chunk boundary, so each chunk is searched together
+with the tail of the previous one (the longest keyword minus one character);
+occurrence counts subtract the matches already inside that tail. Urgency
+patterns such as ``cant ... cope`` only match within a chunk and a
+modifier or negation never carries over into the next chunk, so the richer
+tiers are close to, not identical with, the whole-text result.
+
+Memory and work per step are bounded by the chunk size. As soon as a
+top-weight crisis phrase is seen the analyzer stops and returns the high-risk
+result for what it has read (``complete`` is False). When the request
+deadline passes, the richer aggregates are dropped and the rest of the text
+gets the keyword tier only, which still covers all of it.
+"""
+import time
+
+from .analysis import full_update, keyword_tier, lexicon_update
+from .ml.lexicon import get_lexicon_scorer
+from .ml.risk_assessor import risk_keywords
+from .models import ChatMessage
+
+CHUNK_CHARS = 4096
+
+# Preferred cut points, best first; the cut is made after the separator
+CUT_SEPARATORS = ('\n', '. ', '! ', '? ', ' ')
+
+
+class ChunkedAnalyzer:
+    def __init__(self, max_tier=ChatMessage.TIER_FULL, deadline=None, chunk_chars=CHUNK_CHARS):
+        from .views import keyword_lexicons
+
+        lexicons = keyword_lexicons.get()
+        keywords = set(lexicons['positive']) | set(lexicons['negative'])
+        for _, words, _, _ in lexicons['emotions']:
+            keywords.update(words)
+        for words, _ in lexicons['risk']:
+            keywords.update(words)
+        top_weight = max(weight for _, weight in lexicons['risk'])
+        self.crisis_words = {word for words, weight in lexicons['risk'] if weight == top_weight for word in words}
+        self.pending = keywords
+        self.found = set()
+
+        self.max_tier = max_tier
+        self.deadline = deadline
+        self.chunk_chars = chunk_chars
+        self.buffer = ''
+        self.tail = ''
+        self.chars = 0
+        self.crisis = False
+
+        self.scorer = get_lexicon_scorer()
+        self.polarity_sum = self.subjectivity_sum = 0.0
+        self.assessments = 0
+
+        risk = risk_keywords.get()
+        self.risk_counts = dict.fromkeys(risk['keyword_weights'], 0)
+        self.urgency_patterns = [pattern for pattern, _ in risk['urgency_patterns']]
+        self.urgency_counts = [0] * len(self.urgency_patterns)
+        self.words = self.question_marks = self.exclamation_marks = 0
+
+        longest = max(len(keyword) for keyword in keywords | set(self.risk_counts))
+        self.overlap = longest - 1
+
+    def feed(self, piece):
+        """Analyze the complete chunks available after appending ``piece``"""
+        if self.crisis:
+            return
+        text = self.buffer + piece
+        start = 0
+        while len(text) - start > self.chunk_chars and not self.crisis:
+            end = self._cut(text, start)
+            self._process(text[start:end])
+            start = end
+        self.buffer = '' if self.crisis else text[start:]
+
+    def close(self):
+        """Analyze what is left and return the result"""
+        if self.buffer and not self.crisis:
+            self._process(self.buffer)
+        self.buffer = ''
+        return self.result()
+
+    def _cut(self, text, start):
+        end = start + self.chunk_chars
+        for separator in CUT_SEPARATORS:
+            index = text.rfind(separator, start + self.chunk_chars // 2, end)
+            if index >= 0:
+                return index + len(separator)
+        return end
+
+    def _process(self, chunk):
+        lower = chunk.lower()
+        tail = self.tail
+        search = tail + lower
+
+        found = {keyword for keyword in self.pending if keyword in search}
+        if found:
+            self.pending -= found
+            self.found |= found
+
+        if self.max_tier >= ChatMessage.TIER_LEXICON:
+            self._score_sentiment(chunk)
+        if self.max_tier >= ChatMessage.TIER_FULL:
+            for keyword, count in self.risk_counts.items():
+                if count < 3:
+                    self.risk_counts[keyword] = count + search.count(keyword) - tail.count(keyword)
+            for index, pattern in enumerate(self.urgency_patterns):
+                self.urgency_counts[index] += len(pattern.findall(search)) - len(pattern.findall(tail))
+            self.words += len(chunk.split())
+            self.question_marks += chunk.count('?')
+            self.exclamation_marks += chunk.count('!')
+
+        self.tail = search[-self.overlap:] if self.overlap else ''
+        self.chars += len(chunk)
+        if found & self.crisis_words:
+            self.crisis = True
+        if self.deadline is not None and self.max_tier > ChatMessage.TIER_KEYWORD \
+                and time.monotonic() > self.deadline:
+            # The richer aggregates would only cover a prefix from here on
+            self.max_tier = ChatMessage.TIER_KEYWORD
+
+    def _score_sentiment(self, chunk):
+        if self.scorer is not None:
+            polarity, subjectivity, counts = self.scorer.score_batch([chunk], with_counts=True)
+            count = int(counts[0])
+            self.polarity_sum += float(polarity[0]) * count
+            self.subjectivity_sum += float(subjectivity[0]) * count
+        else:
+            from .ml import sentiment_analyzer
+
+            polarity, subjectivity = sentiment_analyzer.polarity_subjectivity(chunk)
+            count = 1
+            self.polarity_sum += polarity
+            self.subjectivity_sum += subjectivity
+        self.assessments += count
+
+    def result(self):
+        """Same keys as ``analyze_text`` plus ``complete`` and ``chars_analyzed``"""
+        # The keyword helpers only test substring presence, so the found
+        # keywords on separate lines score exactly like the text they came from
+        result = keyword_tier('\n'.join(sorted(self.found)))
+        result['complete'] = not self.crisis
+        result['chars_analyzed'] = self.chars
+
+        if self.max_tier >= ChatMessage.TIER_LEXICON:
+            polarity = self.polarity_sum / self.assessments if self.assessments else 0.0
+            subjectivity = self.subjectivity_sum / self.assessments if self.assessments else 0.0
+            result.update(lexicon_update(polarity, subjectivity))
+            result['tier'] = ChatMessage.TIER_LEXICON
+        if self.max_tier >= ChatMessage.TIER_FULL:
+            from .ml import risk_assessor
+
+            assessment = risk_assessor.combine(
+                keyword_score=risk_assessor.keyword_score(self.risk_counts),
+                sentiment_score=polarity,
+                urgency_score=risk_assessor.urgency_score(self.urgency_counts),
+                text_score=risk_assessor.text_score(self.words, self.question_marks, self.exclamation_marks),
+                keywords_found=[keyword for keyword, count in self.risk_counts.items() if count],
+            )
+            result.update(full_update(result, assessment))
+            result['tier'] = ChatMessage.TIER_FULL
+        return result
+
+
+def analyze_long_text(text, max_tier=ChatMessage.TIER_FULL, deadline=None):
+    analyzer = ChunkedAnalyzer(max_tier=max_tier, deadline=deadline)
+    analyzer.feed(text)
+    return analyzer.close()
@@ -0,0 +1,73 @@
+"""
+Conditional GET for the per-user chart and metric endpoints.
+
+``User.chat_data_changed_at`` is stamped with ``mark_chat_changed`` in the same
+transaction as every insert, update or delete of the user's chat messages.
+Because of this, one primary-key read tells whether anything behind
+``/dashboard/data/`` or ``/reports/weekly/data/`` could have changed.
+``chat_data_condition`` turns that read into strong ETag and Last-Modified
+validators for Django's ``condition`` decorator. A request carrying the
+current validators gets a 304 without the view running a single aggregate.
+
+The payloads also depend on the calendar (the rolling week on the dashboard,
+the current week of the report). Each endpoint therefore passes the start of
+its period, and the period is mixed into both validators. An endpoint that
+scores messages with hot-swappable ML artifacts (see core/ml/artifacts.py)
+also passes those artifacts: their versions go into the ETag and their file
+times into Last-Modified, so publishing a new version invalidates the
+cached bodies.
+"""
+import hashlib
+from datetime import datetime, time, timezone as dt_timezone
+
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from .models import User
+
+# Bump when the JSON shape of the endpoints changes, so cached bodies are not revalidated
+DATA_FORMAT = 1
+
+
+def mark_chat_changed(user_ids, using='default'):
+    """Stamp the users whose chat messages were just written or deleted"""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if user_ids:
+        User.objects.using(using).filter(pk__in=user_ids).update(chat_data_changed_at=timezone.now())
+
+
+def chat_data_version(request):
+    """The user's change stamp, read once per request. It is read through the
+    router, so it comes from the same database as the data it validates."""
+    if not hasattr(request, '_chat_data_version'):
+        request._chat_data_version = (User.objects.filter(pk=request.user.pk)
+                                      .values_list('chat_data_changed_at', flat=True).first())
+    return request._chat_data_version
+
+
+def loaded(artifacts):
+    """The artifacts, each loaded so its version and mtime are set"""
+    for artifact in artifacts:
+        artifact.get()
+    return artifacts
+
+
+def chat_data_condition(name, period_start, artifacts=()):
+    """``condition`` validators for a per-user endpoint; ``period_start()``
+    returns the first date the payload covers and ``artifacts`` are the ML
+    artifacts the view computes it with"""
+    def last_modified(request, *args, **kwargs):
+        start = timezone.make_aware(datetime.combine(period_start(), time.min))
+        changed = chat_data_version(request)
+        published = [datetime.fromtimestamp(artifact.mtime / 1e9, tz=dt_timezone.utc)
+                     for artifact in loaded(artifacts)]
+        return max([start, *published] + ([changed] if changed else []))
+
+    def etag(request, *args, **kwargs):
+        changed = chat_data_version(request)
+        versions = ','.join(f'{artifact.name}@{artifact.version}' for artifact in loaded(artifacts))
+        key = (f"{DATA_FORMAT}:{name}:{request.user.pk}:{period_start()}:"
+               f"{changed.isoformat() if changed else '-'}:{versions}")
+        return hashlib.sha1(key.encode()).hexdigest()[:32]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
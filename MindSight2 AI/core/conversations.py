@@ -0,0 +1,157 @@
+"""
+Conversation sessions: each user's chat messages grouped by inactivity gap.
+
+A new message joins the user's latest session if it arrives within
+``CONVERSATION_GAP_MINUTES`` of that session's last message. Otherwise it
+starts a new session. The assignment happens when the message is written, in
+``ChatMessage.save`` and in the write-behind flush. The session's running
+aggregates are updated at the same time, in constant time. Views and
+response logic then read one row per session instead of replaying messages.
+
+Counts, sums, the minimum sentiment and the peak risk are only extended by
+new messages. Deleting or rescoring a message can invalidate them, so those
+paths call ``refresh``, which recomputes the affected sessions from their
+messages. ``manage.py build_sessions`` assigns sessions to messages written
+before sessions existed.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+
+from .models import ChatMessage, ConversationSession, EMOTIONS
+
+# Columns ``ConversationSession.add`` changes
+AGGREGATE_FIELDS = (['last_message_at', 'message_count', 'sentiment_sum', 'sentiment_min', 'risk_max',
+                     'dominant_emotion'] + [f'emotion_{name}' for name in EMOTIONS])
+
+
+def inactivity_gap():
+    return timedelta(minutes=settings.CONVERSATION_GAP_MINUTES)
+
+
+def assign_sessions(messages, now=None):
+    """Attach unsaved messages to their sessions and fold them into the
+    aggregates. Call inside the transaction that inserts the messages; the
+    messages need their emotion columns synced first. Whatever the number of
+    users, this is one locking read, one insert of the new sessions and one
+    update of the extended ones."""
+    now = now or timezone.now()
+    gap = inactivity_gap()
+    by_user = {}
+    for message in messages:
+        by_user.setdefault(message.user_id, []).append(message)
+    if not by_user:
+        return
+
+    # Only a session that ended within the gap before the earliest message can
+    # be joined, so older ones are neither read nor locked. Rows are locked in
+    # user order so concurrent flushes cannot deadlock.
+    earliest = min(message.timestamp or now for message in messages)
+    latest = {}
+    for session in (ConversationSession.objects.select_for_update()
+                    .filter(user_id__in=by_user, last_message_at__gte=earliest - gap)
+                    .order_by('user_id', 'last_message_at')):
+        latest[session.user_id] = session
+
+    created, extended = [], []
+    pairs = []
+    for user_id, user_messages in by_user.items():
+        session = latest.get(user_id)
+        for message in user_messages:
+            at = message.timestamp or now
+            if session is None or at - session.last_message_at > gap:
+                session = ConversationSession(user_id=user_id, started_at=at, last_message_at=at)
+                created.append(session)
+            elif session.pk is not None and (not extended or extended[-1] is not session):
+                extended.append(session)
+            session.add(message, at)
+            pairs.append((message, session))
+    ConversationSession.objects.bulk_create(created)
+    update_aggregates(extended)
+    for message, session in pairs:
+        message.session = session
+
+
+def update_aggregates(sessions):
+    """Write AGGREGATE_FIELDS of saved sessions as one parameterised UPDATE run
+    with executemany. bulk_update would build a CASE expression per field
+    over every row, which costs more CPU than the writes it saves."""
+    if not sessions:
+        return
+    connection = connections[router.db_for_write(ConversationSession)]
+    quote = connection.ops.quote_name
+    fields = [ConversationSession._meta.get_field(name) for name in AGGREGATE_FIELDS]
+    sql = (f"UPDATE {quote(ConversationSession._meta.db_table)} SET "
+           f"{', '.join(f'{quote(field.column)} = %s' for field in fields)} "
+           f"WHERE {quote(ConversationSession._meta.pk.column)} = %s")
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            [field.get_db_prep_save(getattr(session, field.attname), connection) for field in fields] + [session.pk]
+            for session in sessions
+        ])
+
+
+def refresh(session_ids):
+    """Recompute the aggregates of sessions from their messages (after deletes
+    or rescoring); sessions left without messages are deleted"""
+    session_ids = {session_id for session_id in session_ids if session_id is not None}
+    if not session_ids:
+        return
+    totals = {
+        row['session_id']: row
+        for row in ChatMessage.objects.filter(session_id__in=session_ids).order_by().values('session_id').annotate(
+            count=Count('id'), first=Min('timestamp'), last=Max('timestamp'), sentiment_sum=Sum('sentiment_score'),
+            sentiment_min=Min('sentiment_score'), risk_max=Max('risk_level'),
+            **{f'emotion_{name}': Sum(f'emotion_{name}') for name in EMOTIONS},
+        )
+    }
+    ConversationSession.objects.filter(pk__in=session_ids - set(totals)).delete()
+    for session in ConversationSession.objects.filter(pk__in=totals):
+        row = totals[session.pk]
+        session.started_at = row['first']
+        session.last_message_at = row['last']
+        session.message_count = row['count']
+        session.sentiment_sum = row['sentiment_sum'] or 0.0
+        session.sentiment_min = row['sentiment_min'] or 0.0
+        session.risk_max = row['risk_max'] or 0
+        for name in EMOTIONS:
+            setattr(session, f'emotion_{name}', row[f'emotion_{name}'] or 0.0)
+        session.update_dominant_emotion()
+        session.save()
+
+
+def build_for_user(user_id, batch_size=1000):
+    """Assign every message of a user that has no session yet, oldest first.
+    Returns ``(messages assigned, sessions created)``."""
+    pending = (ChatMessage.objects.filter(user_id=user_id, session__isnull=True)
+               .order_by('timestamp', 'id')
+               .only('id', 'user_id', 'timestamp', 'sentiment_score', 'risk_level',
+                     *[f'emotion_{name}' for name in EMOTIONS]))
+    gap = inactivity_gap()
+    session = None
+    assigned = created = 0
+    batch = []
+    for message in pending.iterator(chunk_size=batch_size):
+        if session is None or message.timestamp - session.last_message_at > gap:
+            if session is not None:
+                session.save()
+            session = ConversationSession(user_id=user_id, started_at=message.timestamp,
+                                          last_message_at=message.timestamp)
+            session.save()
+            created += 1
+        session.add(message, message.timestamp)
+        message.session_id = session.pk
+        batch.append(message)
+        if len(batch) >= batch_size:
+            ChatMessage.objects.bulk_update(batch, ['session'])
+            assigned += len(batch)
+            batch = []
+    if session is not None:
+        session.save()
+    if batch:
+        ChatMessage.objects.bulk_update(batch, ['session'])
+        assigned += len(batch)
+    return assigned, created
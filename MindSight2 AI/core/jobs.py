@@ -0,0 +1,218 @@
+"""
+Database-backed background job queue.
+
+Jobs are ``Job`` rows; no broker is needed. ``manage.py runworker`` runs
+threads (optionally in several processes) that claim the ready job with the
+lowest priority value, so risk escalation (``Job.CRITICAL``) always runs
+ahead of ordinary work (``DEFAULT``) and bulk jobs (``BATCH``).
+
+Claiming uses ``SELECT ... FOR UPDATE SKIP LOCKED`` on PostgreSQL, so
+concurrent workers never wait on each other's rows. Backends without it
+(SQLite) claim with a conditional ``UPDATE ... WHERE status = queued``
+instead, which only one worker can win.
+
+A failing job is retried with exponential backoff and jitter
+(``JOB_RETRY_BASE_SECONDS`` doubling up to ``JOB_RETRY_MAX_SECONDS``) until
+it has run ``max_attempts`` times, then marked failed. A job still running
+after ``JOB_STALE_SECONDS`` is assumed to have lost its worker and is put
+back in the queue. Jobs can run more than once, so tasks must be idempotent.
+
+Define tasks with ``@task`` in a module listed in ``TASK_MODULES`` and queue
+them with ``some_task.delay(*args, **kwargs)``; arguments must be JSON
+serializable.
+"""
+import importlib
+import logging
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import Job
+from .stats import percentile
+
+logger = logging.getLogger(__name__)
+
+# name -> Task, filled as task modules are imported
+registry = {}
+
+# Modules that define tasks; imported by discover() in the worker
+TASK_MODULES = (
+    'core.tasks',
+)
+
+LANES = dict(Job.PRIORITY_CHOICES)
+LANE_PRIORITIES = {name: priority for priority, name in Job.PRIORITY_CHOICES}
+
+# Ready jobs tried per claim on backends without SKIP LOCKED
+CLAIM_CANDIDATES = 5
+# Longest last_error kept on a job
+ERROR_CHARS = 4000
+
+
+class Task:
+    def __init__(self, func, name, priority, max_attempts):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+        registry[name] = self
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """Queue a run of this task; returns the Job"""
+        return enqueue(self.name, args, kwargs, priority=self.priority, max_attempts=self.max_attempts)
+
+
+def task(name=None, priority=Job.DEFAULT, max_attempts=5):
+    """Register a function as a job task"""
+    def register(func):
+        return Task(func, name or func.__name__, priority, max_attempts)
+    return register
+
+
+def discover():
+    """Import every task-defining module and return the registry"""
+    for module in TASK_MODULES:
+        importlib.import_module(module)
+    return registry
+
+
+def enqueue(name, args=(), kwargs=None, priority=Job.DEFAULT, run_at=None, max_attempts=5):
+    return Job.objects.create(
+        task=name,
+        args=list(args),
+        kwargs=kwargs or {},
+        priority=priority,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts,
+    )
+
+
+def worker_name(thread_index=0):
+    return f"{socket.gethostname()}:{os.getpid()}:{thread_index}"
+
+
+def claim(worker, priorities=None, using='default'):
+    """Mark the next ready job as running for ``worker`` and return it (or None)"""
+    now = timezone.now()
+    ready = Job.objects.using(using).filter(status=Job.QUEUED, run_at__lte=now)
+    if priorities:
+        ready = ready.filter(priority__in=priorities)
+    ready = ready.order_by('priority', 'run_at', 'id')
+    claimed = {'status': Job.RUNNING, 'started_at': now, 'worker': worker, 'attempts': F('attempts') + 1}
+
+    if connections[using].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=using):
+            job = ready.select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            Job.objects.using(using).filter(pk=job.pk).update(**claimed)
+    else:
+        # No row locks: the conditional update succeeds for exactly one worker
+        for job in ready[:CLAIM_CANDIDATES]:
+            if Job.objects.using(using).filter(pk=job.pk, status=Job.QUEUED).update(**claimed):
+                break
+        else:
+            return None
+    job.refresh_from_db(using=using)
+    return job
+
+
+def backoff(attempt):
+    """Delay before retry number ``attempt``: exponential with jitter"""
+    delay = min(settings.JOB_RETRY_MAX_SECONDS, settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def execute(job, using='default'):
+    """Run a claimed job and record the outcome; returns True on success"""
+    jobs = Job.objects.using(using).filter(pk=job.pk, status=Job.RUNNING, worker=job.worker)
+    try:
+        task = registry.get(job.task)
+        if task is None:
+            raise LookupError(f"Unknown task '{job.task}'")
+        task.func(*job.args, **job.kwargs)
+    except Exception as e:
+        now = timezone.now()
+        error = traceback.format_exc()[-ERROR_CHARS:]
+        if job.attempts < job.max_attempts:
+            retry_at = now + backoff(job.attempts)
+            jobs.update(status=Job.QUEUED, run_at=retry_at, worker='', last_error=error)
+            logger.warning(f"Job {job} attempt {job.attempts}/{job.max_attempts} failed, "
+                           f"retrying at {retry_at:%H:%M:%S}: {e}")
+        else:
+            jobs.update(status=Job.FAILED, finished_at=now, last_error=error)
+            logger.error(f"Job {job} failed after {job.attempts} attempts: {e}")
+        return False
+    jobs.update(status=Job.DONE, finished_at=timezone.now(), last_error='')
+    return True
+
+
+def requeue_stale(using='default', now=None):
+    """Return jobs whose worker stopped responding to the queue, or fail them
+    when they are out of attempts. Returns the number of jobs touched."""
+    now = now or timezone.now()
+    stale = Job.objects.using(using).filter(
+        status=Job.RUNNING, started_at__lt=now - timedelta(seconds=settings.JOB_STALE_SECONDS))
+    error = f"Still running after {settings.JOB_STALE_SECONDS}s; worker presumed lost"
+    requeued = stale.filter(attempts__lt=F('max_attempts')).update(
+        status=Job.QUEUED, run_at=now, worker='', last_error=error)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished_at=now, last_error=error)
+    if requeued or failed:
+        logger.warning(f"Stale jobs: {requeued} requeued, {failed} failed")
+    return requeued + failed
+
+
+def queue_stats(window=timedelta(hours=1), using='default', now=None, sample=10000):
+    """Queue depth per lane and wait/run latency of jobs finished in ``window``"""
+    now = now or timezone.now()
+    jobs = Job.objects.using(using)
+    lanes = {name: {'ready': 0, 'delayed': 0, 'running': 0, 'oldest_wait_seconds': 0.0}
+             for name in LANE_PRIORITIES}
+
+    for row in (jobs.filter(status=Job.QUEUED, run_at__lte=now)
+                .values('priority').annotate(count=Count('id'), oldest=Min('run_at'))):
+        lane = lanes[LANES[row['priority']]]
+        lane['ready'] = row['count']
+        lane['oldest_wait_seconds'] = round((now - row['oldest']).total_seconds(), 1)
+    for row in jobs.filter(status=Job.QUEUED, run_at__gt=now).values('priority').annotate(count=Count('id')):
+        lanes[LANES[row['priority']]]['delayed'] = row['count']
+    for row in jobs.filter(status=Job.RUNNING).values('priority').annotate(count=Count('id')):
+        lanes[LANES[row['priority']]]['running'] = row['count']
+
+    finished = (jobs.filter(status__in=[Job.DONE, Job.FAILED], finished_at__gte=now - window)
+                .order_by('-finished_at')
+                .values_list('status', 'run_at', 'started_at', 'finished_at')[:sample])
+    waits, runs, failed = [], [], 0
+    for status, run_at, started_at, finished_at in finished:
+        failed += status == Job.FAILED
+        if started_at:
+            waits.append((started_at - run_at).total_seconds())
+            runs.append((finished_at - started_at).total_seconds())
+    waits.sort()
+    runs.sort()
+
+    def summary(values):
+        if not values:
+            return None
+        return {'mean': round(sum(values) / len(values), 3), 'p50': round(percentile(values, 0.5), 3),
+                'p95': round(percentile(values, 0.95), 3), 'max': round(values[-1], 3)}
+
+    return {
+        'lanes': lanes,
+        'window_seconds': int(window.total_seconds()),
+        'finished': len(finished),
+        'failed': failed,
+        'wait_seconds': summary(waits),
+        'run_seconds': summary(runs),
+    }
@@ -0,0 +1,39 @@
+"""
+Deferred imports for heavy optional libraries (NLTK, TextBlob, TensorFlow,
+PyTorch, transformers...).
+
+``lazy_import('textblob')`` returns a placeholder that imports the real module
+on first attribute access, so importing ``core`` or running a management
+command never pays for libraries the code path does not use.
+"""
+import importlib
+import sys
+
+
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def is_loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self.is_loaded else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    """Return the module if it is already imported, otherwise a lazy placeholder"""
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
@@ -0,0 +1,83 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import ChatMessage, User
+from core.stats import percentile
+from core.traffic import filler_text
+from core.write_behind import WriteBehindBuffer
+
+BENCHMARK_USERNAME = 'benchmark_chat_writes'
+
+
+class Command(BaseCommand):
+    help = ("Compare direct ChatMessage inserts with the write-behind buffer under concurrent load: "
+            "commits per second and per-message latency until the row is committed")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000, help='Messages written per mode')
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent writers (request threads)')
+        parser.add_argument('--users', type=int, default=50, help='Distinct users the messages are spread over')
+        parser.add_argument('--batch', type=int, default=200, help='Write-behind batch size')
+        parser.add_argument('--delay-ms', type=float, default=5, help='Write-behind flush delay')
+
+    def handle(self, *args, **options):
+        if options['messages'] < 1 or options['threads'] < 1 or options['users'] < 1:
+            raise CommandError('--messages, --threads and --users must be positive')
+        self.stdout.write(self.style.WARNING("Writes benchmark rows to the database (removed afterwards); "
+                                             "use a scratch database for meaningful numbers."))
+        users = [User.objects.get_or_create(username=f'{BENCHMARK_USERNAME}_{index}')[0]
+                 for index in range(options['users'])]
+        try:
+            direct = self.run('direct', users, options, None)
+            buffer = WriteBehindBuffer(options['batch'], options['delay_ms'])
+            buffered = self.run('write-behind', users, options, buffer)
+            buffer.close()
+        finally:
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+        self.stdout.write(f"\n{'mode':13} {'msgs/s':>8} {'commits':>8} {'commits/s':>10} "
+                          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for report in (direct, buffered):
+            self.stdout.write(
+                f"{report['mode']:13} {report['throughput']:>8.0f} {report['commits']:>8} "
+                f"{report['commits_per_second']:>10.0f} {report['p50']:>8.2f} {report['p95']:>8.2f} "
+                f"{report['p99']:>8.2f} {report['errors']:>7}"
+            )
+
+    def run(self, mode, users, options, buffer):
+        def write(index):
+            message = ChatMessage(user=users[index % len(users)], user_message=filler_text(80, seed=index),
+                                  bot_response='Thank you for sharing.', sentiment_score=0.0,
+                                  risk_level=index % 4, emotions={'neutral': 1.0})
+            started = time.perf_counter()
+            try:
+                if buffer is None:
+                    message.save()  # the current path: ChatMessage.objects.create
+                else:
+                    buffer.submit(message).result()
+                ok = True
+            except Exception:
+                ok = False
+            return time.perf_counter() - started, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            results = list(pool.map(write, range(options['messages'])))
+        wall = time.perf_counter() - started
+
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        # Each direct write commits the message and its mood point separately;
+        # a write-behind flush commits one batch of each
+        commits = 2 * (options['messages'] if buffer is None else buffer.flushes)
+        return {
+            'mode': mode,
+            'throughput': len(results) / wall,
+            'commits': commits,
+            'commits_per_second': commits / wall,
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'errors': sum(1 for _, ok in results if not ok),
+        }
@@ -0,0 +1,140 @@
+import random
+import string
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.ml.chatbot import chatbot_responses
+from core.ml.retrieval import IntentIndex
+from core.stats import percentile
+
+TEMPLATES = ('{}', '{} today', 'honestly, {}', 'I just wanted to say {}', '{}, I guess')
+
+# Messages with no intent; several contain a pattern as a substring ("hi" in "this")
+OFF_TOPIC = (
+    'this is my first time here',
+    'which bus goes downtown',
+    'I think the shipping is delayed',
+    'what is the weather like',
+    'my cat is sleeping on the sofa',
+    'the train was late this morning',
+    'can you recommend a book',
+    'everything is the same as yesterday',
+    'I moved to a new apartment',
+    'what does this button do',
+)
+
+
+def substring_intent(patterns, message):
+    """The previous ChatbotInterface matcher: first pattern found as a substring or word"""
+    message = message.lower()
+    words = message.split()
+    for intent, intent_patterns in patterns.items():
+        for pattern in intent_patterns:
+            if pattern in message or pattern in words:
+                return intent
+    return 'default'
+
+
+def typo(text, rng):
+    """Swap two inner letters of the longest word"""
+    words = text.split()
+    longest = max(range(len(words)), key=lambda i: len(words[i]))
+    word = words[longest]
+    if len(word) < 5:
+        return None
+    i = rng.randrange(1, len(word) - 2)
+    words[longest] = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return ' '.join(words)
+
+
+def labelled_queries(patterns, seed):
+    rng = random.Random(seed)
+    queries = []
+    for intent, intent_patterns in patterns.items():
+        for pattern in intent_patterns:
+            for template in TEMPLATES:
+                queries.append((template.format(pattern), intent))
+            misspelt = typo(pattern, rng)
+            if misspelt:
+                queries.append((misspelt, intent))
+    queries.extend((text, 'default') for text in OFF_TOPIC)
+    return queries
+
+
+def synthetic_patterns(count, seed):
+    """``count`` random 1-6 word patterns over a 20 000 word vocabulary, 20 per intent.
+    Each intent draws from its own 40 topic words, so unseen patterns are still learnable."""
+    rng = random.Random(seed)
+    vocabulary = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(20000)]
+    table = {}
+    for i in range(count // 20):
+        topic = rng.sample(vocabulary, 40)
+        table[f'synthetic_{i}'] = [' '.join(rng.choices(topic, k=rng.randint(1, 6))) for _ in range(20)]
+    return table
+
+
+def time_queries(predict, queries, rounds):
+    latencies = []
+    for _ in range(rounds):
+        for text, _ in queries:
+            started = time.perf_counter()
+            predict(text)
+            latencies.append((time.perf_counter() - started) * 1e6)
+    latencies.sort()
+    return percentile(latencies, 0.50), percentile(latencies, 0.99)
+
+
+class Command(BaseCommand):
+    help = ("Compare intent retrieval (core/ml/retrieval.py) with the previous substring matcher: "
+            "accuracy on generated chat messages and lookup latency as the pattern table grows")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', default='1000,10000,50000',
+                            help='Comma-separated synthetic pattern counts for the latency runs')
+        parser.add_argument('--threshold', type=float, default=None,
+                            help='Confidence threshold (default INTENT_MIN_SCORE)')
+        parser.add_argument('--rounds', type=int, default=20, help='Timing rounds over the query set')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(value) for value in options['scale'].split(',') if value.strip()]
+        except ValueError:
+            raise CommandError('--scale must be comma-separated integers')
+        threshold = options['threshold'] if options['threshold'] is not None else settings.INTENT_MIN_SCORE
+        patterns = chatbot_responses.get()['patterns']
+        queries = labelled_queries(patterns, options['seed'])
+
+        index = IntentIndex((intent, p) for intent, intent_patterns in patterns.items() for p in intent_patterns)
+
+        def retrieve(text, index=index):
+            return index.predict(text, threshold)[0] or 'default'
+
+        self.stdout.write(f"{len(queries)} labelled messages ({len(OFF_TOPIC)} off-topic), "
+                          f"{len(index)} patterns, threshold {threshold}\n")
+        self.stdout.write(f"{'matcher':10} {'accuracy':>9} {'on-topic':>9} {'off-topic':>10}")
+        for name, predict in (('substring', lambda text: substring_intent(patterns, text)),
+                              ('retrieval', retrieve)):
+            correct = [predict(text) == intent for text, intent in queries]
+            on_topic = [ok for ok, (_, intent) in zip(correct, queries) if intent != 'default']
+            off_topic = [ok for ok, (_, intent) in zip(correct, queries) if intent == 'default']
+            self.stdout.write(f"{name:10} {sum(correct) / len(correct):>9.1%} "
+                              f"{sum(on_topic) / len(on_topic):>9.1%} {sum(off_topic) / len(off_topic):>10.1%}")
+
+        self.stdout.write(f"\n{'patterns':>9} {'build s':>8} {'substring p50/p99 us':>22} "
+                          f"{'retrieval p50/p99 us':>22}")
+        for scale in [len(index)] + scales:
+            table = dict(patterns)
+            if scale > len(index):
+                table.update(synthetic_patterns(scale - len(index), options['seed']))
+            started = time.perf_counter()
+            scaled = IntentIndex((intent, p) for intent, intent_patterns in table.items() for p in intent_patterns)
+            build = time.perf_counter() - started
+            # The substring matcher is linear in the table size; time it on fewer rounds
+            substring = time_queries(lambda text: substring_intent(table, text), queries,
+                                     max(1, options['rounds'] * len(index) // scale))
+            retrieval = time_queries(lambda text: retrieve(text, scaled), queries, options['rounds'])
+            self.stdout.write(f"{len(scaled):>9} {build:>8.2f} {substring[0]:>10.1f} /{substring[1]:>10.1f} "
+                              f"{retrieval[0]:>10.1f} /{retrieval[1]:>10.1f}")
@@ -0,0 +1,137 @@
+import json
+import os
+import random
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.analysis import full_tier, keyword_tier, lexicon_tier
+from core.chunked_analysis import ChunkedAnalyzer
+from core.views import keyword_lexicons
+
+SIZE_SUFFIXES = {'K': 1024, 'M': 1024 * 1024}
+CRISIS_SENTENCE = 'Some days I think I want to end it all.'
+
+
+def parse_size(value):
+    value = value.strip().upper()
+    if value[-1:] in SIZE_SUFFIXES:
+        return int(float(value[:-1]) * SIZE_SUFFIXES[value[-1]])
+    return int(value)
+
+
+def corpus_sentences():
+    """Chat-like sentences from intents.json without top-weight crisis phrases"""
+    lexicons = keyword_lexicons.get()
+    top_weight = max(weight for _, weight in lexicons['risk'])
+    crisis = [word for words, weight in lexicons['risk'] if weight == top_weight for word in words]
+    sentences = []
+    for path in (os.path.join(settings.BASE_DIR, 'intents.json'),
+                 os.path.join(settings.BASE_DIR, 'MY_Model', 'intents.json')):
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as file:
+            for intent in json.load(file)['intents']:
+                for text in intent.get('patterns', []) + intent.get('responses', []):
+                    text = text.strip()
+                    if text and not any(word in text.lower() for word in crisis):
+                        sentences.append(text if text[-1] in '.!?' else f'{text}.')
+    if not sentences:
+        raise CommandError('No intents.json found to build journal text from')
+    return sentences
+
+
+def journal_text(sentences, size, seed, crisis_at=None):
+    """About ``size`` characters of sentences, in paragraphs"""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    crisis_inserted = crisis_at is None
+    while length < size:
+        if not crisis_inserted and length >= crisis_at * size:
+            parts.append(CRISIS_SENTENCE)
+            crisis_inserted = True
+        sentence = rng.choice(sentences)
+        parts.append(sentence + ('\n' if rng.random() < 0.15 else ''))
+        length += len(sentence) + 1
+    return ' '.join(parts)[:size]
+
+
+def whole_text(text):
+    result = keyword_tier(text)
+    for func in (lexicon_tier, full_tier):
+        result.update(func(text, result))
+    return result
+
+
+def chunked(text):
+    analyzer = ChunkedAnalyzer()
+    analyzer.feed(text)
+    return analyzer.close()
+
+
+class Command(BaseCommand):
+    help = ("Benchmark whole-text analysis against the chunked analyzer on long journal-like "
+            "messages: time, peak memory and agreement")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1K,10K,100K,1M', help='Comma-separated text sizes')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case (best is reported)')
+        parser.add_argument('--crisis-at', type=float, default=0.1,
+                            help='Position of the crisis sentence in the crisis case, as a fraction')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        sentences = corpus_sentences()
+        sizes = [parse_size(size) for size in options['sizes'].split(',') if size.strip()]
+        self.stdout.write(f"{'case':8} {'size':>8}  {'whole ms':>9} {'chunked ms':>10}  "
+                          f"{'whole peak':>10} {'chunked peak':>12}  agreement")
+        for size in sizes:
+            for case, crisis_at in (('journal', None), ('crisis', options['crisis_at'])):
+                text = journal_text(sentences, size, options['seed'], crisis_at)
+                whole_ms, whole_result = self.best_time(whole_text, text, options['repeat'])
+                chunked_ms, chunked_result = self.best_time(chunked, text, options['repeat'])
+                self.stdout.write(
+                    f"{case:8} {self.format_size(size):>8}  {whole_ms:9.1f} {chunked_ms:10.1f}  "
+                    f"{self.format_size(self.peak(whole_text, text)):>10} "
+                    f"{self.format_size(self.peak(chunked, text)):>12}  "
+                    f"{self.agreement(whole_result, chunked_result)}"
+                )
+
+    def best_time(self, func, text, repeat):
+        best = None
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            result = func(text)
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def peak(self, func, text):
+        tracemalloc.start()
+        try:
+            func(text)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def agreement(self, whole, chunked):
+        notes = []
+        if whole['emotions'] != chunked['emotions']:
+            notes.append('emotions differ')
+        if whole['risk_level'] != chunked['risk_level']:
+            notes.append(f"risk {whole['risk_level']} vs {chunked['risk_level']}")
+        delta = abs(whole['sentiment_score'] - chunked['sentiment_score'])
+        if delta > 0.001:
+            notes.append(f"sentiment off by {delta:.3f}")
+        if not chunked['complete']:
+            notes.append(f"stopped at {self.format_size(chunked['chars_analyzed'])}")
+        return ', '.join(notes) or 'identical'
+
+    def format_size(self, size):
+        for suffix, factor in (('M', SIZE_SUFFIXES['M']), ('K', SIZE_SUFFIXES['K'])):
+            if size >= factor:
+                return f'{size / factor:.1f}{suffix}'
+        return f'{size}B'
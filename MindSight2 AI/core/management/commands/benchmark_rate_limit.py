@@ -0,0 +1,38 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from core.ratelimit import RateLimit
+
+
+class Command(BaseCommand):
+    help = "Measure the cost of one rate limit check against a bucket store"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--store', default='core.ratelimit.LocalBucketStore',
+                            help='Dotted path of the bucket store class')
+        parser.add_argument('--checks', type=int, default=200000, help='Checks to time')
+        parser.add_argument('--clients', type=int, default=10000, help='Distinct keys to spread checks over')
+        parser.add_argument('--per-minute', type=float, default=30)
+        parser.add_argument('--burst', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        limit = RateLimit('bench', options['per_minute'], options['burst'], import_string(options['store'])())
+        rng = random.Random(options['seed'])
+        keys = [rng.randrange(options['clients']) for _ in range(options['checks'])]
+
+        runs = []
+        for _ in range(5):
+            started = time.perf_counter()
+            for key in keys:
+                limit.hit(key)
+            runs.append((time.perf_counter() - started) / len(keys))
+        best = min(runs)
+        self.stdout.write(f"{options['store']}: {best * 1e6:.2f} µs per check "
+                          f"(median of 5 runs {statistics.median(runs) * 1e6:.2f} µs)")
+        self.stdout.write(f"{limit.allowed} allowed, {limit.limited} limited "
+                          f"over {options['clients']} clients")
@@ -0,0 +1,128 @@
+import importlib.util
+import json
+import os
+import time
+from xml.etree import ElementTree
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.ml.lexicon import LEXICON_PATH, LexiconScorer
+
+
+def compile_textblob_lexicon():
+    """Compile TextBlob's en-sentiment.xml the way pattern loads it: scores are
+    averaged per part of speech and then across parts of speech, adjectives get
+    a derived "-ly" adverb, and emoticons are added as mood words."""
+    spec = importlib.util.find_spec('textblob')
+    if spec is None:
+        raise CommandError('textblob must be installed to build the lexicon')
+    from textblob._text import EMOTICONS
+
+    path = os.path.join(os.path.dirname(spec.origin), 'en', 'en-sentiment.xml')
+    senses = {}
+    for node in ElementTree.parse(path).getroot().findall('word'):
+        form = node.attrib.get('form')
+        if not form:
+            continue
+        scores = (float(node.attrib.get('polarity', 0.0)),
+                  float(node.attrib.get('subjectivity', 0.0)),
+                  float(node.attrib.get('intensity', 1.0)))
+        senses.setdefault(form, {}).setdefault(node.attrib.get('pos'), []).append(scores)
+
+    entries = {}
+    for form, by_pos in senses.items():
+        per_pos = {pos: np.mean(values, axis=0) for pos, values in by_pos.items()}
+        entries[form] = {'pos': per_pos, 'all': np.mean(list(per_pos.values()), axis=0)}
+
+    for form, entry in list(entries.items()):
+        if 'JJ' not in entry['pos']:
+            continue
+        stem = form[:-1] + 'i' if form.endswith('y') else form
+        stem = stem[:-2] if stem.endswith('le') else stem
+        adverb = entries.setdefault(stem + 'ly', {'pos': {}, 'all': None})
+        adverb['pos']['RB'] = entry['pos']['JJ']
+        adverb['all'] = entry['pos']['JJ']
+
+    for (_, polarity), faces in EMOTICONS.items():
+        for face in faces:
+            entries.setdefault(face.lower(), {'pos': {}, 'all': np.array([polarity, 1.0, 1.0])})
+
+    words = sorted(entries)
+    scores = np.array([entries[word]['all'] for word in words], dtype=np.float64)
+    modifier = np.array(['RB' in entries[word]['pos'] for word in words], dtype=bool)
+    return LexiconScorer(words, scores[:, 0], scores[:, 1], scores[:, 2], modifier)
+
+
+def sample_corpus():
+    """Chat-like sentences for the parity check: intents plus negation/modifier variants"""
+    texts = []
+    for path in (os.path.join(settings.BASE_DIR, 'intents.json'),
+                 os.path.join(settings.BASE_DIR, 'MY_Model', 'intents.json')):
+        if os.path.exists(path):
+            with open(path, 'r') as file:
+                for intent in json.load(file)['intents']:
+                    texts.extend(intent.get('patterns', []))
+                    texts.extend(intent.get('responses', []))
+    templates = ["I am {} today", "I'm not {}", "I feel very {}!", "really {} and not {}",
+                 "never {} again", "Everything is extremely {}!!", "not a {} day :)"]
+    adjectives = ['good', 'bad', 'happy', 'sad', 'terrible', 'great', 'awful', 'calm', 'lonely', 'hopeless']
+    for template in templates:
+        for index, adjective in enumerate(adjectives):
+            texts.append(template.format(adjective, adjectives[(index + 3) % len(adjectives)]))
+    return texts
+
+
+class Command(BaseCommand):
+    help = "Compile TextBlob's sentiment lexicon into the NumPy lexicon used by the analyzer"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=LEXICON_PATH)
+        parser.add_argument('--check', action='store_true',
+                            help='Compare polarity and speed against TextBlob on a sample corpus')
+        parser.add_argument('--tolerance', type=float, default=0.05)
+
+    def handle(self, *args, **options):
+        scorer = compile_textblob_lexicon()
+        scorer.save(options['output'])
+        size_kb = os.path.getsize(options['output']) / 1024
+        self.stdout.write(f"Wrote {len(scorer.words)} entries to {options['output']} ({size_kb:.0f} KB)")
+
+        if options['check']:
+            self.check_against_textblob(LexiconScorer.load(options['output']), options['tolerance'])
+
+    def check_against_textblob(self, scorer, tolerance):
+        from textblob import TextBlob
+
+        texts = sample_corpus()
+        TextBlob('warm up').sentiment  # load TextBlob's lexicon before timing
+
+        started = time.perf_counter()
+        expected = np.array([TextBlob(text).sentiment.polarity for text in texts])
+        textblob_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        single = np.array([scorer.score(text)[0] for text in texts])
+        single_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        batch, _ = scorer.score_batch(texts)
+        batch_seconds = time.perf_counter() - started
+
+        diff = np.abs(batch - expected)
+        if not np.allclose(single, batch):
+            raise CommandError('Single and batch scoring disagree')
+        within = float(np.mean(diff <= tolerance)) * 100
+        self.stdout.write(
+            f"{len(texts)} messages: mean |diff| {diff.mean():.4f}, max {diff.max():.4f}, "
+            f"{within:.1f}% within {tolerance}"
+        )
+        self.stdout.write(
+            f"TextBlob {textblob_seconds * 1000:.1f} ms, lexicon single {single_seconds * 1000:.1f} ms "
+            f"({textblob_seconds / single_seconds:.1f}x), batch {batch_seconds * 1000:.1f} ms "
+            f"({textblob_seconds / batch_seconds:.1f}x)"
+        )
+        for index in np.argsort(diff)[::-1][:5]:
+            if diff[index] > tolerance:
+                self.stdout.write(f"  {expected[index]:+.3f} vs {batch[index]:+.3f}: {texts[index]!r}")
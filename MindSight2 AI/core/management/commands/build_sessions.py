@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.conditional import mark_chat_changed
+from core.conversations import build_for_user
+from core.models import ChatMessage
+
+
+class Command(BaseCommand):
+    help = "Group chat messages written before conversation sessions existed into sessions (idempotent)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only this user id')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        pending = ChatMessage.objects.filter(session__isnull=True)
+        if options['user']:
+            pending = pending.filter(user_id=options['user'])
+        user_ids = pending.order_by().values_list('user_id', flat=True).distinct()
+
+        total_messages = total_sessions = 0
+        for user_id in user_ids.iterator():
+            with transaction.atomic():
+                assigned, created = build_for_user(user_id, batch_size=options['batch_size'])
+                mark_chat_changed([user_id])
+            total_messages += assigned
+            total_sessions += created
+        self.stdout.write(self.style.SUCCESS(f"Assigned {total_messages} messages to {total_sessions} new sessions"))
@@ -0,0 +1,70 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.archive import archive_month
+from core.models import ChatArchive, ChatMessage
+from core.partitions import (
+    add_months, ensure_partitions, is_partitioned, list_partitions, month_bounds, month_start,
+)
+
+
+class Command(BaseCommand):
+    help = "Maintain monthly ChatMessage partitions and move old months to the archive tier"
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['status', 'ensure', 'archive'],
+                            help='status: list partitions and archives; ensure: create upcoming '
+                                 'partitions; archive: move months past the hot window to archive files')
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--months-ahead', type=int, default=settings.CHAT_PARTITION_MONTHS_AHEAD,
+                            help='Partitions to pre-create after the current month')
+        parser.add_argument('--keep-months', type=int, default=settings.CHAT_HOT_MONTHS,
+                            help='Months of history kept in the hot table')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='List the months that would be archived without touching them')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        getattr(self, f"handle_{options['action']}")(connection, options)
+
+    def handle_status(self, connection, options):
+        if is_partitioned(connection):
+            for name, month in list_partitions(connection):
+                self.stdout.write(f"{month:%Y-%m}  {name}")
+        else:
+            self.stdout.write(f"{connection.vendor}: single table, partitioning not available")
+        for archive in ChatArchive.objects.using(connection.alias).order_by('month'):
+            self.stdout.write(f"{archive.month:%Y-%m}  archived  {archive.row_count} rows  {archive.path}")
+
+    def handle_ensure(self, connection, options):
+        if not is_partitioned(connection):
+            self.stdout.write(f"{connection.vendor}: nothing to do, table is not partitioned")
+            return
+        created = ensure_partitions(connection, options['months_ahead'])
+        for name in created:
+            self.stdout.write(f"Created {name}")
+        self.stdout.write(self.style.SUCCESS(f"{len(created)} partitions created"))
+
+    def handle_archive(self, connection, options):
+        if options['keep_months'] < 1:
+            raise CommandError('--keep-months must be at least 1')
+        cutoff = add_months(month_start(date.today()), -options['keep_months'])
+
+        months = {month for _, month in list_partitions(connection) if month < cutoff}
+        months.update(
+            month_start(value)
+            for value in ChatMessage.objects.using(connection.alias)
+            .filter(timestamp__lt=month_bounds(cutoff)[0])
+            .dates('timestamp', 'month')
+        )
+
+        for month in sorted(months):
+            if options['dry_run']:
+                self.stdout.write(f"Would archive {month:%Y-%m}")
+                continue
+            archive = archive_month(month, using=connection.alias)
+            self.stdout.write(f"Archived {month:%Y-%m}: {archive.row_count} rows -> {archive.path}")
+        self.stdout.write(self.style.SUCCESS(f"{len(months)} months past {cutoff:%Y-%m} processed"))
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.archive import iter_archived_messages
+from core.models import ChatMessage, MoodPoint, PopulationStat
+from core.timeseries import compact, raw_point
+
+
+class Command(BaseCommand):
+    help = ("Roll raw mood points up into hour/day/month buckets and the population analytics, "
+            "and prune expired tiers")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Drop every mood point and population statistic and regenerate them '
+                                 'from the chat history (hot table and archive files) before compacting')
+        parser.add_argument('--loop', type=float, default=0,
+                            help='Keep compacting every N seconds instead of running once')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            self.rebuild(options['batch_size'])
+
+        while True:
+            started = time.perf_counter()
+            rolled_up, pruned = compact(batch_size=options['batch_size'])
+            self.stdout.write(
+                f"Rolled up {rolled_up} raw points, pruned {pruned} expired rows "
+                f"in {time.perf_counter() - started:.2f}s"
+            )
+            if not options['loop']:
+                break
+            time.sleep(options['loop'])
+
+    def rebuild(self, batch_size):
+        fields = [field.attname for field in ChatMessage._meta.concrete_fields]
+        with transaction.atomic():
+            MoodPoint.objects.all().delete()
+            PopulationStat.objects.all().delete()
+            batch = []
+            created = 0
+            hot = ChatMessage.objects.order_by().values(*fields).iterator(chunk_size=batch_size)
+            for source in (iter_archived_messages(), hot):
+                for row in source:
+                    batch.append(raw_point(row))
+                    if len(batch) >= batch_size:
+                        created += len(MoodPoint.objects.bulk_create(batch))
+                        batch = []
+            created += len(MoodPoint.objects.bulk_create(batch))
+        self.stdout.write(f"Recreated {created} raw mood points")
@@ -0,0 +1,97 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so nothing is already imported by manage.py
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+import importlib
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+elapsed = time.perf_counter() - started
+try:
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss_kb //= 1024
+except ImportError:
+    rss_kb = None
+print(json.dumps({'seconds': elapsed, 'rss_kb': rss_kb, 'modules': sorted(sys.modules)}))
+"""
+
+# Default budget: about twice the measured baseline (0.3-0.5 s, 58 MB with the
+# heavy libraries deferred), so only a real regression fails the check
+DEFAULT_MAX_SECONDS = 1.0
+DEFAULT_MAX_RSS_MB = 80
+
+HEAVY_MODULES = ('tensorflow', 'torch', 'transformers', 'cv2', 'librosa', 'chatterbot',
+                 'nltk', 'textblob', 'sklearn', 'pandas', 'matplotlib')
+
+
+def parse_importtime(stderr):
+    """Parse ``-X importtime`` output into (module, self_us, cumulative_us) rows"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Report import time of django.setup() plus the core modules and enforce a startup budget"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', action='append', default=[],
+                            help='Extra module to import after django.setup() (repeatable)')
+        parser.add_argument('--top', type=int, default=20,
+                            help='Number of slowest imports to list')
+        parser.add_argument('--max-seconds', type=float, default=DEFAULT_MAX_SECONDS,
+                            help=f'Fail when startup takes longer than this (default {DEFAULT_MAX_SECONDS}; 0 disables)')
+        parser.add_argument('--max-rss-mb', type=float, default=DEFAULT_MAX_RSS_MB,
+                            help=f'Fail when peak RSS exceeds this many MB (default {DEFAULT_MAX_RSS_MB}; 0 disables)')
+        parser.add_argument('--allow-heavy', action='store_true',
+                            help='Do not fail when a heavy ML library is imported at startup')
+
+    def handle(self, *args, **options):
+        modules = ['core.models', 'core.views', 'core.urls', 'core.ml'] + options['module']
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get(
+            'DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE))
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE, *modules],
+            capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Import probe failed:\n{result.stderr[-2000:]}")
+
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        rows = parse_importtime(result.stderr)
+
+        self.stdout.write(f"{'cumulative ms':>14} {'self ms':>9}  module")
+        for name, self_us, cumulative_us in sorted(rows, key=lambda row: row[2], reverse=True)[:options['top']]:
+            self.stdout.write(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+        rss_mb = probe['rss_kb'] / 1024 if probe['rss_kb'] is not None else None
+        heavy = sorted({name.split('.')[0] for name in probe['modules']} & set(HEAVY_MODULES))
+        self.stdout.write(f"\nStartup: {probe['seconds']:.3f}s"
+                          + (f", peak RSS {rss_mb:.1f} MB" if rss_mb is not None else ""))
+        self.stdout.write(f"Heavy libraries loaded: {', '.join(heavy) or 'none'}")
+
+        failures = []
+        if options['max_seconds'] and probe['seconds'] > options['max_seconds']:
+            failures.append(f"startup {probe['seconds']:.3f}s > {options['max_seconds']}s")
+        if options['max_rss_mb'] and rss_mb is not None and rss_mb > options['max_rss_mb']:
+            failures.append(f"RSS {rss_mb:.1f} MB > {options['max_rss_mb']} MB")
+        if not options['allow_heavy'] and heavy:
+            failures.append(f"heavy libraries imported at startup: {', '.join(heavy)}")
+        if failures:
+            raise CommandError('Import budget exceeded: ' + '; '.join(failures))
+        self.stdout.write(self.style.SUCCESS('Within import budget'))
@@ -0,0 +1,69 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.jobs import LANE_PRIORITIES, discover, enqueue, queue_stats
+from core.models import Job
+
+
+class Command(BaseCommand):
+    help = "Inspect and manage the background job queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['stats', 'enqueue', 'retry', 'purge'],
+                            help='stats: queue depth per lane and latency; enqueue: queue a task; '
+                                 'retry: requeue failed jobs; purge: delete old finished jobs')
+        parser.add_argument('task', nargs='?', help='Task to enqueue (or to retry; default all)')
+        parser.add_argument('--task-args', default='[]', help='JSON list of positional arguments')
+        parser.add_argument('--task-kwargs', default='{}', help='JSON object of keyword arguments')
+        parser.add_argument('--lane', choices=list(LANE_PRIORITIES), help="Lane (default: the task's)")
+        parser.add_argument('--window-hours', type=float, default=1, help='stats: latency window')
+        parser.add_argument('--days', type=int, default=14, help='purge: keep finished jobs this many days')
+        parser.add_argument('--json', action='store_true', help='stats: print JSON')
+
+    def handle(self, *args, **options):
+        getattr(self, options['action'])(options)
+
+    def stats(self, options):
+        stats = queue_stats(window=timedelta(hours=options['window_hours']))
+        if options['json']:
+            self.stdout.write(json.dumps(stats, indent=2))
+            return
+        self.stdout.write(f"{'lane':10} {'ready':>7} {'delayed':>8} {'running':>8} {'oldest wait':>12}")
+        for lane, counts in stats['lanes'].items():
+            self.stdout.write(f"{lane:10} {counts['ready']:>7} {counts['delayed']:>8} {counts['running']:>8} "
+                              f"{counts['oldest_wait_seconds']:>11}s")
+        self.stdout.write(f"\nLast {options['window_hours']:g}h: {stats['finished']} finished, "
+                          f"{stats['failed']} failed")
+        for name in ('wait_seconds', 'run_seconds'):
+            summary = stats[name]
+            if summary:
+                self.stdout.write(f"{name.split('_')[0]:5} s: mean {summary['mean']}  p50 {summary['p50']}  "
+                                  f"p95 {summary['p95']}  max {summary['max']}")
+
+    def enqueue(self, options):
+        tasks = discover()
+        task = tasks.get(options['task'])
+        if task is None:
+            raise CommandError(f"Unknown task; choose from {', '.join(sorted(tasks))}")
+        try:
+            args, kwargs = json.loads(options['task_args']), json.loads(options['task_kwargs'])
+        except ValueError as e:
+            raise CommandError(f"--task-args/--task-kwargs must be JSON: {e}")
+        priority = LANE_PRIORITIES[options['lane']] if options['lane'] else task.priority
+        job = enqueue(task.name, args, kwargs, priority=priority, max_attempts=task.max_attempts)
+        self.stdout.write(self.style.SUCCESS(f"Queued {job}"))
+
+    def retry(self, options):
+        failed = Job.objects.filter(status=Job.FAILED)
+        if options['task']:
+            failed = failed.filter(task=options['task'])
+        count = failed.update(status=Job.QUEUED, attempts=0, run_at=timezone.now(), finished_at=None, worker='')
+        self.stdout.write(self.style.SUCCESS(f"Requeued {count} failed jobs"))
+
+    def purge(self, options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        count, _ = Job.objects.filter(status__in=[Job.DONE, Job.FAILED], finished_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {count} jobs finished before {cutoff:%Y-%m-%d}"))
@@ -0,0 +1,55 @@
+import json
+import os
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.ml.artifacts import discover, publish
+
+
+class Command(BaseCommand):
+    help = "List, validate and publish the hot-reloadable ML data artifacts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['status', 'check', 'publish'],
+                            help='status: list artifacts and versions; check: load and compile every '
+                                 'artifact; publish: validate a JSON file and swap it in as the next version')
+        parser.add_argument('name', nargs='?', help='Artifact to publish')
+        parser.add_argument('source', nargs='?', help='JSON file with the new artifact contents')
+
+    def handle(self, *args, **options):
+        artifacts = discover()
+        if options['action'] == 'publish':
+            name, source = options['name'], options['source']
+            if name not in artifacts or not source:
+                raise CommandError(f"Usage: ml_artifacts publish <{'|'.join(sorted(artifacts))}> <file.json>")
+            with open(source, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            try:
+                version = publish(name, data)
+            except (KeyError, TypeError, ValueError) as e:
+                raise CommandError(f"{source} is not a valid {name} artifact: {e!r}")
+            self.stdout.write(self.style.SUCCESS(f"Published {name} version {version}; workers pick it up "
+                                                 f"within their check interval"))
+            return
+
+        failures = 0
+        for name, artifact in sorted(artifacts.items()):
+            if not os.path.exists(artifact.path):
+                self.stdout.write(f"{name:20} missing  {artifact.path}")
+                failures += 1
+                continue
+            modified = datetime.fromtimestamp(os.path.getmtime(artifact.path))
+            if options['action'] == 'status':
+                with open(artifact.path, 'r', encoding='utf-8') as file:
+                    version = json.load(file).get('version')
+                self.stdout.write(f"{name:20} v{version}  {modified:%Y-%m-%d %H:%M:%S}  {artifact.path}")
+                continue
+            try:
+                version, _, _ = artifact.read()
+                self.stdout.write(f"{name:20} v{version}  ok")
+            except Exception as e:
+                self.stdout.write(f"{name:20} FAILED  {e!r}")
+                failures += 1
+        if failures:
+            raise CommandError(f"{failures} artifact(s) missing or invalid")
@@ -0,0 +1,258 @@
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from importlib import import_module
+from urllib.parse import urlencode
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from core.models import User
+from core.stats import percentile
+from core.traffic import filler_text, read_log
+
+REPLAY_USER_PREFIX = 'replay_'
+
+
+def read_body(response):
+    """The full body of a test-client response. Streams are drained here, so
+    latency covers the whole stream; async ones (chat_message_stream) are
+    consumed with ``async for``."""
+    if not response.streaming:
+        return response.content
+    if response.is_async:
+        async def drain():
+            return [chunk async for chunk in response.streaming_content]
+        return b''.join(async_to_sync(drain)())
+    return b''.join(response.streaming_content)
+
+
+def response_ok(status, body):
+    # A failed stream still answers 200, with an error event
+    return status == 200 and b'event: error' not in body
+
+
+class Command(BaseCommand):
+    help = ("Replay a captured chat workload against the Django test client or a running server "
+            "and report throughput, latency percentiles and query counts")
+
+    def add_arguments(self, parser):
+        parser.add_argument('log', help='Traffic log written by TRAFFIC_CAPTURE_PATH or traffic_log')
+        parser.add_argument('--speed', type=float, default=1.0,
+                            help='Time scale: 1 replays at recorded pace, 10 is ten times faster, '
+                                 '0 sends as fast as possible')
+        parser.add_argument('--target', default='',
+                            help='Base URL of a running server (e.g. http://127.0.0.1:8000); '
+                                 'default is the in-process test client')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Parallel requests in --target mode')
+        parser.add_argument('--limit', type=int, default=0, help='Replay only the first N messages')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the chatbot reply choice')
+        parser.add_argument('--label', default='', help='Name for this run (e.g. the branch)')
+        parser.add_argument('--output', default='', help='Write the report as JSON')
+        parser.add_argument('--compare', default='', help='JSON report of another run to compare with')
+        parser.add_argument('--rate-limits', action='store_true',
+                            help='Keep RATE_LIMIT_ENABLED as configured in test-client mode (by default the '
+                                 'limiter is switched off so the replay measures the app, not the 429s)')
+
+    def handle(self, *args, **options):
+        entries = list(read_log(options['log']))
+        if options['limit']:
+            entries = entries[:options['limit']]
+        if not entries:
+            raise CommandError(f"No messages in {options['log']}")
+        self.stdout.write(self.style.WARNING(
+            "Replay creates replay_* users and chat messages; point it at a scratch database."))
+
+        random.seed(options['seed'])
+        users = self.replay_users({entry['u'] for entry in entries})
+        if options['target']:
+            results, wall = self.replay_server(entries, users, options)
+        else:
+            # RateLimitMiddleware is loaded per Client, so the override covers every replayed request
+            with override_settings(RATE_LIMIT_ENABLED=settings.RATE_LIMIT_ENABLED and options['rate_limits']):
+                results, wall = self.replay_client(entries, users, options)
+
+        report = self.build_report(results, wall, options)
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+        if options['compare']:
+            with open(options['compare'], 'r') as file:
+                self.print_comparison(json.load(file), report)
+
+    def replay_users(self, pseudonyms):
+        users = {}
+        for pseudonym in sorted(pseudonyms):
+            user, created = User.objects.get_or_create(username=f'{REPLAY_USER_PREFIX}{pseudonym}')
+            if created:
+                user.set_unusable_password()
+                user.save(update_fields=['password'])
+            users[pseudonym] = user
+        return users
+
+    def schedule(self, entries, speed):
+        """Yield ``(send_at, index, entry)`` with send_at relative to the start"""
+        first = entries[0]['t']
+        for index, entry in enumerate(entries):
+            yield ((entry['t'] - first) / speed if speed > 0 else 0.0), index, entry
+
+    def message_text(self, entry, index):
+        return entry.get('x') or filler_text(entry['n'], seed=index)
+
+    def replay_client(self, entries, users, options):
+        from django.test import Client
+        from django.test.utils import setup_test_environment
+
+        setup_test_environment()
+        clients = {}
+        results = []
+        started = time.perf_counter()
+        for send_at, index, entry in self.schedule(entries, options['speed']):
+            delay = started + send_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            client = clients.get(entry['u'])
+            if client is None:
+                client = clients[entry['u']] = Client()
+                client.force_login(users[entry['u']])
+
+            lag = time.perf_counter() - started - send_at
+            with ExitStack() as stack:
+                captures = [stack.enter_context(CaptureQueriesContext(connections[alias]))
+                            for alias in settings.DATABASES]
+                request_started = time.perf_counter()
+                response = client.post(reverse(entry.get('e', 'chat_message')),
+                                       {'message': self.message_text(entry, index)})
+                body = read_body(response)
+                latency = time.perf_counter() - request_started
+            queries = sum(len(capture.captured_queries) for capture in captures)
+            results.append({'latency': latency, 'lag': max(lag, 0.0), 'ok': response_ok(response.status_code, body),
+                            'limited': response.status_code == 429, 'queries': queries})
+        return results, time.perf_counter() - started
+
+    def replay_server(self, entries, users, options):
+        engine = import_module(settings.SESSION_ENGINE)
+        cookies = {}
+        for pseudonym, user in users.items():
+            session = engine.SessionStore()
+            session[SESSION_KEY] = str(user.pk)
+            session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+            session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            session.save()
+            cookies[pseudonym] = f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+        base = options['target'].rstrip('/')
+
+        def send(send_at, index, entry, started):
+            lag = time.perf_counter() - started - send_at
+            request = urllib.request.Request(
+                base + reverse(entry.get('e', 'chat_message')),
+                data=urlencode({'message': self.message_text(entry, index)}).encode(),
+                headers={'Cookie': cookies[entry['u']]},
+                method='POST',
+            )
+            request_started = time.perf_counter()
+            limited = False
+            try:
+                with urllib.request.urlopen(request, timeout=60) as response:
+                    ok = response_ok(response.status, response.read())
+            except urllib.error.HTTPError as e:
+                ok, limited = False, e.code == 429
+            except (urllib.error.URLError, OSError):
+                ok = False
+            return {'latency': time.perf_counter() - request_started, 'lag': max(lag, 0.0), 'ok': ok,
+                    'limited': limited, 'queries': None}
+
+        futures = []
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            for send_at, index, entry in self.schedule(entries, options['speed']):
+                delay = started + send_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(pool.submit(send, send_at, index, entry, started))
+            results = [future.result() for future in futures]
+        return results, time.perf_counter() - started
+
+    def build_report(self, results, wall, options):
+        latencies = sorted(result['latency'] * 1000 for result in results)
+        lags = sorted(result['lag'] * 1000 for result in results)
+        queries = sorted(result['queries'] for result in results if result['queries'] is not None)
+        report = {
+            'label': options['label'],
+            'log': options['log'],
+            'mode': 'server' if options['target'] else 'test-client',
+            'speed': options['speed'],
+            'requests': len(results),
+            # 429s from RateLimitMiddleware are counted apart from failures
+            'rate_limited': sum(1 for result in results if result['limited']),
+            'errors': sum(1 for result in results if not result['ok'] and not result['limited']),
+            'wall_seconds': round(wall, 3),
+            'throughput_rps': round(len(results) / wall, 2) if wall else 0.0,
+            'latency_ms': {
+                'mean': round(sum(latencies) / len(latencies), 2),
+                'p50': round(percentile(latencies, 0.50), 2),
+                'p90': round(percentile(latencies, 0.90), 2),
+                'p95': round(percentile(latencies, 0.95), 2),
+                'p99': round(percentile(latencies, 0.99), 2),
+                'max': round(latencies[-1], 2),
+            },
+            # How far sends fell behind the recorded timeline (meaningless at speed 0)
+            'schedule_lag_ms_p95': round(percentile(lags, 0.95), 2) if options['speed'] > 0 else None,
+            'queries': None,
+        }
+        if queries:
+            report['queries'] = {
+                'total': sum(queries),
+                'mean': round(sum(queries) / len(queries), 2),
+                'p95': percentile(queries, 0.95),
+                'max': queries[-1],
+            }
+        return report
+
+    def print_report(self, report):
+        latency = report['latency_ms']
+        self.stdout.write(
+            f"{report['requests']} requests ({report['errors']} errors, {report['rate_limited']} rate limited) "
+            f"in {report['wall_seconds']}s "
+            f"[{report['mode']}, speed {report['speed']}]: {report['throughput_rps']} req/s"
+        )
+        self.stdout.write(
+            f"latency ms: mean {latency['mean']}  p50 {latency['p50']}  p90 {latency['p90']}  "
+            f"p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}"
+        )
+        if report['rate_limited']:
+            self.stdout.write(self.style.WARNING(
+                "Rate limited requests answer before the view runs and skew the latencies; replay without "
+                "--rate-limits, or raise RATE_LIMIT_* on the --target server"))
+        if report['schedule_lag_ms_p95'] is not None:
+            self.stdout.write(f"schedule lag p95: {report['schedule_lag_ms_p95']} ms")
+        if report['queries']:
+            queries = report['queries']
+            self.stdout.write(f"queries: {queries['total']} total, {queries['mean']} per request, "
+                              f"p95 {queries['p95']}, max {queries['max']}")
+
+    def print_comparison(self, before, after):
+        rows = [
+            ('req/s', before['throughput_rps'], after['throughput_rps']),
+            ('p50 ms', before['latency_ms']['p50'], after['latency_ms']['p50']),
+            ('p95 ms', before['latency_ms']['p95'], after['latency_ms']['p95']),
+            ('p99 ms', before['latency_ms']['p99'], after['latency_ms']['p99']),
+        ]
+        if before.get('queries') and after.get('queries'):
+            rows.append(('queries/req', before['queries']['mean'], after['queries']['mean']))
+        self.stdout.write(f"\n{'':12} {before['label'] or 'baseline':>12} {after['label'] or 'this run':>12}  change")
+        for name, old, new in rows:
+            change = f"{(new - old) / old * 100:+.1f}%" if old else 'n/a'
+            self.stdout.write(f"{name:12} {old:>12} {new:>12}  {change}")
@@ -0,0 +1,201 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.conditional import mark_chat_changed
+from core.conversations import refresh as refresh_sessions
+from core.models import ChatMessage
+from core.timeseries import EMOTION_SUMS, POINT_FIELDS, revise_messages
+
+# Point fields a rescore can change
+RESCORED_POINT_FIELDS = ['sentiment_score', 'risk_level'] + EMOTION_SUMS
+
+
+def _init_worker():
+    """Make sure Django is configured in spawned worker processes"""
+    django.setup()
+
+
+def score_batch(texts):
+    """Score a batch of messages with every tier the chat path may run"""
+    from core.analysis import analyze_text_full
+
+    results = []
+    for text in texts:
+        analysis = analyze_text_full(text)
+        results.append((
+            analysis['sentiment_score'],
+            analysis['risk_level'],
+            analysis['emotions'],
+            analysis['tier'],
+        ))
+    return results
+
+
+def read_checkpoint(path):
+    """Return ``(last_pk, processed, updated)`` stored in the checkpoint file"""
+    if not path or not os.path.exists(path):
+        return 0, 0, 0
+    with open(path, 'r') as file:
+        data = json.load(file)
+    return int(data.get('last_pk', 0)), int(data.get('processed', 0)), int(data.get('updated', 0))
+
+
+def write_checkpoint(path, last_pk, processed, updated):
+    """Atomically replace the checkpoint file so a crash never leaves it half-written"""
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump({'last_pk': last_pk, 'processed': processed, 'updated': updated}, file)
+    os.replace(tmp_path, path)
+
+
+class Command(BaseCommand):
+    help = "Recompute sentiment_score, risk_level, emotions and analysis_tier for stored chat messages"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Rows fetched and written per primary-key chunk')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Messages scored per worker task')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Scoring processes (1 scores inline)')
+        parser.add_argument('--checkpoint', default='',
+                            help='JSON file recording the last committed primary key')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue after the primary key stored in --checkpoint')
+        parser.add_argument('--start-pk', type=int, default=0,
+                            help='Only rescore rows with a primary key above this value')
+        parser.add_argument('--end-pk', type=int, default=0,
+                            help='Stop after this primary key (0 means no limit)')
+        parser.add_argument('--max-rate', type=float, default=0,
+                            help='Throttle to at most this many rows per second (0 disables)')
+        parser.add_argument('--below-tier', type=int, default=None,
+                            help='Only rescore rows analyzed below this tier, e.g. 2 for rows '
+                                 'whose richer tiers were shed under load')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Score rows and report changes without writing them')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        batch_size = options['batch_size']
+        workers = options['workers']
+        checkpoint = options['checkpoint']
+        max_rate = options['max_rate']
+        dry_run = options['dry_run']
+
+        if chunk_size < 1 or batch_size < 1 or workers < 1:
+            raise CommandError('--chunk-size, --batch-size and --workers must be positive')
+        if options['resume'] and not checkpoint:
+            raise CommandError('--resume requires --checkpoint')
+
+        last_pk = options['start_pk']
+        # Counters cover the whole run, including what earlier runs of a resumed one did
+        processed = updated = 0
+        if options['resume']:
+            checkpoint_pk, processed, updated = read_checkpoint(checkpoint)
+            last_pk = max(last_pk, checkpoint_pk)
+            self.stdout.write(f"Resuming after pk {last_pk} ({processed} processed, {updated} changed so far)")
+        resumed_from = processed
+
+        queryset = ChatMessage.objects.order_by('pk')
+        if options['end_pk']:
+            queryset = queryset.filter(pk__lte=options['end_pk'])
+        if options['below_tier'] is not None:
+            queryset = queryset.filter(analysis_tier__lt=options['below_tier'])
+
+        executor = None
+        if workers > 1:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+
+        started = time.monotonic()
+
+        try:
+            while True:
+                # Keyset pagination keeps every chunk query on the primary key index
+                rows = list(
+                    queryset.filter(pk__gt=last_pk)
+                    .values_list('pk', 'user_message', 'sentiment_score', 'risk_level', 'emotions',
+                                 'analysis_tier')[:chunk_size]
+                    .iterator(chunk_size=chunk_size)
+                )
+                if not rows:
+                    break
+
+                texts = [row[1] for row in rows]
+                batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+                if executor:
+                    results = [score for scores in executor.map(score_batch, batches) for score in scores]
+                else:
+                    results = [score for batch in batches for score in score_batch(batch)]
+
+                changed = []
+                for (pk, _, *old), new in zip(rows, results):
+                    if tuple(old) != new:
+                        sentiment, risk, emotions, tier = new
+                        message = ChatMessage(
+                            pk=pk,
+                            sentiment_score=sentiment,
+                            risk_level=risk,
+                            emotions=emotions,
+                            analysis_tier=tier,
+                        )
+                        message.sync_emotion_columns()
+                        changed.append(message)
+
+                last_pk = rows[-1][0]
+                processed += len(rows)
+                updated += len(changed)
+
+                if not dry_run:
+                    with transaction.atomic():
+                        if changed:
+                            old_points = {
+                                row['pk']: row for row in ChatMessage.objects.filter(pk__in=[m.pk for m in changed])
+                                .values('pk', 'session_id', *POINT_FIELDS)
+                            }
+                            ChatMessage.objects.bulk_update(
+                                changed,
+                                ['sentiment_score', 'risk_level', 'emotions', 'analysis_tier']
+                                + ChatMessage.EMOTION_FIELDS,
+                                batch_size=batch_size,
+                            )
+                            old_rows = [old_points[m.pk] for m in changed if m.pk in old_points]
+                            new_rows = [
+                                {**old_points[m.pk], **{field: getattr(m, field) for field in RESCORED_POINT_FIELDS}}
+                                for m in changed if m.pk in old_points
+                            ]
+                            # Session aggregates (min sentiment, peak risk) and mood points may have changed
+                            refresh_sessions({row['session_id'] for row in old_rows})
+                            revise_messages(old_rows, new_rows)
+                            mark_chat_changed({row['user_id'] for row in old_rows})
+                    write_checkpoint(checkpoint, last_pk, processed, updated)
+
+                elapsed = time.monotonic() - started
+                rate = (processed - resumed_from) / elapsed if elapsed else 0.0
+                self.stdout.write(
+                    f"pk<={last_pk}: {processed} processed, {updated} changed, {rate:.0f} rows/s"
+                )
+
+                if max_rate:
+                    # Sleep until the running average drops back under the requested rate
+                    delay = (processed - resumed_from) / max_rate - (time.monotonic() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+        finally:
+            if executor:
+                executor.shutdown()
+
+        elapsed = time.monotonic() - started
+        rate = (processed - resumed_from) / elapsed if elapsed else 0.0
+        verb = 'would change' if dry_run else 'updated'
+        resumed = f", {processed - resumed_from} in this run" if resumed_from else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"Rescored {processed} messages ({updated} {verb}){resumed} in {elapsed:.1f}s, {rate:.0f} rows/s"
+        ))
@@ -0,0 +1,138 @@
+import multiprocessing
+import signal
+import threading
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+# Spawned worker processes import this module before django.setup(), so the
+# model-dependent core.jobs is imported inside the functions
+
+
+def format_stats(stats):
+    depth = ', '.join(f"{lane} {counts['ready']}" for lane, counts in stats['lanes'].items())
+    wait = stats['wait_seconds']['p95'] if stats['wait_seconds'] else 0.0
+    return (f"queue ready: {depth}; last hour {stats['finished']} finished, "
+            f"{stats['failed']} failed, wait p95 {wait}s")
+
+
+def work(index, priorities, poll, burst, stop):
+    """Claim and run jobs until ``stop`` is set (or the queue is empty in burst mode)"""
+    from core.jobs import claim, execute, worker_name
+
+    name = worker_name(index)
+    try:
+        while not stop.is_set():
+            job = claim(name, priorities)
+            if job is None:
+                if burst:
+                    break
+                stop.wait(poll)
+                continue
+            execute(job)
+    finally:
+        connections.close_all()
+
+
+def run_threads(threads, priorities, poll, burst, stats_every, stdout=None):
+    """One worker process: ``threads`` job threads, the stale-job reaper and periodic stats"""
+    from core.jobs import discover, queue_stats, requeue_stale
+
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        stop.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    discover()
+    workers = [threading.Thread(target=work, args=(index, priorities, poll, burst, stop),
+                                name=f'job-worker-{index}') for index in range(threads)]
+    for worker in workers:
+        worker.start()
+
+    next_stats = time.monotonic() + stats_every if stats_every else None
+    try:
+        while any(worker.is_alive() for worker in workers):
+            stop.wait(poll)
+            requeue_stale()
+            if next_stats is not None and time.monotonic() >= next_stats:
+                next_stats = time.monotonic() + stats_every
+                if stdout is not None:
+                    stdout.write(format_stats(queue_stats()))
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+        connections.close_all()
+
+
+def run_process(threads, priorities, poll, burst):
+    """Entry point of a spawned worker process"""
+    django.setup()
+    run_threads(threads, priorities, poll, burst, stats_every=0)
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the database queue (see core/jobs.py)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Job threads per process')
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Worker processes; use more than one for CPU-bound tasks')
+        parser.add_argument('--lanes', default='',
+                            help='Comma-separated lanes to serve (critical, default, batch); '
+                                 'default all, highest priority first')
+        parser.add_argument('--poll', type=float, default=None,
+                            help='Seconds to wait when the queue is empty (default JOB_POLL_SECONDS)')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--stats-every', type=float, default=60,
+                            help='Print queue depth and latency every N seconds (0 disables)')
+
+    def handle(self, *args, **options):
+        from core.jobs import LANE_PRIORITIES, queue_stats
+
+        if options['threads'] < 1 or options['processes'] < 1:
+            raise CommandError('--threads and --processes must be positive')
+        priorities = []
+        for lane in filter(None, (lane.strip() for lane in options['lanes'].split(','))):
+            if lane not in LANE_PRIORITIES:
+                raise CommandError(f"Unknown lane '{lane}'; choose from {', '.join(LANE_PRIORITIES)}")
+            priorities.append(LANE_PRIORITIES[lane])
+        poll = options['poll'] if options['poll'] is not None else settings.JOB_POLL_SECONDS
+
+        self.stdout.write(f"Worker: {options['processes']} process(es) x {options['threads']} thread(s), "
+                          f"lanes {options['lanes'] or 'all'}")
+        if options['processes'] == 1:
+            run_threads(options['threads'], priorities, poll, options['burst'], options['stats_every'],
+                        stdout=self.stdout)
+            return
+
+        # Spawned children set Django up themselves; no connection is inherited
+        connections.close_all()
+        context = multiprocessing.get_context('spawn')
+        children = [
+            context.Process(target=run_process, name=f'job-worker-process-{index}',
+                            args=(options['threads'], priorities, poll, options['burst']))
+            for index in range(options['processes'])
+        ]
+        for child in children:
+            child.start()
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+        try:
+            while any(child.is_alive() for child in children) and not stop.is_set():
+                stop.wait(options['stats_every'] or poll)
+                if options['stats_every'] and not stop.is_set():
+                    self.stdout.write(format_stats(queue_stats()))
+        finally:
+            for child in children:
+                if child.is_alive():
+                    child.terminate()  # SIGTERM: finish the current job, then exit
+            for child in children:
+                child.join()
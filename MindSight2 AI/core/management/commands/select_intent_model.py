@@ -0,0 +1,100 @@
+import json
+import os
+import pickle
+import random
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.management.commands.benchmark_intents import TEMPLATES, synthetic_patterns, typo
+from core.management.commands.train_intents import read_intents
+from core.ml import model_selection
+from core.ml.incremental_intents import preprocess
+
+
+def corpus(patterns, synthetic_intents, seed):
+    """(texts, labels, groups): chat-like variants of every pattern, grouped by pattern"""
+    rng = random.Random(seed)
+    table = {}
+    for intent, pattern in patterns:
+        table.setdefault(intent, []).append(pattern)
+    table.update(synthetic_patterns(synthetic_intents * 20, seed))
+    texts, labels, groups = [], [], []
+    for intent, intent_patterns in table.items():
+        for pattern in intent_patterns:
+            variants = [template.format(pattern) for template in TEMPLATES]
+            misspelt = typo(pattern, rng)
+            if misspelt:
+                variants.append(misspelt)
+            texts.extend(preprocess(text) for text in variants)
+            labels.extend([intent] * len(variants))
+            groups.extend([f'{intent}/{pattern}'] * len(variants))
+    return texts, labels, groups
+
+
+class Command(BaseCommand):
+    help = ("Cross-validate candidate feature settings and classifiers for the MY_Model intent classifier "
+            "in parallel, report accuracy, training time, latency and size, and export the Pareto-best model")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intents', default=os.path.join(settings.BASE_DIR, 'MY_Model', 'intents.json'))
+        parser.add_argument('--synthetic-intents', type=int, default=0,
+                            help='Synthetic intents (20 patterns each) added to make timings meaningful')
+        parser.add_argument('--features', default='', help=f"Comma-separated subset of "
+                                                           f"{', '.join(model_selection.FEATURE_SETTINGS)}")
+        parser.add_argument('--classifiers', default='', help='Comma-separated subset of the candidate classifiers')
+        parser.add_argument('--jobs', type=int, default=-1, help='Parallel jobs (-1: all cores)')
+        parser.add_argument('--cache-dir', default=os.path.join(tempfile.gettempdir(), 'mindsight-intent-features'),
+                            help="TF-IDF cache shared between runs ('' disables)")
+        parser.add_argument('--output', default=os.path.join(settings.BASE_DIR, 'MY_Model', 'chatbot_model.pkl'),
+                            help='Where to export the chosen model (the file MY_Model/chat.py loads)')
+        parser.add_argument('--no-export', action='store_true', help='Only report')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        feature_settings = [name for name in options['features'].split(',') if name] or None
+        classifier_names = [name for name in options['classifiers'].split(',') if name] or None
+        for name in feature_settings or []:
+            if name not in model_selection.FEATURE_SETTINGS:
+                raise CommandError(f"Unknown feature setting '{name}'")
+        for name in classifier_names or []:
+            if name not in model_selection.classifiers():
+                raise CommandError(f"Unknown classifier '{name}'")
+
+        texts, labels, groups = corpus(read_intents(options['intents']), options['synthetic_intents'],
+                                       options['seed'])
+        started = time.perf_counter()
+        results = model_selection.evaluate(texts, labels, groups, feature_settings, classifier_names,
+                                           n_jobs=options['jobs'], cache_dir=options['cache_dir'] or None,
+                                           seed=options['seed'])
+        elapsed = time.perf_counter() - started
+        front = model_selection.pareto_front(results)
+        chosen = model_selection.best(results)
+
+        if options['json']:
+            self.stdout.write(json.dumps({'results': results, 'chosen': chosen}, indent=2))
+        else:
+            self.stdout.write(f"{len(texts)} messages, {len(set(labels))} intents, {len(results)} candidates x "
+                              f"{model_selection.FOLDS} folds in {elapsed:.1f}s\n")
+            self.stdout.write(f"  {'features':14} {'classifier':22} {'accuracy':>9} {'train ms':>9} "
+                              f"{'predict ms':>11} {'size KB':>8}")
+            for result in sorted(results, key=lambda result: -result['accuracy']):
+                marker = '*' if result is chosen else ('p' if result in front else ' ')
+                self.stdout.write(f"{marker} {result['features']:14} {result['classifier']:22} "
+                                  f"{result['accuracy']:>9.1%} {result['train_seconds'] * 1000:>9.1f} "
+                                  f"{result['latency_ms']:>11.3f} {result['size_bytes'] / 1024:>8.1f}")
+            self.stdout.write("\np: Pareto-optimal (accuracy, latency, size); *: chosen")
+
+        if options['no_export']:
+            return
+        model = model_selection.fit_final(texts, labels, chosen['features'], chosen['classifier'])
+        # Write next to the target and rename, so chat.py never loads a partial file
+        temp_path = f"{options['output']}.tmp"
+        with open(temp_path, 'wb') as file:
+            pickle.dump(model, file)
+        os.replace(temp_path, options['output'])
+        self.stdout.write(self.style.SUCCESS(f"Exported {chosen['features']} + {chosen['classifier']} "
+                                             f"to {options['output']}"))
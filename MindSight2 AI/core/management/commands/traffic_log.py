@@ -0,0 +1,58 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import ChatMessage
+from core.stats import percentile
+from core.traffic import TEXT_MODES, TrafficRecorder, read_log
+
+
+class Command(BaseCommand):
+    help = "Summarize a traffic log, or build one from stored chat history for replay_traffic"
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['summary', 'from-history'])
+        parser.add_argument('log', help='Traffic log to read (summary) or write (from-history)')
+        parser.add_argument('--days', type=int, default=7, help='History window for from-history')
+        parser.add_argument('--text', choices=TEXT_MODES, default='synthetic',
+                            help='How message text is stored by from-history')
+
+    def handle(self, *args, **options):
+        if options['action'] == 'from-history':
+            self.from_history(options)
+        else:
+            self.summary(options['log'])
+
+    def from_history(self, options):
+        recorder = TrafficRecorder(options['log'], text_mode=options['text'])
+        since = timezone.now() - timedelta(days=options['days'])
+        rows = (ChatMessage.objects.filter(timestamp__gte=since).order_by('timestamp', 'pk')
+                .values_list('user_id', 'user_message', 'timestamp').iterator(chunk_size=2000))
+        count = 0
+        for user_id, message, timestamp in rows:
+            recorder.record('chat_message', user_id, message, arrival=timestamp.timestamp())
+            count += 1
+        self.stdout.write(f"Wrote {count} messages from the last {options['days']} days to {options['log']}")
+
+    def summary(self, path):
+        entries = list(read_log(path))
+        if not entries:
+            raise CommandError(f"No messages in {path}")
+        duration = entries[-1]['t'] - entries[0]['t']
+        per_user = Counter(entry['u'] for entry in entries)
+        lengths = sorted(entry['n'] for entry in entries)
+        gaps = sorted(b['t'] - a['t'] for a, b in zip(entries, entries[1:]))
+        busiest = sorted(per_user.values(), reverse=True)
+
+        self.stdout.write(f"{len(entries)} messages from {len(per_user)} users over {duration:.0f}s "
+                          f"({len(entries) / duration if duration else 0:.2f} msg/s)")
+        self.stdout.write(f"endpoints: {dict(Counter(entry.get('e', 'chat_message') for entry in entries))}")
+        self.stdout.write(f"message length: p50 {percentile(lengths, 0.5)}  p95 {percentile(lengths, 0.95)}  "
+                          f"max {lengths[-1]}")
+        if gaps:
+            self.stdout.write(f"inter-arrival s: p50 {percentile(gaps, 0.5):.3f}  p95 {percentile(gaps, 0.95):.3f}")
+        top = max(1, len(busiest) // 10)
+        self.stdout.write(f"busiest 10% of users send {sum(busiest[:top]) / len(entries) * 100:.0f}% of messages")
+        self.stdout.write(f"with text: {sum(1 for entry in entries if 'x' in entry)}")
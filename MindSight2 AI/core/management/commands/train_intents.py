@@ -0,0 +1,155 @@
+import json
+import os
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.lazy import lazy_import
+from core.management.commands.benchmark_intents import TEMPLATES, synthetic_patterns, typo
+from core.ml import incremental_intents
+from core.ml.incremental_intents import IncrementalIntentModel, preprocess
+from core.stats import percentile
+
+svm = lazy_import('sklearn.svm')
+text_features = lazy_import('sklearn.feature_extraction.text')
+
+
+def read_intents(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    if not data.get('intents'):
+        raise CommandError(f"{path} has no 'intents'")
+    return [(intent['tag'], pattern) for intent in data['intents'] for pattern in intent.get('patterns', [])]
+
+
+class FullRetrain:
+    """The MY_Model/train_chatbot.py pipeline: TF-IDF + linear SVC refit on everything"""
+
+    def fit(self, rows):
+        self.vectorizer = text_features.TfidfVectorizer(stop_words='english', ngram_range=(1, 2))
+        X = self.vectorizer.fit_transform([preprocess(text) for text, _ in rows])
+        self.model = svm.SVC(kernel='linear', probability=True, C=1.0, class_weight='balanced')
+        self.model.fit(X, [intent for _, intent in rows])
+
+    def predict(self, text):
+        return self.model.predict(self.vectorizer.transform([preprocess(text)]))[0]
+
+
+class Command(BaseCommand):
+    help = ("Train the incremental intent model (core/ml/incremental_intents.py): fold in new patterns, "
+            "publish versions, roll back, or compare with full retraining")
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['update', 'status', 'rollback', 'compare'],
+                            help='update: fold in new patterns from an intents file and publish; '
+                                 'status: list versions; rollback: make an older version current; '
+                                 'compare: accuracy, training time and latency against full retraining')
+        parser.add_argument('version', nargs='?', type=int, help='rollback: version to make current')
+        parser.add_argument('--intents', default=os.path.join(settings.BASE_DIR, 'intents.json'),
+                            help='intents.json to train from')
+        parser.add_argument('--from-scratch', action='store_true', help='update: start a new model')
+        parser.add_argument('--epochs', type=int, default=incremental_intents.EPOCHS)
+        parser.add_argument('--synthetic-intents', type=int, default=50,
+                            help='compare: synthetic intents added to the corpus (20 patterns each)')
+        parser.add_argument('--steps', type=int, default=5, help='compare: incremental batches')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        getattr(self, options['action'])(options)
+
+    def update(self, options):
+        model = None if options['from_scratch'] else incremental_intents.load()
+        if model is None:
+            model = IncrementalIntentModel(seed=options['seed'])
+        started = time.perf_counter()
+        added = model.update(read_intents(options['intents']), epochs=options['epochs'])
+        elapsed = time.perf_counter() - started
+        if not added:
+            self.stdout.write(f"No new patterns in {options['intents']}; version {model.version} stays current")
+            return
+        version = incremental_intents.publish(model)
+        self.stdout.write(self.style.SUCCESS(f"Folded in {added} patterns in {elapsed:.2f}s; published version "
+                                             f"{version} with {len(model.intents)} intents"))
+
+    def status(self, options):
+        current = incremental_intents.current_version()
+        published = incremental_intents.versions()
+        if not published:
+            self.stdout.write("No intent model published yet; run train_intents update")
+            return
+        for version in published:
+            model = incremental_intents.load(version)
+            marker = '*' if version == current else ' '
+            self.stdout.write(f"{marker} v{version}  {len(model.intents)} intents, {len(model.trained)} patterns")
+
+    def rollback(self, options):
+        if options['version'] not in incremental_intents.versions():
+            raise CommandError(f"Version must be one of {incremental_intents.versions()}")
+        incremental_intents.set_current(options['version'])
+        self.stdout.write(self.style.SUCCESS(f"Version {options['version']} is current"))
+
+    def compare(self, options):
+        rng = random.Random(options['seed'])
+        patterns = read_intents(options['intents'])
+        table = {}
+        for intent, pattern in patterns:
+            table.setdefault(intent, []).append(pattern)
+        table.update(synthetic_patterns(options['synthetic_intents'] * 20, options['seed']))
+
+        # Chat-like variants of every pattern; 20% of each intent held out for evaluation
+        train, test = [], []
+        for intent, intent_patterns in table.items():
+            rows = [(template.format(pattern), intent) for pattern in intent_patterns for template in TEMPLATES]
+            rows += [(text, intent) for text in (typo(pattern, rng) for pattern in intent_patterns) if text]
+            rng.shuffle(rows)
+            cut = max(1, len(rows) // 5)
+            test.extend(rows[:cut])
+            train.extend(rows[cut:])
+
+        # Half the intents arrive only in the incremental batches
+        intents = list(table)
+        rng.shuffle(intents)
+        late = set(intents[:len(intents) // 2])
+        initial = [row for row in train if row[1] not in late]
+        rest = [row for row in train if row[1] in late]
+        rng.shuffle(rest)
+        steps = max(1, options['steps'])
+        batches = [initial] + [rest[i::steps] for i in range(steps)]
+
+        self.stdout.write(f"{len(train)} training / {len(test)} test messages, {len(table)} intents, "
+                          f"{len(late)} of them added incrementally over {steps} batches\n")
+        self.stdout.write(f"{'step':>4} {'patterns':>9} {'intents':>8} {'full s':>8} {'full acc':>9} "
+                          f"{'incr s':>8} {'incr acc':>9}")
+        full = FullRetrain()
+        model = IncrementalIntentModel(seed=options['seed'])
+        seen = []
+        for step, batch in enumerate(batches):
+            seen.extend(batch)
+            known = {intent for _, intent in seen}
+            held_out = [row for row in test if row[1] in known]
+
+            started = time.perf_counter()
+            full.fit(seen)
+            full_seconds = time.perf_counter() - started
+            started = time.perf_counter()
+            model.update([(intent, text) for text, intent in batch], epochs=options['epochs'])
+            incremental_seconds = time.perf_counter() - started
+
+            full_accuracy = sum(full.predict(text) == intent for text, intent in held_out) / len(held_out)
+            incremental_accuracy = sum(model.predict(text, threshold=0)[0] == intent
+                                       for text, intent in held_out) / len(held_out)
+            self.stdout.write(f"{step:>4} {len(seen):>9} {len(known):>8} {full_seconds:>8.2f} "
+                              f"{full_accuracy:>9.1%} {incremental_seconds:>8.2f} {incremental_accuracy:>9.1%}")
+
+        sample = test[:300]
+        for name, predict in (('full', full.predict), ('incremental', lambda text: model.predict(text))):
+            latencies = []
+            for text, _ in sample:
+                started = time.perf_counter()
+                predict(text)
+                latencies.append((time.perf_counter() - started) * 1000)
+            latencies.sort()
+            self.stdout.write(f"{name:12} inference p50 {percentile(latencies, 0.50):.3f} ms, "
+                              f"p99 {percentile(latencies, 0.99):.3f} ms")
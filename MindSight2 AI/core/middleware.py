@@ -0,0 +1,63 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from . import ratelimit
+from .traffic import CAPTURED_ENDPOINTS, TrafficRecorder
+
+logger = logging.getLogger(__name__)
+
+
+class TrafficCaptureMiddleware(MiddlewareMixin):
+    """Record anonymized chat message arrivals for replay_traffic.
+    Removed from the stack at startup unless TRAFFIC_CAPTURE_PATH is set."""
+
+    def __init__(self, get_response):
+        if not settings.TRAFFIC_CAPTURE_PATH:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.recorder = TrafficRecorder(
+            settings.TRAFFIC_CAPTURE_PATH,
+            text_mode=settings.TRAFFIC_CAPTURE_TEXT,
+            sample_rate=settings.TRAFFIC_CAPTURE_SAMPLE_RATE,
+        )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method != 'POST' or request.resolver_match.url_name not in CAPTURED_ENDPOINTS:
+            return None
+        if not request.user.is_authenticated:
+            return None
+        message = request.POST.get('message', '').strip()
+        if message:
+            try:
+                self.recorder.record(request.resolver_match.url_name, request.user.pk, message, time.time())
+            except Exception as e:
+                logger.error(f"Traffic capture failed: {e}")
+        return None
+
+
+class RateLimitMiddleware(MiddlewareMixin):
+    """Answer 429 to clients over their per-user or per-IP rate on the
+    analysis endpoints (see core/ratelimit.py). Removed from the stack at
+    startup when RATE_LIMIT_ENABLED is off."""
+
+    def __init__(self, get_response):
+        if not settings.RATE_LIMIT_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.resolver_match.url_name not in ratelimit.RATE_LIMITED_ENDPOINTS:
+            return None
+        wait = ratelimit.check(request)
+        if not wait:
+            return None
+        logger.debug(f"Rate limited {request.path} for {ratelimit.client_ip(request)}")
+        response = JsonResponse({'success': False, 'error': 'Too many messages. Please wait a moment and try again.'},
+                                status=429)
+        response['Retry-After'] = ratelimit.retry_after(wait)
+        return response
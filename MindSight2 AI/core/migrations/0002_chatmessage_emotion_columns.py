@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:59
+
+from django.db import migrations, models
+
+EMOTIONS = ('joy', 'sadness', 'anger', 'fear', 'calm', 'neutral')
+
+
+def backfill_emotion_columns(apps, schema_editor):
+    """Populate the typed emotion columns from the existing JSON in pk chunks"""
+    ChatMessage = apps.get_model('core', 'ChatMessage')
+    fields = [f'emotion_{name}' for name in EMOTIONS] + ['dominant_emotion']
+    last_pk = 0
+    while True:
+        chunk = list(
+            ChatMessage.objects.filter(pk__gt=last_pk, emotions__isnull=False)
+            .order_by('pk').only('pk', 'emotions')[:2000]
+        )
+        if not chunk:
+            break
+        for message in chunk:
+            emotions = message.emotions if isinstance(message.emotions, dict) else {}
+            scores = [float(emotions.get(name) or 0.0) for name in EMOTIONS]
+            for name, score in zip(EMOTIONS, scores):
+                setattr(message, f'emotion_{name}', score)
+            best = max(range(len(EMOTIONS)), key=lambda index: scores[index])
+            message.dominant_emotion = best if scores[best] > 0 else EMOTIONS.index('neutral')
+        ChatMessage.objects.bulk_update(chunk, fields)
+        last_pk = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='dominant_emotion',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'joy'), (1, 'sadness'), (2, 'anger'), (3, 'fear'), (4, 'calm'), (5, 'neutral')], default=5),
+        ),
+        migrations.AddField(
+            model_name='chatmessage',
+            name='emotion_anger',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='chatmessage',
+            name='emotion_calm',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='chatmessage',
+            name='emotion_fear',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='chatmessage',
+            name='emotion_joy',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='chatmessage',
+            name='emotion_neutral',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='chatmessage',
+            name='emotion_sadness',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['user', 'timestamp', 'dominant_emotion'], name='chatmsg_user_ts_emotion_idx'),
+        ),
+        migrations.RunPython(backfill_emotion_columns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:10
+
+from django.db import migrations
+
+from core.search import install_search_index, remove_search_index
+
+
+def create_search_index(apps, schema_editor):
+    """GIN tsvector index on PostgreSQL, FTS5 table and triggers on SQLite"""
+    install_search_index(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    remove_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_chatarchive_partitioning'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_chatmessage_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MoodPoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.PositiveSmallIntegerField(choices=[(0, 'raw'), (1, 'hour'), (2, 'day'), (3, 'month')], default=0)),
+                ('start', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=1)),
+                ('sentiment_sum', models.FloatField(default=0.0)),
+                ('risk_sum', models.FloatField(default=0.0)),
+                ('risk_max', models.PositiveSmallIntegerField(default=0)),
+                ('emotion_joy', models.FloatField(default=0.0)),
+                ('emotion_sadness', models.FloatField(default=0.0)),
+                ('emotion_anger', models.FloatField(default=0.0)),
+                ('emotion_fear', models.FloatField(default=0.0)),
+                ('emotion_calm', models.FloatField(default=0.0)),
+                ('emotion_neutral', models.FloatField(default=0.0)),
+                ('rolled_up', models.BooleanField(default=False)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mood_points', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['start'],
+                'indexes': [models.Index(fields=['user', 'resolution', 'start'], name='moodpoint_user_res_start_idx'), models.Index(condition=models.Q(('rolled_up', False)), fields=['rolled_up', 'resolution'], name='moodpoint_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_mood_points'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='analysis_tier',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'keyword'), (1, 'lexicon'), (2, 'full')], default=0),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(condition=models.Q(('analysis_tier__lt', 2)), fields=['id'], name='chatmsg_pending_analysis_idx'),
+        ),
+    ]
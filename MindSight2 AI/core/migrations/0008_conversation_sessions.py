@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_job_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('last_message_at', models.DateTimeField()),
+                ('message_count', models.PositiveIntegerField(default=0)),
+                ('sentiment_sum', models.FloatField(default=0.0)),
+                ('sentiment_min', models.FloatField(default=0.0)),
+                ('risk_max', models.PositiveSmallIntegerField(default=0)),
+                ('emotion_joy', models.FloatField(default=0.0)),
+                ('emotion_sadness', models.FloatField(default=0.0)),
+                ('emotion_anger', models.FloatField(default=0.0)),
+                ('emotion_fear', models.FloatField(default=0.0)),
+                ('emotion_calm', models.FloatField(default=0.0)),
+                ('emotion_neutral', models.FloatField(default=0.0)),
+                ('dominant_emotion', models.PositiveSmallIntegerField(choices=[(0, 'joy'), (1, 'sadness'), (2, 'anger'), (3, 'fear'), (4, 'calm'), (5, 'neutral')], default=5)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-last_message_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='chatmessage',
+            name='session',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='messages', to='core.conversationsession'),
+        ),
+        migrations.AddIndex(
+            model_name='conversationsession',
+            index=models.Index(fields=['user', '-last_message_at'], name='session_user_last_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_conversation_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='chat_data_changed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
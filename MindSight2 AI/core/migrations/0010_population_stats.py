@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_user_chat_data_changed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopulationStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.PositiveSmallIntegerField(choices=[(1, 'hour'), (2, 'day'), (3, 'month')])),
+                ('start', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('high_risk_count', models.PositiveIntegerField(default=0)),
+                ('sentiment_sum', models.FloatField(default=0.0)),
+                ('sentiment_histogram', models.JSONField(default=list)),
+                ('risk_histogram', models.JSONField(default=list)),
+                ('emotion_counts', models.JSONField(default=list)),
+                ('hourly_counts', models.JSONField(default=list)),
+                ('hourly_high_risk', models.JSONField(default=list)),
+                ('users_hll', models.BinaryField(default=bytes)),
+            ],
+            options={
+                'ordering': ['start'],
+                'constraints': [models.UniqueConstraint(fields=('resolution', 'start'), name='populationstat_res_start_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:45
+
+from django.db import migrations
+
+from core.search import install_search_index
+
+
+def reinstall_search_index(apps, schema_editor):
+    """On SQLite, 0006 and 0008 copied core_chatmessage, which dropped the
+    FTS5 triggers from 0004. Recreate them and reindex the messages written since."""
+    install_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_population_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+    ]
@@ -2,13 +2,15 @@ from .chatbot import get_chatbot_response, initialize_chatbot
 
 __all__ = ['get_chatbot_response', 'initialize_chatbot']
 
+from django.utils.functional import SimpleLazyObject
+
 from .sentiment_analyzer import SentimentAnalyzer
 from .risk_assessor import RiskAssessor
 from .recommendation_engine import RecommendationEngine
 
-# Global instances
-sentiment_analyzer = SentimentAnalyzer()
-risk_assessor = RiskAssessor()
-recommendation_engine = RecommendationEngine()
+# Global instances, built on first use rather than at import time
+sentiment_analyzer = SimpleLazyObject(SentimentAnalyzer)
+risk_assessor = SimpleLazyObject(RiskAssessor)
+recommendation_engine = SimpleLazyObject(RecommendationEngine)
 
 __all__ = ['sentiment_analyzer', 'risk_assessor', 'recommendation_engine']
\ No newline at end of file
@@ -0,0 +1,150 @@
+"""
+Hot-reloadable data artifacts (keyword lists, weights, response tables).
+
+Each artifact is a JSON file ``<name>.json`` in ``settings.ML_ARTIFACT_DIR``
+with a ``version`` field. A worker loads it once and keeps the compiled form
+(regexes, lookup tables) in memory. At most every
+``settings.ML_ARTIFACT_CHECK_SECONDS`` a read stats the file; when the
+mtime changed, a background thread loads and compiles the new version and
+swaps it in with a single reference assignment. Requests never wait for a
+rebuild: they keep using the previous version until the swap, and a file that
+fails to load or compile is logged and ignored.
+
+Publish a new version with ``manage.py ml_artifacts publish``, which writes
+to a temporary file and renames it over the old one, so readers never see a
+half-written file.
+"""
+import importlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# name -> Artifact, filled as modules define their artifacts
+registry = {}
+
+# Modules that define artifacts; imported by discover() for management commands
+ARTIFACT_MODULES = (
+    'core.ml.risk_assessor',
+    'core.ml.chatbot',
+    'core.ml.recommendation_engine',
+    'core.views',
+)
+
+
+class ArtifactError(Exception):
+    pass
+
+
+class Artifact:
+    def __init__(self, name, compile):
+        self.name = name
+        self.compile = compile
+        self.version = None
+        self.mtime = None
+        self._value = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._reloading = False
+        registry[name] = self
+
+    @property
+    def path(self):
+        return os.path.join(settings.ML_ARTIFACT_DIR, f'{self.name}.json')
+
+    def read(self, path=None):
+        """Load and compile a file; returns ``(version, compiled, mtime)``"""
+        path = path or self.path
+        mtime = os.stat(path).st_mtime_ns
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        if 'version' not in data:
+            raise ArtifactError(f"{path} has no 'version'")
+        return data['version'], self.compile(data), mtime
+
+    def load(self):
+        """Load synchronously (first use, or an explicit reload)"""
+        version, value, mtime = self.read()
+        with self._lock:
+            self._value, self.version, self.mtime = value, version, mtime
+            self._next_check = time.monotonic() + settings.ML_ARTIFACT_CHECK_SECONDS
+        logger.info(f"Loaded artifact {self.name} version {version}")
+        return value
+
+    def get(self):
+        """Current compiled value; schedules a background reload when the file changed"""
+        value = self._value
+        if value is None:
+            return self.load()
+        if time.monotonic() >= self._next_check:
+            self._check()
+        return value
+
+    def _check(self):
+        with self._lock:
+            if self._reloading or time.monotonic() < self._next_check:
+                return
+            self._next_check = time.monotonic() + settings.ML_ARTIFACT_CHECK_SECONDS
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                logger.warning(f"Cannot stat artifact {self.name}: {e}")
+                return
+            if mtime == self.mtime:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, args=(mtime,), name=f'artifact-{self.name}',
+                         daemon=True).start()
+
+    def _reload(self, mtime):
+        try:
+            version, value, mtime = self.read()
+        except Exception as e:
+            logger.error(f"Keeping artifact {self.name} version {self.version}: reload failed: {e}")
+            with self._lock:
+                self.mtime = mtime  # do not retry until the file changes again
+                self._reloading = False
+            return
+        with self._lock:
+            self._value, self.version, self.mtime = value, version, mtime
+            self._reloading = False
+        logger.info(f"Swapped artifact {self.name} to version {version}")
+
+
+def discover():
+    """Import every artifact-defining module and return the registry"""
+    for module in ARTIFACT_MODULES:
+        importlib.import_module(module)
+    return registry
+
+
+def publish(name, data):
+    """Validate ``data`` with the artifact's compiler and atomically replace
+    its file, bumping the version. Returns the new version."""
+    artifact = registry[name]
+    current = None
+    if os.path.exists(artifact.path):
+        with open(artifact.path, 'r', encoding='utf-8') as file:
+            current = json.load(file).get('version')
+    data = dict(data, version=(current or 0) + 1)
+    artifact.compile(data)
+
+    directory = os.path.dirname(artifact.path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=f'.{name}.', suffix='.json', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            json.dump(data, file, indent=2, ensure_ascii=False)
+            file.write('\n')
+        os.replace(temp_path, artifact.path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return data['version']
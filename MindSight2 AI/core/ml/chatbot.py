@@ -1,70 +1,50 @@
 import random
 import os
 
+from django.conf import settings
+
+from .artifacts import Artifact
+from .retrieval import IntentIndex
+
+
+def compile_chatbot_responses(data):
+    patterns = {intent: list(words) for intent, words in data['patterns'].items()}
+    responses = {intent: list(replies) for intent, replies in data['responses'].items()}
+    if 'default' not in responses:
+        raise ValueError("chatbot_responses needs a 'default' response list")
+    index = IntentIndex((intent, pattern) for intent, words in patterns.items() for pattern in words)
+    return {'patterns': patterns, 'responses': responses, 'index': index}
+
+
+chatbot_responses = Artifact('chatbot_responses', compile_chatbot_responses)
+
+
 class ChatbotInterface:
     def __init__(self, model_path=None):
-        self.responses = {
-            'greeting': [
-                "Hello! How are you feeling today?",
-                "Hi there! How can I help you?",
-                "Hello! Would you like to talk about something?"
-            ],
-            'goodbye': [
-                "Goodbye! Take care!",
-                "Have a great day!",
-                "See you next time!"
-            ],
-            'thanks': [
-                "You're welcome!",
-                "Happy to help!",
-                "Anytime!"
-            ],
-            'feeling_good': [
-                "That's wonderful to hear!",
-                "I'm glad you're feeling good!",
-                "Great to know you're doing well!"
-            ],
-            'feeling_bad': [
-                "I'm sorry you're feeling this way. Would you like to talk about it?",
-                "It's okay to feel down sometimes. Want to share what's bothering you?",
-                "I'm here to listen if you want to talk about what's troubling you."
-            ],
-            'anxiety': [
-                "Take a deep breath. Can you tell me what's making you feel anxious?",
-                "Anxiety can be overwhelming. Would you like to talk about what's causing it?",
-                "I'm here to help you work through your anxiety. What's on your mind?"
-            ],
-            'default': [
-                "I'm here to listen. Could you tell me more about that?",
-                "Please feel free to share more.",
-                "I'm listening. Would you like to elaborate?"
-            ]
-        }
-        self.patterns = {
-            'greeting': ['hi', 'hello', 'hey', 'good morning', 'good evening'],
-            'goodbye': ['bye', 'goodbye', 'see you', 'take care'],
-            'thanks': ['thanks', 'thank you', 'appreciate'],
-            'feeling_good': ['good', 'great', 'happy', 'wonderful', 'awesome'],
-            'feeling_bad': ['sad', 'down', 'depressed', 'unhappy', 'upset'],
-            'anxiety': ['anxious', 'nervous', 'worried', 'stressed', 'anxiety']
-        }
+        self.model_path = model_path
+
+    @property
+    def patterns(self):
+        return chatbot_responses.get()['patterns']
+
+    @property
+    def responses(self):
+        return chatbot_responses.get()['responses']
     
+    @property
+    def index(self):
+        return chatbot_responses.get()['index']
+
     def predict_intent(self, message):
-        message = message.lower()
-        words = message.split()
-        
-        # Check each intent's patterns
-        for intent, patterns in self.patterns.items():
-            for pattern in patterns:
-                if pattern in message or pattern in words:
-                    return intent
-        
-        return 'default'
+        # Closest pattern by cosine similarity; 'default' when nothing is close enough
+        intent, _ = self.index.predict(message, settings.INTENT_MIN_SCORE)
+        return intent or 'default'
 
     def get_response(self, message):
         intent = self.predict_intent(message)
         import random
-        return random.choice(self.responses[intent])
+        responses = self.responses
+        return random.choice(responses.get(intent) or responses['default'])
 
     def chat(self, message):
         try:
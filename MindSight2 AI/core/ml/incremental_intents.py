@@ -0,0 +1,225 @@
+"""
+Incrementally trainable intent classifier.
+
+``MY_Model/train_chatbot.py`` refits a TF-IDF vocabulary and an SVC on the
+whole corpus whenever an intent changes. Here the features come from a
+``HashingVectorizer``, which is stateless, so there is no vocabulary to
+refit. Each intent has its own binary ``SGDClassifier`` (logistic loss)
+updated with ``partial_fit``, one-vs-rest, so a new intent is simply a new
+classifier.
+
+``update`` trains on the new patterns plus a bounded replay sample of earlier
+ones, so the older intents are not forgotten. Its cost depends on the size
+of the batch and of the replay sample, not on the size of the corpus.
+
+Published models are immutable, versioned pickles ``v<N>.pkl`` in
+``ML_ARTIFACT_DIR/intent_model``. ``current.json`` names the live version and is
+replaced atomically, so a reader sees the old model or the new one, never a
+half-written file. Rolling back means pointing ``current.json`` at an older
+version.
+"""
+import json
+import logging
+import os
+import pickle
+import random
+import re
+import tempfile
+
+import numpy as np
+from django.conf import settings
+
+from core.lazy import lazy_import
+
+feature_extraction = lazy_import('sklearn.feature_extraction.text')
+linear_model = lazy_import('sklearn.linear_model')
+
+logger = logging.getLogger(__name__)
+
+N_FEATURES = 2 ** 16
+REPLAY_PER_INTENT = 50
+EPOCHS = 5
+VERSIONS_KEPT = 5
+
+TOKEN_RE = re.compile(r'\w+')
+VERSION_FILE_RE = re.compile(r'v(\d+)\.pkl$')
+
+
+def preprocess(text):
+    """Same normalization as simple_preprocess in MY_Model/train_chatbot.py"""
+    return ' '.join(TOKEN_RE.findall(text.lower()))
+
+
+class IncrementalIntentModel:
+    def __init__(self, n_features=N_FEATURES, replay_per_intent=REPLAY_PER_INTENT, seed=0):
+        self.n_features = n_features
+        self.replay_per_intent = replay_per_intent
+        self.seed = seed
+        self.version = 0
+        self.classifiers = {}  # intent -> binary SGDClassifier
+        self.replay = {}       # intent -> reservoir sample of its patterns
+        self.seen = {}         # intent -> patterns folded in so far
+        self.trained = set()   # (intent, normalized pattern) pairs already trained on
+        self._rng = random.Random(seed)
+        self._vectorizer = None
+        self._weights = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_vectorizer'] = None
+        state['_weights'] = None
+        return state
+
+    @property
+    def intents(self):
+        return sorted(self.classifiers)
+
+    @property
+    def vectorizer(self):
+        if self._vectorizer is None:
+            self._vectorizer = feature_extraction.HashingVectorizer(
+                n_features=self.n_features, ngram_range=(1, 2), alternate_sign=False,
+                preprocessor=preprocess,
+            )
+        return self._vectorizer
+
+    def new_patterns(self, patterns):
+        """The ``(intent, pattern)`` pairs not trained on yet"""
+        fresh = {}
+        for intent, pattern in patterns:
+            key = (intent, preprocess(pattern))
+            if key[1] and key not in self.trained:
+                fresh.setdefault(key, (intent, pattern))
+        return list(fresh.values())
+
+    def update(self, patterns, epochs=EPOCHS):
+        """Fold ``(intent, pattern)`` pairs into the model; returns how many were new"""
+        fresh = self.new_patterns(patterns)
+        if not fresh:
+            return 0
+        batch = fresh + [(intent, pattern) for intent, kept in self.replay.items() for pattern in kept]
+        labels = np.array([intent for intent, _ in batch])
+        X = self.vectorizer.transform([pattern for _, pattern in batch])
+
+        for intent in {intent for intent, _ in fresh}:
+            if intent not in self.classifiers:
+                self.classifiers[intent] = linear_model.SGDClassifier(
+                    loss='log_loss', alpha=1e-4, random_state=self.seed,
+                )
+        order = np.arange(len(batch))
+        for _ in range(epochs):
+            self._rng.shuffle(order)
+            for intent, classifier in self.classifiers.items():
+                y = (labels[order] == intent).astype(np.int64)
+                positives = max(int(y.sum()), 1)
+                # Weight positives up so each one-vs-rest problem is balanced
+                weights = np.where(y == 1, (len(y) - positives) / positives, 1.0)
+                classifier.partial_fit(X[order], y, classes=[0, 1], sample_weight=weights)
+
+        for intent, pattern in fresh:
+            self.trained.add((intent, preprocess(pattern)))
+            self._remember(intent, pattern)
+        self._weights = None
+        return len(fresh)
+
+    def _remember(self, intent, pattern):
+        # Reservoir sampling keeps a uniform sample of each intent's patterns
+        kept = self.replay.setdefault(intent, [])
+        self.seen[intent] = self.seen.get(intent, 0) + 1
+        if len(kept) < self.replay_per_intent:
+            kept.append(pattern)
+        else:
+            slot = self._rng.randrange(self.seen[intent])
+            if slot < self.replay_per_intent:
+                kept[slot] = pattern
+
+    def _stacked(self):
+        # All classifiers as one (intents x features) matrix for a single product per query
+        if self._weights is None:
+            intents = self.intents
+            coef = np.vstack([self.classifiers[intent].coef_[0] for intent in intents])
+            intercept = np.array([self.classifiers[intent].intercept_[0] for intent in intents])
+            self._weights = (intents, coef.T.copy(), intercept)
+        return self._weights
+
+    def predict_proba(self, texts):
+        """``(intents, probabilities)`` with one normalized row per text"""
+        intents, coef, intercept = self._stacked()
+        scores = self.vectorizer.transform(texts) @ coef + intercept
+        probabilities = 1.0 / (1.0 + np.exp(-scores))
+        probabilities /= np.maximum(probabilities.sum(axis=1, keepdims=True), 1e-12)
+        return intents, probabilities
+
+    def predict(self, text, threshold=0.3):
+        """Best intent and its probability, or ``(None, probability)`` below ``threshold``"""
+        intents, probabilities = self.predict_proba([text])
+        best = int(np.argmax(probabilities[0]))
+        confidence = float(probabilities[0, best])
+        return (intents[best] if confidence >= threshold else None), confidence
+
+
+def intent_model_dir():
+    return os.path.join(settings.ML_ARTIFACT_DIR, 'intent_model')
+
+
+def _atomic_write(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}.', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+def current_version(directory=None):
+    path = os.path.join(directory or intent_model_dir(), 'current.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)['version']
+
+
+def versions(directory=None):
+    """Published versions on disk, oldest first"""
+    directory = directory or intent_model_dir()
+    if not os.path.isdir(directory):
+        return []
+    matches = (VERSION_FILE_RE.match(name) for name in os.listdir(directory))
+    return sorted(int(match.group(1)) for match in matches if match)
+
+
+def publish(model, directory=None):
+    """Write ``model`` as the next version and make it current; returns the version"""
+    directory = directory or intent_model_dir()
+    model.version = max(versions(directory), default=0) + 1
+    _atomic_write(os.path.join(directory, f'v{model.version}.pkl'), pickle.dumps(model))
+    _atomic_write(os.path.join(directory, 'current.json'),
+                  json.dumps({'version': model.version, 'intents': model.intents}).encode())
+    for old in versions(directory)[:-VERSIONS_KEPT]:
+        os.unlink(os.path.join(directory, f'v{old}.pkl'))
+    logger.info(f"Published intent model version {model.version} ({len(model.intents)} intents)")
+    return model.version
+
+
+def load(version=None, directory=None):
+    """The current published model (or ``version``); None when nothing is published"""
+    directory = directory or intent_model_dir()
+    version = version or current_version(directory)
+    if version is None:
+        return None
+    with open(os.path.join(directory, f'v{version}.pkl'), 'rb') as file:
+        return pickle.load(file)
+
+
+def set_current(version, directory=None):
+    """Point ``current.json`` at an existing version (rollback)"""
+    directory = directory or intent_model_dir()
+    model = load(version, directory)
+    _atomic_write(os.path.join(directory, 'current.json'),
+                  json.dumps({'version': version, 'intents': model.intents}).encode())
+    return model
@@ -0,0 +1,248 @@
+"""
+Precompiled polarity/subjectivity lexicon scorer.
+
+A NumPy port of the pattern analyzer behind ``TextBlob(text).sentiment``.
+The lexicon (TextBlob's en-sentiment.xml with per-sense scores averaged,
+derived "-ly" adverbs and emoticons) is compiled once by
+``manage.py build_sentiment_lexicon`` into ``data/sentiment_lexicon.npz``:
+a sorted word array plus polarity, subjectivity, intensity and modifier
+arrays. ``score_batch`` maps tokens to indices with one dict lookup each and
+computes everything else with array operations over the whole batch:
+modifiers such as "very good", negation such as "not good", exclamation
+boosts and the per-message averages. ``score`` applies the same rules to a
+single message in one pass of dict lookups, because setting up the arrays
+would cost more than the scoring. Neither TextBlob nor NLTK data is needed.
+
+Tolerance: polarity is identical to TextBlob on the intents corpus and its
+negation/modifier variants (``build_sentiment_lexicon --check``), and within
+0.05 for about 98% of random lexicon word sequences. The remaining differences
+come from tokenizer corner cases (abbreviations, hyphenation) and
+"really not good"-style negations following a modifier.
+"""
+import logging
+import os
+import re
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LEXICON_PATH = os.path.join(os.path.dirname(__file__), 'data', 'sentiment_lexicon.npz')
+
+NEGATIONS = ('no', 'not', "n't", 'never')
+PUNCTUATION = ".,;:!?()[]{}`'\"@#$^&*+-|=~_"
+EXCLAMATION_BOOST = 1.25
+NEGATION_FACTOR = -0.5
+
+# Same contraction handling as pattern's find_tokens
+REPLACEMENTS = [("'d", " 'd"), ("'m", " 'm"), ("'s", " 's"), ("'ll", " 'll"),
+                ("'re", " 're"), ("'ve", " 've"), ("n't", " n't")]
+
+
+class LexiconScorer:
+    def __init__(self, words, polarity, subjectivity, intensity, modifier):
+        self.words = list(words)
+        self.index = {word: i for i, word in enumerate(self.words)}
+        self.polarity = np.asarray(polarity, dtype=np.float64)
+        self.subjectivity = np.asarray(subjectivity, dtype=np.float64)
+        self.intensity = np.asarray(intensity, dtype=np.float64)
+        self.modifier = np.asarray(modifier, dtype=bool)
+        self.emoticon = np.array([not w[0].isalnum() for w in self.words], dtype=bool)
+        # Per-token attributes as plain tuples for the scalar path in score()
+        self._entries = {
+            word: (p, s, i, m, e) for word, p, s, i, m, e in zip(
+                self.words, self.polarity.tolist(), self.subjectivity.tolist(), self.intensity.tolist(),
+                self.modifier.tolist(), self.emoticon.tolist())
+        }
+
+        emoticons = sorted((w for w in self.words if not w[0].isalnum()), key=len, reverse=True)
+        punct = re.escape(PUNCTUATION)
+        alternatives = [re.escape(e) for e in emoticons] + [
+            r'\.\.\.',
+            rf'[^\s{punct}]+(?:[{punct}][^\s{punct}]+)*',
+            r'\S',
+        ]
+        self._token_re = re.compile('|'.join(alternatives))
+
+    @classmethod
+    def load(cls, path=LEXICON_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['words'].tolist(), data['polarity'], data['subjectivity'],
+                       data['intensity'], data['modifier'])
+
+    def save(self, path=LEXICON_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez_compressed(path, words=np.array(self.words), polarity=self.polarity,
+                            subjectivity=self.subjectivity, intensity=self.intensity,
+                            modifier=self.modifier)
+
+    def tokenize(self, text):
+        for old, new in REPLACEMENTS:
+            text = text.replace(old, new)
+        text = text.replace("'", " ' ").replace('"', ' " ')
+        return [token.lower() for token in self._token_re.findall(text)]
+
+    def score(self, text):
+        """(polarity, subjectivity) for one message.
+
+        The rules of ``score_batch`` as one pass of dict lookups. Setting up
+        the arrays costs more than scoring a single short message."""
+        entries = self._entries
+        groups = []  # [polarity, subjectivity, negated, exclamations] per assessment
+        group = None  # assessment of the last known token
+        last_word = None  # entry of the last lexicon word
+        last_intensity = 1.0  # effective intensity of the last known token
+        modifier_open = False  # last_word is a modifier with no breaking token since
+        negation_open = False  # a negation with no breaking token since
+        for token in self.tokenize(text):
+            if token == '!' and group is not None:
+                group[3] += 1
+            entry = entries.get(token)
+            is_word = entry is not None and not entry[4]
+            if entry is not None:
+                p, s, i, modifier, emoticon = entry
+                negated = negation_open and not emoticon
+                if is_word and modifier_open and last_word[3]:
+                    p = min(max(p * last_intensity, -1.0), 1.0)
+                    s = min(max(s * last_intensity, -1.0), 1.0)
+                    group[0], group[1] = p, s
+                    group[2] = group[2] or negated
+                else:
+                    group = [p, s, negated, 0]
+                    groups.append(group)
+                last_intensity = 1.0 / i if negated else i
+                if is_word:
+                    last_word = entry
+                    modifier_open = True
+            if not is_word and len(token) > 2:
+                modifier_open = False
+            if token in NEGATIONS:
+                negation_open = True
+            elif is_word or len(token.strip("'")) > 1:
+                negation_open = False
+
+        if not groups:
+            return 0.0, 0.0
+        polarity = subjectivity = 0.0
+        for p, s, negated, exclamations in groups:
+            if exclamations:
+                p = min(max(p * EXCLAMATION_BOOST ** exclamations, -1.0), 1.0)
+            if negated:
+                p *= NEGATION_FACTOR
+            polarity += p
+            subjectivity += s
+        return polarity / len(groups), subjectivity / len(groups)
+
+    def score_batch(self, texts, with_counts=False):
+        """(polarity, subjectivity) arrays for a batch of messages; with_counts
+        adds the number of assessments averaged for each message, so scores of
+        consecutive chunks of one text can be combined"""
+        token_lists = [self.tokenize(text) for text in texts]
+        lengths = np.array([len(tokens) for tokens in token_lists], dtype=np.int64)
+        tokens = [token for token_list in token_lists for token in token_list]
+        n_texts = len(texts)
+        if not tokens:
+            return self._empty(n_texts, with_counts)
+
+        lookup = self.index.get
+        ids = np.fromiter((lookup(token, -1) for token in tokens), dtype=np.int64, count=len(tokens))
+        message = np.repeat(np.arange(n_texts), lengths)
+        positions = np.arange(len(tokens))
+
+        known = ids >= 0
+        safe_ids = np.where(known, ids, 0)
+        # Emoticons add their own assessment but otherwise behave like unknown words
+        emoticon = known & self.emoticon[safe_ids]
+        word = known & ~emoticon
+        is_negation = np.fromiter((token in NEGATIONS for token in tokens), dtype=bool, count=len(tokens))
+        is_bang = np.fromiter((token == '!' for token in tokens), dtype=bool, count=len(tokens))
+        short = np.fromiter((len(token) <= 2 for token in tokens), dtype=bool, count=len(tokens))
+        short_for_negation = np.fromiter((len(token.strip("'")) <= 1 for token in tokens),
+                                         dtype=bool, count=len(tokens))
+        message_start = np.zeros(len(tokens), dtype=bool)
+        message_start[np.cumsum(lengths)[:-1][lengths[1:] > 0]] = True
+        message_start[0] = True
+
+        def last_before(mask):
+            # Index of the last position before each token where mask is set (-1 if none)
+            marks = np.where(mask, positions, -1)
+            last = np.maximum.accumulate(marks)
+            return np.concatenate(([-1], last[:-1]))
+
+        first_of_message = last_before(message_start)
+        first_of_message[message_start] = positions[message_start]
+
+        # A modifier ("very") stays active across unknown words of 1-2 chars
+        last_known = last_before(known)
+        last_word = last_before(word)
+        modifier_breaker = last_before(~word & ~short)
+        modifier_active = (
+            (last_word >= first_of_message) & (last_word > modifier_breaker)
+            & self.modifier[safe_ids[np.maximum(last_word, 0)]]
+        )
+
+        # A negation stays active across small words and is cleared by any other word
+        last_negation = last_before(is_negation)
+        negation_breaker = last_before(~is_negation & (word | ~short_for_negation))
+        negated = (last_negation >= first_of_message) & (last_negation > negation_breaker) & ~emoticon
+
+        # Each known word not preceded by a modifier starts a new assessment
+        starts = emoticon | (word & ~modifier_active)
+        group = np.cumsum(starts) - 1
+
+        p = self.polarity[safe_ids]
+        s = self.subjectivity[safe_ids]
+        i = self.intensity[safe_ids]
+        effective_intensity = np.where(negated, 1.0 / i, i)
+        merged = word & modifier_active
+        previous_intensity = effective_intensity[np.maximum(last_known, 0)]
+        p = np.where(merged, np.clip(p * previous_intensity, -1.0, 1.0), p)
+        s = np.where(merged, np.clip(s * previous_intensity, -1.0, 1.0), s)
+
+        known_positions = positions[known]
+        known_groups = group[known]
+        n_groups = int(known_groups[-1]) + 1 if len(known_groups) else 0
+        if n_groups == 0:
+            return self._empty(n_texts, with_counts)
+
+        # The group keeps the scores of its last word
+        is_last = np.r_[known_groups[1:] != known_groups[:-1], True]
+        group_p = p[known_positions[is_last]]
+        group_s = s[known_positions[is_last]]
+        group_negated = np.zeros(n_groups, dtype=bool)
+        np.logical_or.at(group_negated, known_groups, negated[known])
+        group_message = message[known_positions[is_last]]
+
+        # Exclamation marks boost the assessment before them in the same message
+        bangs = is_bang & (last_known >= first_of_message)
+        if bangs.any():
+            boosts = np.bincount(group[last_known[bangs]], minlength=n_groups)
+            group_p = np.clip(group_p * EXCLAMATION_BOOST ** boosts, -1.0, 1.0)
+
+        group_p = np.where(group_negated, group_p * NEGATION_FACTOR, group_p)
+
+        counts = np.bincount(group_message, minlength=n_texts)
+        denominator = np.maximum(counts, 1)
+        polarity = np.bincount(group_message, weights=group_p, minlength=n_texts) / denominator
+        subjectivity = np.bincount(group_message, weights=group_s, minlength=n_texts) / denominator
+        if with_counts:
+            return polarity, subjectivity, counts
+        return polarity, subjectivity
+
+    @staticmethod
+    def _empty(n_texts, with_counts):
+        if with_counts:
+            return np.zeros(n_texts), np.zeros(n_texts), np.zeros(n_texts, dtype=np.int64)
+        return np.zeros(n_texts), np.zeros(n_texts)
+
+
+_scorer = None
+
+
+def get_lexicon_scorer():
+    """Shared scorer, loaded on first use; None when the lexicon has not been built"""
+    global _scorer
+    if _scorer is None and os.path.exists(LEXICON_PATH):
+        _scorer = LexiconScorer.load()
+        logger.info(f"Loaded sentiment lexicon with {len(_scorer.words)} entries")
+    return _scorer
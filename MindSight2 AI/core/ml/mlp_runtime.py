@@ -0,0 +1,126 @@
+"""
+NumPy-only inference for the bag-of-words intent MLP trained by
+``train_chatbot.py`` (Dense-Dropout-Dense-Dropout-Dense softmax).
+
+``export_keras_mlp`` writes the Dense weights, vocabulary and class names to a
+compact ``.npz``; ``MLPIntentModel`` loads that file and runs the forward pass
+with plain matrix products, so serving needs neither TensorFlow nor its
+start-up cost. Dropout is the identity at inference time and is skipped.
+
+This is an export-only path. Chat serving uses the retrieval and incremental
+intent models, not this MLP. ``core/tests.py`` checks parity against Keras.
+"""
+import logging
+
+import numpy as np
+
+from core.lazy import lazy_import
+
+nltk = lazy_import('nltk')
+
+logger = logging.getLogger(__name__)
+
+ACTIVATIONS = ('linear', 'relu', 'sigmoid', 'tanh', 'softmax')
+IGNORE_CHARS = ['?', '!', '.', ',']
+
+# Maximum absolute difference between Keras and NumPy probabilities
+PARITY_TOLERANCE = 1e-5
+
+
+def export_keras_mlp(model, words, classes, path):
+    """Write the Dense layers of a trained Keras model to ``path`` (.npz)"""
+    arrays = {}
+    activations = []
+    for layer in model.layers:
+        weights = layer.get_weights()
+        if not weights:
+            continue  # Dropout and other weightless layers
+        activation = layer.get_config().get('activation', 'linear')
+        if activation not in ACTIVATIONS:
+            raise ValueError(f"Unsupported activation '{activation}' in layer {layer.name}")
+        index = len(activations)
+        arrays[f'W{index}'] = np.asarray(weights[0], dtype=np.float32)
+        arrays[f'b{index}'] = np.asarray(weights[1], dtype=np.float32)
+        activations.append(activation)
+
+    np.savez_compressed(
+        path,
+        activations=np.array(activations),
+        words=np.array(words),
+        classes=np.array(classes),
+        **arrays,
+    )
+    logger.info(f"Exported {len(activations)} dense layers to {path}")
+
+
+def _apply_activation(x, activation):
+    if activation == 'relu':
+        return np.maximum(x, 0, out=x)
+    if activation == 'sigmoid':
+        return 1.0 / (1.0 + np.exp(-x))
+    if activation == 'tanh':
+        return np.tanh(x)
+    if activation == 'softmax':
+        x = x - x.max(axis=1, keepdims=True)
+        np.exp(x, out=x)
+        x /= x.sum(axis=1, keepdims=True)
+        return x
+    return x
+
+
+class MLPIntentModel:
+    def __init__(self, layers, words, classes):
+        self.layers = layers  # list of (W, b, activation)
+        self.words = list(words)
+        self.classes = list(classes)
+        self.word_index = {word: index for index, word in enumerate(self.words)}
+        self._lemmatizer = None
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            activations = [str(name) for name in data['activations']]
+            layers = [
+                (data[f'W{index}'], data[f'b{index}'], activation)
+                for index, activation in enumerate(activations)
+            ]
+            return cls(layers, data['words'].tolist(), data['classes'].tolist())
+
+    def predict(self, X):
+        """Class probabilities for one bag-of-words vector or a batch of them"""
+        X = np.asarray(X, dtype=np.float32)
+        single = X.ndim == 1
+        x = X.reshape(1, -1) if single else X
+        for W, b, activation in self.layers:
+            x = _apply_activation(x @ W + b, activation)
+        return x[0] if single else x
+
+    def bag_of_words(self, sentence):
+        """Encode a sentence the same way train_chatbot.py encodes patterns"""
+        if self._lemmatizer is None:
+            self._lemmatizer = nltk.stem.WordNetLemmatizer()
+        bag = np.zeros(len(self.words), dtype=np.float32)
+        for token in nltk.word_tokenize(sentence):
+            if token in IGNORE_CHARS:
+                continue
+            index = self.word_index.get(self._lemmatizer.lemmatize(token.lower()))
+            if index is not None:
+                bag[index] = 1.0
+        return bag
+
+    def predict_classes(self, sentence, threshold=0.25):
+        """Return ``[(class, probability), ...]`` above ``threshold``, best first"""
+        probabilities = self.predict(self.bag_of_words(sentence))
+        ranked = np.argsort(probabilities)[::-1]
+        return [(self.classes[i], float(probabilities[i])) for i in ranked if probabilities[i] > threshold]
+
+
+def check_parity(keras_model, runtime, X, atol=PARITY_TOLERANCE):
+    """Compare Keras and NumPy outputs on ``X``; raises if they drift past ``atol``"""
+    X = np.asarray(X, dtype=np.float32)
+    expected = keras_model.predict(X, verbose=0)
+    actual = runtime.predict(X)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    if max_diff > atol:
+        raise AssertionError(f"NumPy runtime diverges from Keras (max abs diff {max_diff:.2e} > {atol:.0e})")
+    return max_diff
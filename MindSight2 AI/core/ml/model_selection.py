@@ -0,0 +1,163 @@
+"""
+Model selection for the intent classifier of ``MY_Model/train_chatbot.py``.
+
+Every candidate is a feature setting (TF-IDF options) paired with a
+classifier. Each one is scored by grouped cross-validation: all chat-like
+variants of a pattern fall in the same fold, so a candidate is never tested
+on a rewording of a sentence it trained on. The TF-IDF matrices for each
+(feature setting, fold) pair are computed once. They are cached on disk with
+``joblib.Memory`` and shared by every classifier, so adding a classifier
+costs no extra featurization.
+
+Featurization and the (candidate, fold) fits run in parallel with
+``joblib.Parallel`` across all cores. For each candidate the harness reports:
+
+- accuracy;
+- training time;
+- single-message prediction latency;
+- pickled model size.
+
+``pareto_front`` keeps the candidates that no other candidate beats on
+accuracy, latency and size at once. ``best`` picks the most accurate of
+those. Every candidate provides ``predict_proba``, because
+``MY_Model/chat.py`` thresholds on the confidence.
+"""
+import pickle
+import time
+
+import numpy as np
+
+from core.lazy import lazy_import
+
+joblib = lazy_import('joblib')
+calibration = lazy_import('sklearn.calibration')
+feature_extraction = lazy_import('sklearn.feature_extraction.text')
+linear_model = lazy_import('sklearn.linear_model')
+model_selection = lazy_import('sklearn.model_selection')
+naive_bayes = lazy_import('sklearn.naive_bayes')
+preprocessing = lazy_import('sklearn.preprocessing')
+svm = lazy_import('sklearn.svm')
+
+FOLDS = 5
+LATENCY_SAMPLES = 100
+
+# name -> TfidfVectorizer keyword arguments
+FEATURE_SETTINGS = {
+    'word-1-2-stop': {'stop_words': 'english', 'ngram_range': (1, 2)},  # train_chatbot.py today
+    'word-1-2': {'ngram_range': (1, 2)},
+    'word-1': {'ngram_range': (1, 1)},
+    'char-2-4': {'analyzer': 'char_wb', 'ngram_range': (2, 4), 'sublinear_tf': True},
+}
+
+
+def classifiers():
+    """name -> factory of an unfitted classifier with predict_proba"""
+    return {
+        'svc-linear-proba': lambda: svm.SVC(kernel='linear', probability=True, C=1.0, class_weight='balanced'),
+        'linear-svc-calibrated': lambda: calibration.CalibratedClassifierCV(
+            svm.LinearSVC(C=1.0, class_weight='balanced'), cv=3),
+        'logistic': lambda: linear_model.LogisticRegression(C=10.0, max_iter=1000, class_weight='balanced'),
+        'sgd-log': lambda: linear_model.SGDClassifier(loss='log_loss', alpha=1e-4, class_weight='balanced',
+                                                      random_state=0),
+        'complement-nb': lambda: naive_bayes.ComplementNB(alpha=0.3),
+    }
+
+
+def folds(labels, groups, n_folds=FOLDS, seed=0):
+    """(train, test) index arrays; variants of one pattern never straddle a split"""
+    splitter = model_selection.StratifiedGroupKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+    return list(splitter.split(np.zeros(len(labels)), labels, groups))
+
+
+def featurize(texts, feature_setting, train, test):
+    """Fit the TF-IDF vectorizer on the training rows; returns (vectorizer, X_train, X_test)"""
+    vectorizer = feature_extraction.TfidfVectorizer(**FEATURE_SETTINGS[feature_setting])
+    texts = np.asarray(texts, dtype=object)
+    return vectorizer, vectorizer.fit_transform(texts[train]), vectorizer.transform(texts[test])
+
+
+def fit_and_score(classifier_name, vectorizer, X_train, y_train, X_test, y_test, test_texts):
+    """One (candidate, fold) evaluation"""
+    model = classifiers()[classifier_name]()
+    started = time.perf_counter()
+    model.fit(X_train, y_train)
+    train_seconds = time.perf_counter() - started
+
+    accuracy = float(np.mean(model.predict(X_test) == y_test))
+    latencies = []
+    for text in test_texts[:LATENCY_SAMPLES]:
+        started = time.perf_counter()
+        model.predict_proba(vectorizer.transform([text]))
+        latencies.append(time.perf_counter() - started)
+    return {
+        'accuracy': accuracy,
+        'train_seconds': train_seconds,
+        'latency_ms': float(np.median(latencies)) * 1000,
+        'size_bytes': len(pickle.dumps((vectorizer, model))),
+    }
+
+
+def evaluate(texts, labels, groups, feature_settings=None, classifier_names=None, n_jobs=-1,
+             cache_dir=None, seed=0):
+    """Cross-validate every (feature setting, classifier) candidate.
+    Returns one summary dict per candidate, averaged over the folds."""
+    feature_settings = list(feature_settings or FEATURE_SETTINGS)
+    classifier_names = list(classifier_names or classifiers())
+    labels = np.asarray(labels)
+    texts = list(texts)
+    splits = folds(labels, groups, seed=seed)
+
+    memory = joblib.Memory(cache_dir, verbose=0)
+    cached_featurize = memory.cache(featurize)
+    parallel = joblib.Parallel(n_jobs=n_jobs)
+    features = parallel(joblib.delayed(cached_featurize)(texts, setting, train, test)
+                        for setting in feature_settings for train, test in splits)
+    features = {(setting, fold): features[i * len(splits) + fold]
+                for i, setting in enumerate(feature_settings) for fold in range(len(splits))}
+
+    jobs = [(setting, name, fold) for setting in feature_settings for name in classifier_names
+            for fold in range(len(splits))]
+    texts_array = np.asarray(texts, dtype=object)
+    scores = parallel(
+        joblib.delayed(fit_and_score)(
+            name, features[setting, fold][0], features[setting, fold][1], labels[splits[fold][0]],
+            features[setting, fold][2], labels[splits[fold][1]], list(texts_array[splits[fold][1]]),
+        )
+        for setting, name, fold in jobs
+    )
+
+    results = {}
+    for (setting, name, _), score in zip(jobs, scores):
+        results.setdefault((setting, name), []).append(score)
+    return [
+        {'features': setting, 'classifier': name,
+         **{key: float(np.mean([score[key] for score in fold_scores])) for key in fold_scores[0]}}
+        for (setting, name), fold_scores in results.items()
+    ]
+
+
+def pareto_front(results):
+    """Candidates not dominated on (higher accuracy, lower latency, smaller size)"""
+    def dominates(a, b):
+        no_worse = (a['accuracy'] >= b['accuracy'] and a['latency_ms'] <= b['latency_ms']
+                    and a['size_bytes'] <= b['size_bytes'])
+        better = (a['accuracy'] > b['accuracy'] or a['latency_ms'] < b['latency_ms']
+                  or a['size_bytes'] < b['size_bytes'])
+        return no_worse and better
+
+    return [result for result in results if not any(dominates(other, result) for other in results)]
+
+
+def best(results):
+    """The most accurate Pareto-optimal candidate (faster one on ties)"""
+    return max(pareto_front(results), key=lambda result: (round(result['accuracy'], 3), -result['latency_ms']))
+
+
+def fit_final(texts, labels, feature_setting, classifier_name):
+    """Refit a candidate on all data, in the format MY_Model/chat.py loads"""
+    label_encoder = preprocessing.LabelEncoder()
+    y = label_encoder.fit_transform(labels)
+    vectorizer = feature_extraction.TfidfVectorizer(**FEATURE_SETTINGS[feature_setting])
+    model = classifiers()[classifier_name]()
+    model.fit(vectorizer.fit_transform(texts), y)
+    return {'model': model, 'vectorizer': vectorizer, 'label_encoder': label_encoder}
@@ -0,0 +1,123 @@
+"""
+Nearest-neighbour intent retrieval.
+
+Every intent pattern is turned into a TF-IDF weighted, L2-normalized sparse
+vector once, when the response table is loaded. The features are words, word
+bigrams and character trigrams of each word (with word-boundary marks), so
+"feeling down" outranks a lone "down", and typos still match. The vectors are
+stored as an inverted index: for each feature, NumPy arrays of the patterns
+containing it and their weights. A query touches only the postings of its
+own features, so a lookup costs about the same for 30 patterns as for 50 000.
+
+``search`` returns the top-k patterns by cosine similarity. ``predict``
+returns the best intent, or None when its score is below the confidence
+threshold, so callers can fall back to a default reply. Whole words are
+matched, so "hi" no longer matches inside "this".
+"""
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# Character trigrams catch typos and inflections; words and bigrams dominate
+CHAR_WEIGHT = 0.3
+BIGRAM_WEIGHT = 1.5
+TOP_K = 5
+
+
+def features(text):
+    """Sparse term counts of one text: words, word bigrams and character trigrams"""
+    words = TOKEN_RE.findall(text.lower())
+    counts = Counter(f'w:{word}' for word in words)
+    for first, second in zip(words, words[1:]):
+        counts[f'b:{first} {second}'] += BIGRAM_WEIGHT
+    for word in words:
+        padded = f'#{word}#'
+        for i in range(len(padded) - 2):
+            counts[f'c:{padded[i:i + 3]}'] += CHAR_WEIGHT
+    return counts
+
+
+class IntentIndex:
+    def __init__(self, entries):
+        """``entries`` is an iterable of ``(intent, pattern)`` pairs"""
+        self.intents = []
+        self.patterns = []
+        rows = []
+        for intent, pattern in entries:
+            counts = features(pattern)
+            if counts:
+                self.intents.append(intent)
+                self.patterns.append(pattern)
+                rows.append(counts)
+        n_patterns = len(rows)
+
+        document_frequency = Counter(feature for counts in rows for feature in counts)
+        self.vocabulary = {feature: column for column, feature in enumerate(document_frequency)}
+        self.idf = np.array([math.log((1 + n_patterns) / (1 + document_frequency[feature])) + 1
+                             for feature in self.vocabulary])
+
+        # Build the index column by column (CSC layout: postings of a feature are contiguous)
+        sizes = [len(counts) for counts in rows]
+        row_ids = np.repeat(np.arange(n_patterns, dtype=np.int64), sizes)
+        columns = np.fromiter((self.vocabulary[f] for counts in rows for f in counts),
+                              dtype=np.int64, count=len(row_ids))
+        weights = np.fromiter((w for counts in rows for w in counts.values()),
+                              dtype=np.float64, count=len(row_ids)) * self.idf[columns]
+        norms = np.sqrt(np.bincount(row_ids, weights=weights ** 2, minlength=n_patterns))
+        weights /= norms[row_ids]
+
+        order = np.argsort(columns, kind='stable')
+        self._postings = row_ids[order]
+        self._weights = weights[order]
+        self._starts = np.concatenate(([0], np.cumsum(np.bincount(columns, minlength=len(self.vocabulary)))))
+
+    @classmethod
+    def from_intents(cls, data):
+        """Index the patterns of an intents.json document"""
+        return cls((intent['tag'], pattern) for intent in data['intents'] for pattern in intent.get('patterns', []))
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def vectorize(self, text):
+        """Columns and normalized weights of a query; features unseen in the patterns are dropped"""
+        counts = features(text)
+        known = [(self.vocabulary[f], w) for f, w in counts.items() if f in self.vocabulary]
+        if not known:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        columns = np.array([column for column, _ in known], dtype=np.int64)
+        weights = np.array([weight for _, weight in known]) * self.idf[columns]
+        # Unknown features still count towards the query norm, so off-topic text scores low
+        norm = math.sqrt(float(weights @ weights) + sum(w * w for f, w in counts.items()
+                                                         if f not in self.vocabulary))
+        return columns, weights / norm
+
+    def search(self, text, k=TOP_K):
+        """Up to ``k`` ``(intent, pattern, score)`` tuples, best first, by cosine similarity"""
+        columns, query = self.vectorize(text)
+        if not len(columns):
+            return []
+        starts, ends = self._starts[columns], self._starts[columns + 1]
+        lengths = ends - starts
+        # Gather the postings of all query features in one go
+        positions = np.repeat(ends - np.cumsum(lengths), lengths) + np.arange(lengths.sum())
+        hits, slot = np.unique(self._postings[positions], return_inverse=True)
+        scores = np.bincount(slot, weights=self._weights[positions] * np.repeat(query, lengths))
+        if len(hits) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+        else:
+            best = np.arange(len(hits))
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [(self.intents[hits[i]], self.patterns[hits[i]], float(scores[i])) for i in best]
+
+    def predict(self, text, threshold):
+        """Best intent and its score, or ``(None, score)`` below ``threshold``"""
+        results = self.search(text, k=1)
+        if not results:
+            return None, 0.0
+        intent, _, score = results[0]
+        return (intent if score >= threshold else None), score
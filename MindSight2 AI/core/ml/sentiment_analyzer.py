@@ -1,12 +1,26 @@
-import nltk
-from textblob import TextBlob
 import logging
 
+from core.lazy import lazy_import
+from .lexicon import get_lexicon_scorer
+
+# TextBlob is only a fallback for when the compiled lexicon is missing
+textblob = lazy_import('textblob')
+
 logger = logging.getLogger(__name__)
 
 class SentimentAnalyzer:
     def __init__(self):
+        self.lexicon = get_lexicon_scorer()
+        if self.lexicon is None:
+            logger.warning("Sentiment lexicon not built, falling back to TextBlob")
         logger.info("Sentiment analyzer initialized")
+
+    def polarity_subjectivity(self, text):
+        """(polarity, subjectivity) from the compiled lexicon, or TextBlob as a fallback"""
+        if self.lexicon is not None:
+            return self.lexicon.score(text)
+        sentiment = textblob.TextBlob(text).sentiment
+        return sentiment.polarity, sentiment.subjectivity
     
     def analyze_emotions(self, text):
         """Enhanced emotion analysis using TextBlob and NLTK"""
@@ -14,9 +28,7 @@ class SentimentAnalyzer:
             return {"neutral": 1.0}
         
         try:
-            analysis = TextBlob(text)
-            polarity = analysis.sentiment.polarity
-            subjectivity = analysis.sentiment.subjectivity
+            polarity, subjectivity = self.polarity_subjectivity(text)
             
             # Enhanced emotion mapping based on sentiment analysis
             if polarity > 0.3:
@@ -40,10 +52,15 @@ class SentimentAnalyzer:
     def analyze_sentiment_intensity(self, text):
         """Get sentiment score (-1 to 1)"""
         try:
-            analysis = TextBlob(text)
-            return analysis.sentiment.polarity
+            return self.polarity_subjectivity(text)[0]
         except:
             return 0.0
+
+    def analyze_sentiment_batch(self, texts):
+        """Sentiment scores (-1 to 1) for a list of messages"""
+        if self.lexicon is not None:
+            return self.lexicon.score_batch(texts)[0].tolist()
+        return [self.analyze_sentiment_intensity(text) for text in texts]
     
     def get_dominant_emotion(self, text):
         emotions = self.analyze_emotions(text)
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 class User(AbstractUser):
@@ -20,6 +21,9 @@ class User(AbstractUser):
     risk_history = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     last_active = models.DateTimeField(auto_now=True)
+    # Last insert, update or delete of the user's chat messages; validates the
+    # cached dashboard and report data (see core/conditional.py)
+    chat_data_changed_at = models.DateTimeField(null=True, blank=True, editable=False)
     
     class Meta:
         verbose_name = _('user')
@@ -28,24 +32,85 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+# Core emotion dimensions stored as typed columns on ChatMessage.
+# The position in this tuple is the value stored in ChatMessage.dominant_emotion.
+EMOTIONS = ('joy', 'sadness', 'anger', 'fear', 'calm', 'neutral')
+NEUTRAL_EMOTION = EMOTIONS.index('neutral')
+
+
 class ChatMessage(models.Model):
     """
     Model to store chat interactions between user and chatbot
     """
+    EMOTION_CHOICES = [(index, name) for index, name in enumerate(EMOTIONS)]
+    EMOTION_FIELDS = [f'emotion_{name}' for name in EMOTIONS] + ['dominant_emotion']
+    # Analysis tiers, cheapest first (see core/analysis.py)
+    TIER_KEYWORD, TIER_LEXICON, TIER_FULL = range(3)
+    TIER_CHOICES = [(TIER_KEYWORD, 'keyword'), (TIER_LEXICON, 'lexicon'), (TIER_FULL, 'full')]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Assigned at write time by inactivity gap (see core/conversations.py)
+    session = models.ForeignKey('ConversationSession', on_delete=models.SET_NULL, null=True, blank=True,
+                                related_name='messages')
     user_message = models.TextField()
     bot_response = models.TextField()
     sentiment_score = models.FloatField(default=0.0)  # -1 to 1 scale
     risk_level = models.IntegerField(default=0)  # 0-10 scale
     emotions = models.JSONField(null=True, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
+
+    # Typed copies of the core emotions, kept in sync with `emotions` on save
+    # so reports can aggregate in SQL instead of decoding JSON per row
+    emotion_joy = models.FloatField(default=0.0)
+    emotion_sadness = models.FloatField(default=0.0)
+    emotion_anger = models.FloatField(default=0.0)
+    emotion_fear = models.FloatField(default=0.0)
+    emotion_calm = models.FloatField(default=0.0)
+    emotion_neutral = models.FloatField(default=0.0)
+    dominant_emotion = models.PositiveSmallIntegerField(choices=EMOTION_CHOICES, default=NEUTRAL_EMOTION)
+    # Richest analysis tier that finished before the request deadline; rows below
+    # TIER_FULL were shed under load and are upgraded by `rescore_messages --below-tier`
+    analysis_tier = models.PositiveSmallIntegerField(choices=TIER_CHOICES, default=TIER_KEYWORD)
     
     class Meta:
         ordering = ['-timestamp']
         verbose_name_plural = 'Chat messages'
+        indexes = [
+            models.Index(fields=['user', 'timestamp', 'dominant_emotion'], name='chatmsg_user_ts_emotion_idx'),
+            models.Index(fields=['id'], name='chatmsg_pending_analysis_idx',
+                         condition=models.Q(analysis_tier__lt=2)),  # below TIER_FULL
+        ]
 
     def __str__(self):
         return f"{self.user.username}: {self.user_message[:50]}"
+
+    def save(self, *args, **kwargs):
+        from .conditional import mark_chat_changed
+        from .conversations import assign_sessions
+
+        self.sync_emotion_columns()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'emotions' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | set(self.EMOTION_FIELDS)
+        adding = self._state.adding
+        with transaction.atomic():
+            if adding and self.session_id is None:
+                assign_sessions([self])
+            super().save(*args, **kwargs)
+            mark_chat_changed([self.user_id])
+        if adding:
+            from .timeseries import record_message
+            record_message(self)
+
+    def sync_emotion_columns(self):
+        """Copy the core emotion scores from the JSON field into the typed columns.
+        bulk_create/bulk_update skip save(), so callers using them must call this."""
+        emotions = self.emotions if isinstance(self.emotions, dict) else {}
+        scores = [float(emotions.get(name) or 0.0) for name in EMOTIONS]
+        for name, score in zip(EMOTIONS, scores):
+            setattr(self, f'emotion_{name}', score)
+        best = max(range(len(EMOTIONS)), key=lambda index: scores[index])
+        self.dominant_emotion = best if scores[best] > 0 else NEUTRAL_EMOTION
     
     def get_sentiment_label(self):
         """Convert sentiment score to human-readable label"""
@@ -65,6 +130,72 @@ class ChatMessage(models.Model):
         else:
             return "Low"
 
+class ConversationSession(models.Model):
+    """
+    A run of one user's chat messages with no gap longer than
+    CONVERSATION_GAP_MINUTES. The aggregates are kept up to date as messages
+    arrive (see core/conversations.py), so summaries never replay messages.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversation_sessions')
+    started_at = models.DateTimeField()
+    last_message_at = models.DateTimeField()
+    message_count = models.PositiveIntegerField(default=0)
+    sentiment_sum = models.FloatField(default=0.0)
+    sentiment_min = models.FloatField(default=0.0)
+    risk_max = models.PositiveSmallIntegerField(default=0)
+    emotion_joy = models.FloatField(default=0.0)
+    emotion_sadness = models.FloatField(default=0.0)
+    emotion_anger = models.FloatField(default=0.0)
+    emotion_fear = models.FloatField(default=0.0)
+    emotion_calm = models.FloatField(default=0.0)
+    emotion_neutral = models.FloatField(default=0.0)
+    dominant_emotion = models.PositiveSmallIntegerField(choices=ChatMessage.EMOTION_CHOICES,
+                                                        default=NEUTRAL_EMOTION)
+
+    class Meta:
+        ordering = ['-last_message_at']
+        indexes = [
+            models.Index(fields=['user', '-last_message_at'], name='session_user_last_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} {self.started_at:%Y-%m-%d %H:%M} ({self.message_count} messages)"
+
+    @property
+    def mean_sentiment(self):
+        return self.sentiment_sum / self.message_count if self.message_count else 0.0
+
+    def add(self, message, at):
+        """Fold one message into the aggregates; constant time"""
+        first = self.message_count == 0
+        self.message_count += 1
+        self.last_message_at = at
+        self.sentiment_sum += message.sentiment_score
+        self.sentiment_min = message.sentiment_score if first else min(self.sentiment_min, message.sentiment_score)
+        self.risk_max = max(self.risk_max, message.risk_level)
+        for name in EMOTIONS:
+            field = f'emotion_{name}'
+            setattr(self, field, getattr(self, field) + getattr(message, field))
+        self.update_dominant_emotion()
+
+    def update_dominant_emotion(self):
+        totals = [getattr(self, f'emotion_{name}') for name in EMOTIONS]
+        best = max(range(len(EMOTIONS)), key=lambda index: totals[index])
+        self.dominant_emotion = best if totals[best] > 0 else NEUTRAL_EMOTION
+
+    def summary(self):
+        return {
+            'id': self.pk,
+            'started_at': self.started_at.isoformat(),
+            'last_message_at': self.last_message_at.isoformat(),
+            'message_count': self.message_count,
+            'mean_sentiment': round(self.mean_sentiment, 3),
+            'min_sentiment': round(self.sentiment_min, 3),
+            'peak_risk': self.risk_max,
+            'dominant_emotion': EMOTIONS[self.dominant_emotion],
+        }
+
+
 class WeeklyReport(models.Model):
     """
     Model to store weekly mental health reports
@@ -119,4 +250,134 @@ class ImageReflectionTest(models.Model):
         ordering = ['-timestamp']
 
     def __str__(self):
-        return f"{self.user.username} - {self.timestamp}"
\ No newline at end of file
+        return f"{self.user.username} - {self.timestamp}"
+class ChatArchive(models.Model):
+    """
+    Model to track months of chat messages moved out of the hot table
+    into compressed NDJSON archive files
+    """
+    month = models.DateField(unique=True)
+    path = models.CharField(max_length=500)
+    row_count = models.IntegerField(default=0)
+    size_bytes = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-month']
+
+    def __str__(self):
+        return f"Chat archive {self.month:%Y-%m} ({self.row_count} messages)"
+
+
+class MoodPoint(models.Model):
+    """
+    Per-user mood time series in four tiers. Every chat message appends a RAW
+    point; the compact_mood_series job rolls raw points up into HOUR, DAY and
+    MONTH buckets and prunes tiers past their retention. Buckets hold sums so
+    they can be merged exactly; divide by `count` for averages.
+    """
+    RAW, HOUR, DAY, MONTH = range(4)
+    RESOLUTION_CHOICES = [(RAW, 'raw'), (HOUR, 'hour'), (DAY, 'day'), (MONTH, 'month')]
+    SUM_FIELDS = ['sentiment_sum', 'risk_sum'] + [f'emotion_{name}' for name in EMOTIONS]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='mood_points')
+    resolution = models.PositiveSmallIntegerField(choices=RESOLUTION_CHOICES, default=RAW)
+    start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=1)
+    sentiment_sum = models.FloatField(default=0.0)
+    risk_sum = models.FloatField(default=0.0)
+    risk_max = models.PositiveSmallIntegerField(default=0)
+    emotion_joy = models.FloatField(default=0.0)
+    emotion_sadness = models.FloatField(default=0.0)
+    emotion_anger = models.FloatField(default=0.0)
+    emotion_fear = models.FloatField(default=0.0)
+    emotion_calm = models.FloatField(default=0.0)
+    emotion_neutral = models.FloatField(default=0.0)
+    # Raw points only: already added to the hour/day/month buckets
+    rolled_up = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['start']
+        indexes = [
+            models.Index(fields=['user', 'resolution', 'start'], name='moodpoint_user_res_start_idx'),
+            models.Index(fields=['rolled_up', 'resolution'], name='moodpoint_pending_idx',
+                         condition=models.Q(rolled_up=False)),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} {self.get_resolution_display()} {self.start:%Y-%m-%d %H:%M}"
+
+
+class PopulationStat(models.Model):
+    """
+    Population-wide analytics for one hour, day or month across all users
+    (see core/population.py). Every field is a mergeable sketch: counters and
+    fixed-bucket histograms add, and the HyperLogLog registers of distinct
+    users merge by element-wise maximum. The compact_mood_series job folds
+    each message's raw mood point in exactly once.
+    """
+    HOUR, DAY, MONTH = MoodPoint.HOUR, MoodPoint.DAY, MoodPoint.MONTH
+    RESOLUTION_CHOICES = [(HOUR, 'hour'), (DAY, 'day'), (MONTH, 'month')]
+
+    resolution = models.PositiveSmallIntegerField(choices=RESOLUTION_CHOICES)
+    start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+    high_risk_count = models.PositiveIntegerField(default=0)
+    sentiment_sum = models.FloatField(default=0.0)
+    # Message counts per sentiment bin over [-1, 1], per risk level 0-10 and per dominant emotion
+    sentiment_histogram = models.JSONField(default=list)
+    risk_histogram = models.JSONField(default=list)
+    emotion_counts = models.JSONField(default=list)
+    # Messages and high-risk messages per UTC hour of day
+    hourly_counts = models.JSONField(default=list)
+    hourly_high_risk = models.JSONField(default=list)
+    users_hll = models.BinaryField(default=bytes)
+
+    class Meta:
+        ordering = ['start']
+        constraints = [
+            models.UniqueConstraint(fields=['resolution', 'start'], name='populationstat_res_start_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_resolution_display()} {self.start:%Y-%m-%d %H:%M}"
+
+
+class Job(models.Model):
+    """
+    Background job in the database-backed queue (see core/jobs.py). Lower
+    priority values run first; workers claim ready rows with
+    SELECT ... FOR UPDATE SKIP LOCKED where the database supports it.
+    """
+    CRITICAL, DEFAULT, BATCH = 0, 5, 9
+    PRIORITY_CHOICES = [(CRITICAL, 'critical'), (DEFAULT, 'default'), (BATCH, 'batch')]
+    QUEUED, RUNNING, DONE, FAILED = range(4)
+    STATUS_CHOICES = [(QUEUED, 'queued'), (RUNNING, 'running'), (DONE, 'done'), (FAILED, 'failed')]
+
+    task = models.CharField(max_length=100)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    priority = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES, default=DEFAULT)
+    status = models.PositiveSmallIntegerField(choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    # Not claimed before this time; the queue wait is measured from here
+    run_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['priority', 'run_at', 'id']
+        indexes = [
+            models.Index(fields=['priority', 'run_at', 'id'], name='job_ready_idx',
+                         condition=models.Q(status=0)),  # QUEUED
+            models.Index(fields=['started_at'], name='job_running_idx',
+                         condition=models.Q(status=1)),  # RUNNING
+            models.Index(fields=['status', 'finished_at'], name='job_status_finished_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.get_status_display()})"
@@ -0,0 +1,198 @@
+"""
+Monthly range partitioning of the ChatMessage table.
+
+On PostgreSQL the table is declaratively partitioned by month on ``timestamp``
+with a DEFAULT partition as a safety net. Other backends (SQLite for local
+runs and tests) keep a single table; every helper here degrades to a no-op or
+to plain row deletes so the maintenance command behaves the same everywhere.
+"""
+import logging
+from datetime import date, datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = 'core_chatmessage'
+DEFAULT_PARTITION = f'{PARENT_TABLE}_default'
+
+
+def month_start(value):
+    """First day of the month containing ``value``"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    """Shift a first-of-month date by ``count`` months"""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month):
+    """Aware UTC datetimes delimiting the month as a half-open range"""
+    start = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+    end_month = add_months(month, 1)
+    end = datetime(end_month.year, end_month.month, 1, tzinfo=timezone.utc)
+    return start, end
+
+
+def partition_name(month):
+    return f'{PARENT_TABLE}_p{month:%Y_%m}'
+
+
+def supports_partitioning(connection):
+    return connection.vendor == 'postgresql'
+
+
+def is_partitioned(connection):
+    if not supports_partitioning(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt "
+            "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = %s",
+            [PARENT_TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(connection):
+    """Return ``(name, month)`` for every monthly partition, oldest first"""
+    if not is_partitioned(connection):
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = %s",
+            [PARENT_TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    prefix = f'{PARENT_TABLE}_p'
+    for name in names:
+        if not name.startswith(prefix):
+            continue
+        year, month = name[len(prefix):].split('_')
+        partitions.append((name, date(int(year), int(month), 1)))
+    return sorted(partitions, key=lambda item: item[1])
+
+
+def create_month_partition(connection, month):
+    """Create the partition for ``month`` if missing, moving any matching rows
+    out of the DEFAULT partition first so the attach does not fail."""
+    name = partition_name(month)
+    start, end = month_bounds(month)
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is not None:
+            return False
+        cursor.execute(
+            f"CREATE TABLE {quote(name)} (LIKE {quote(PARENT_TABLE)} "
+            f"INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute("SELECT to_regclass(%s)", [DEFAULT_PARTITION])
+        if cursor.fetchone()[0] is not None:
+            cursor.execute(
+                f"WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)} "
+                f"WHERE \"timestamp\" >= %s AND \"timestamp\" < %s RETURNING *) "
+                f"INSERT INTO {quote(name)} SELECT * FROM moved",
+                [start, end],
+            )
+        cursor.execute(
+            f"ALTER TABLE {quote(PARENT_TABLE)} ATTACH PARTITION {quote(name)} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+    logger.info(f"Created partition {name}")
+    return True
+
+
+def ensure_partitions(connection, months_ahead=3, today=None):
+    """Make sure partitions exist from the current month up to ``months_ahead``"""
+    if not is_partitioned(connection):
+        return []
+    current = month_start(today or date.today())
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if create_month_partition(connection, month):
+            created.append(partition_name(month))
+    return created
+
+
+def drop_month(connection, month):
+    """Remove a month of hot data: detach and drop its partition on PostgreSQL,
+    delete the rows on backends without partitioning."""
+    if is_partitioned(connection):
+        name = partition_name(month)
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [name])
+            if cursor.fetchone()[0] is None:
+                return 0
+            cursor.execute(f"SELECT count(*) FROM {quote(name)}")
+            count = cursor.fetchone()[0]
+            cursor.execute(f"ALTER TABLE {quote(PARENT_TABLE)} DETACH PARTITION {quote(name)}")
+            cursor.execute(f"DROP TABLE {quote(name)}")
+        return count
+
+    from .models import ChatMessage
+
+    start, end = month_bounds(month)
+    deleted, _ = ChatMessage.objects.using(connection.alias).filter(
+        timestamp__gte=start, timestamp__lt=end
+    ).delete()
+    return deleted
+
+
+def convert_to_partitioned(connection, months_ahead=3):
+    """Rebuild the ChatMessage table as a partitioned table (PostgreSQL only).
+
+    The primary key becomes ``(id, timestamp)`` because PostgreSQL requires the
+    partition key in every unique constraint; ids still come from one identity
+    sequence, so they stay unique across partitions.
+    """
+    if not supports_partitioning(connection) or is_partitioned(connection):
+        return
+    quote = connection.ops.quote_name
+    legacy = f'{PARENT_TABLE}_unpartitioned'
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {quote(PARENT_TABLE)} RENAME TO {quote(legacy)}")
+        cursor.execute(
+            f"CREATE TABLE {quote(PARENT_TABLE)} (LIKE {quote(legacy)} "
+            f"INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING IDENTITY) "
+            f"PARTITION BY RANGE (\"timestamp\")"
+        )
+        cursor.execute(f"CREATE TABLE {quote(DEFAULT_PARTITION)} PARTITION OF {quote(PARENT_TABLE)} DEFAULT")
+        cursor.execute(f"SELECT min(\"timestamp\"), max(\"timestamp\") FROM {quote(legacy)}")
+        oldest, newest = cursor.fetchone()
+
+    today = month_start(date.today())
+    first = month_start(oldest) if oldest else today
+    last = max(month_start(newest) if newest else today, today)
+    month = first
+    while month <= last:
+        create_month_partition(connection, month)
+        month = add_months(month, 1)
+    ensure_partitions(connection, months_ahead)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {quote(PARENT_TABLE)} SELECT * FROM {quote(legacy)}")
+        cursor.execute(f"DROP TABLE {quote(legacy)}")
+        cursor.execute(f"ALTER TABLE {quote(PARENT_TABLE)} ADD PRIMARY KEY (id, \"timestamp\")")
+        cursor.execute(
+            f"ALTER TABLE {quote(PARENT_TABLE)} ADD CONSTRAINT core_chatmessage_user_id_fk "
+            f"FOREIGN KEY (user_id) REFERENCES core_user (id) DEFERRABLE INITIALLY DEFERRED"
+        )
+        cursor.execute(f"CREATE INDEX core_chatmessage_user_id_idx ON {quote(PARENT_TABLE)} (user_id)")
+        cursor.execute(
+            f"CREATE INDEX chatmsg_user_ts_emotion_idx ON {quote(PARENT_TABLE)} "
+            f"(user_id, \"timestamp\", dominant_emotion)"
+        )
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+            f"COALESCE((SELECT max(id) FROM {quote(PARENT_TABLE)}), 0) + 1, false)",
+            [PARENT_TABLE],
+        )
@@ -0,0 +1,236 @@
+"""
+Population analytics: streaming sketches over every user's chat messages.
+
+Operators need aggregate views across all users: risk distribution,
+sentiment quantiles, high-risk rates by hour of day and active users.
+Computing them live would mean scanning the whole ChatMessage table.
+Instead, ``PopulationStat`` keeps one row of sketches per hour, day and
+month:
+
+- message and high-risk counters;
+- fixed-bucket histograms of sentiment (``SENTIMENT_BINS`` over [-1, 1]),
+  risk level and dominant emotion; quantiles come out to within one bin;
+- message and high-risk counts per UTC hour of day;
+- a HyperLogLog of user ids for distinct active users (about 1.6% error).
+
+Every sketch merges exactly: counters and histograms add, and HyperLogLog
+registers take the element-wise maximum. So buckets built by different
+compaction batches or workers combine, and so do the buckets of a query
+window. ``record_points`` folds the raw mood points (one per message) in
+during the mood-series compaction transaction, so each message counts
+exactly once. ``summary`` answers a window from at most a few dozen rows,
+whatever the number of messages or users.
+
+The sketches record messages as they were first analysed. Deletes,
+rescoring and purged histories do not adjust them: counters could be
+subtracted, but a HyperLogLog cannot forget a user and the raw points that
+would say what to subtract are pruned after two days. A purged user's
+messages therefore stay in the population figures until
+``compact_mood_series --rebuild`` regenerates them from the chat history.
+"""
+import hashlib
+import math
+from datetime import timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.utils import timezone
+
+from .models import EMOTIONS, NEUTRAL_EMOTION, PopulationStat
+from .timeseries import bucket_start
+
+HIGH_RISK_LEVEL = 7
+SENTIMENT_BINS = 40
+RISK_LEVELS = 11
+HLL_PRECISION = 12
+HLL_REGISTERS = 1 << HLL_PRECISION
+QUANTILES = (0.10, 0.25, 0.50, 0.75, 0.90)
+
+RESOLUTIONS = (PopulationStat.HOUR, PopulationStat.DAY, PopulationStat.MONTH)
+HOUR_RETENTION = timedelta(days=31)
+
+# Query window -> (bucket resolution, length of the window)
+WINDOWS = {
+    '24h': (PopulationStat.HOUR, timedelta(hours=24)),
+    '7d': (PopulationStat.DAY, timedelta(days=7)),
+    '30d': (PopulationStat.DAY, timedelta(days=30)),
+    '1y': (PopulationStat.MONTH, timedelta(days=365)),
+    'all': (PopulationStat.MONTH, None),
+}
+
+
+def user_hash(user_id):
+    """64-bit hash of a user id for the HyperLogLog"""
+    return int.from_bytes(hashlib.blake2b(str(user_id).encode(), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    """Distinct-count sketch with HLL_REGISTERS one-byte registers"""
+
+    def __init__(self, registers=b''):
+        if registers:
+            self.registers = np.frombuffer(bytes(registers), dtype=np.uint8).copy()
+        else:
+            self.registers = np.zeros(HLL_REGISTERS, dtype=np.uint8)
+
+    def add_hash(self, value):
+        index = value >> (64 - HLL_PRECISION)
+        rest = value & ((1 << (64 - HLL_PRECISION)) - 1)
+        rank = 64 - HLL_PRECISION - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        m = HLL_REGISTERS
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int32))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction: linear counting over the empty registers
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+    def to_bytes(self):
+        return self.registers.tobytes()
+
+
+def _counts(stat, field, size):
+    values = getattr(stat, field) if stat is not None else None
+    return list(values) if values else [0] * size
+
+
+class Sketch:
+    """In-memory, mergeable form of a PopulationStat row"""
+
+    def __init__(self, stat=None):
+        self.count = stat.count if stat else 0
+        self.high_risk_count = stat.high_risk_count if stat else 0
+        self.sentiment_sum = stat.sentiment_sum if stat else 0.0
+        self.sentiment_histogram = _counts(stat, 'sentiment_histogram', SENTIMENT_BINS)
+        self.risk_histogram = _counts(stat, 'risk_histogram', RISK_LEVELS)
+        self.emotion_counts = _counts(stat, 'emotion_counts', len(EMOTIONS))
+        self.hourly_counts = _counts(stat, 'hourly_counts', 24)
+        self.hourly_high_risk = _counts(stat, 'hourly_high_risk', 24)
+        self.users = HyperLogLog(stat.users_hll if stat else b'')
+
+    def add(self, sentiment, risk, emotion, hashed_user, at):
+        """Fold in one message: sentiment in [-1, 1], risk 0-10, index into EMOTIONS, UTC time"""
+        sentiment = min(max(sentiment, -1.0), 1.0)
+        risk = min(max(int(risk), 0), RISK_LEVELS - 1)
+        high = risk >= HIGH_RISK_LEVEL
+        self.count += 1
+        self.high_risk_count += high
+        self.sentiment_sum += sentiment
+        self.sentiment_histogram[min(int((sentiment + 1) / 2 * SENTIMENT_BINS), SENTIMENT_BINS - 1)] += 1
+        self.risk_histogram[risk] += 1
+        self.emotion_counts[emotion] += 1
+        self.hourly_counts[at.hour] += 1
+        self.hourly_high_risk[at.hour] += high
+        self.users.add_hash(hashed_user)
+
+    def merge(self, other):
+        self.count += other.count
+        self.high_risk_count += other.high_risk_count
+        self.sentiment_sum += other.sentiment_sum
+        for field in ('sentiment_histogram', 'risk_histogram', 'emotion_counts', 'hourly_counts',
+                      'hourly_high_risk'):
+            setattr(self, field, [a + b for a, b in zip(getattr(self, field), getattr(other, field))])
+        self.users.merge(other.users)
+        return self
+
+    def save_to(self, stat):
+        stat.count = self.count
+        stat.high_risk_count = self.high_risk_count
+        stat.sentiment_sum = self.sentiment_sum
+        stat.sentiment_histogram = self.sentiment_histogram
+        stat.risk_histogram = self.risk_histogram
+        stat.emotion_counts = self.emotion_counts
+        stat.hourly_counts = self.hourly_counts
+        stat.hourly_high_risk = self.hourly_high_risk
+        stat.users_hll = self.users.to_bytes()
+
+    def quantile(self, q):
+        """Sentiment quantile, interpolated linearly inside its histogram bin"""
+        if not self.count:
+            return None
+        width = 2 / SENTIMENT_BINS
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.sentiment_histogram):
+            if count and seen + count >= target:
+                return round(-1 + width * (index + (target - seen) / count), 3)
+            seen += count
+        return 1.0
+
+    def summary(self):
+        def percent(part, whole=self.count):
+            return round(100 * part / whole, 2) if whole else 0.0
+
+        return {
+            'messages': self.count,
+            'active_users': self.users.count(),
+            'high_risk_messages': self.high_risk_count,
+            'high_risk_percent': percent(self.high_risk_count),
+            'mean_sentiment': round(self.sentiment_sum / self.count, 3) if self.count else None,
+            'sentiment_quantiles': {f'p{round(q * 100)}': self.quantile(q) for q in QUANTILES},
+            'risk_distribution': [{'level': level, 'messages': count, 'percent': percent(count)}
+                                  for level, count in enumerate(self.risk_histogram)],
+            'emotions': [{'emotion': name, 'messages': count, 'percent': percent(count)}
+                         for name, count in zip(EMOTIONS, self.emotion_counts)],
+            'by_hour': [{'hour': hour, 'messages': count, 'high_risk_percent': percent(high, count)}
+                        for hour, (count, high) in enumerate(zip(self.hourly_counts, self.hourly_high_risk))],
+        }
+
+
+def dominant_emotion(point):
+    """Index into EMOTIONS of a point's strongest emotion (as ChatMessage.sync_emotion_columns)"""
+    scores = [getattr(point, f'emotion_{name}') for name in EMOTIONS]
+    best = max(range(len(EMOTIONS)), key=lambda index: scores[index])
+    return best if scores[best] > 0 else NEUTRAL_EMOTION
+
+
+def record_points(points):
+    """Fold raw mood points (one per message) into the hour, day and month
+    buckets. Call inside the compaction transaction that marks them rolled up."""
+    sketches = {}
+    for point in points:
+        hashed_user = user_hash(point.user_id)
+        emotion = dominant_emotion(point)
+        at = point.start.astimezone(dt_timezone.utc)
+        for resolution in RESOLUTIONS:
+            key = (resolution, bucket_start(at, resolution))
+            sketch = sketches.get(key)
+            if sketch is None:
+                sketch = sketches[key] = Sketch()
+            # A raw point holds one message, so its sums are the message's values
+            sketch.add(point.sentiment_sum, point.risk_max, emotion, hashed_user, at)
+
+    for (resolution, start), sketch in sketches.items():
+        stat, _ = PopulationStat.objects.select_for_update().get_or_create(resolution=resolution, start=start)
+        Sketch(stat).merge(sketch).save_to(stat)
+        stat.save()
+    return len(sketches)
+
+
+def prune(now=None):
+    """Delete hour buckets past HOUR_RETENTION; days and months are kept"""
+    now = now or timezone.now()
+    return PopulationStat.objects.filter(resolution=PopulationStat.HOUR, start__lt=now - HOUR_RETENTION).delete()[0]
+
+
+def summary(window='7d', now=None):
+    """Population figures for a WINDOWS entry, merged from its buckets"""
+    if window not in WINDOWS:
+        raise ValueError(f"Unknown window '{window}'")
+    resolution, length = WINDOWS[window]
+    now = now or timezone.now()
+    stats = PopulationStat.objects.filter(resolution=resolution)
+    if length is not None:
+        stats = stats.filter(start__gte=bucket_start(now - length, resolution))
+    total = Sketch()
+    buckets = 0
+    for stat in stats:
+        total.merge(Sketch(stat))
+        buckets += 1
+    return {'window': window, 'buckets': buckets, **total.summary()}
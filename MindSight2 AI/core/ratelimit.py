@@ -0,0 +1,246 @@
+"""
+Admission control for the chat endpoints: per-user and per-IP rate limits,
+and a cap on concurrent analyses.
+
+``RateLimitMiddleware`` checks every request to ``RATE_LIMITED_ENDPOINTS``
+against two token buckets, one keyed by user and one by client IP. A request
+that finds either bucket empty gets ``429 Too Many Requests`` with a
+``Retry-After`` header before the view runs. A looping client then costs one
+bucket check per request instead of an analysis and a database write.
+
+Each bucket is held as a single number, its theoretical arrival time (the
+generic cell rate algorithm). A bucket refilling at ``rate`` tokens per second
+with room for ``burst`` tokens is full when that time is in the past. Each
+request moves it ``1 / rate`` seconds forward, and a request is refused when
+that would put it more than ``burst / rate`` seconds ahead of now. A check is
+one read and one write per bucket with no timers or token arithmetic, which
+takes a few microseconds with the in-process store. Both buckets are read
+before either is charged, so a request the user bucket refuses does not use
+up a token of its IP's bucket.
+
+The store is pluggable (``RATE_LIMIT_STORE``):
+
+- ``LocalBucketStore`` (default) keeps buckets in process memory. Limits
+  apply per worker process, so the effective limit is multiplied by the
+  number of workers.
+- ``CacheBucketStore`` keeps them in the Django cache ``RATE_LIMIT_CACHE``,
+  shared by every worker when that is Redis or Memcached. Its read-then-write
+  is not atomic, so concurrent requests for one key can let a few extra
+  through; a limiter only needs to be approximately right.
+- Any class with ``get(key)`` and ``set(key, value, ttl)`` methods.
+
+``analysis_slots`` caps the richer analysis tiers running at once in this
+process at ``ANALYSIS_MAX_CONCURRENT``. The keyword tier, with its crisis
+check, and the save never wait for a slot. An analysis that cannot get a
+slot within ``ANALYSIS_ADMISSION_WAIT_MS`` (or its deadline) stops at the
+keyword tier, the same as a message shed by ``LoadShedder``. Its follow-up
+``reanalyze_message`` job fills in the rest later. Overload therefore lowers
+analysis quality but never refuses a message.
+
+``metrics()`` returns the counters of this process; staff can read them at
+``ops/admission/``.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+# URL names of the endpoints that run the analyzers
+RATE_LIMITED_ENDPOINTS = {'chat_message', 'chat_message_stream', 'analyze_message', 'weekly_insights'}
+
+# Local buckets are swept of full (expired) entries every this many writes
+SWEEP_EVERY = 4096
+
+
+class LocalBucketStore:
+    """Buckets in process memory"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._writes = 0
+
+    def get(self, key):
+        return self._buckets.get(key)
+
+    def set(self, key, value, ttl):
+        self._buckets[key] = value
+        self._writes += 1
+        if self._writes % SWEEP_EVERY == 0:
+            now = time.monotonic()
+            # A bucket whose arrival time has passed is full, the same as a missing one
+            for stale in [key for key, tat in list(self._buckets.items()) if tat <= now]:
+                self._buckets.pop(stale, None)
+
+    def now(self):
+        return time.monotonic()
+
+
+class CacheBucketStore:
+    """Buckets in the Django cache RATE_LIMIT_CACHE, shared between processes"""
+
+    def __init__(self):
+        self.cache = caches[settings.RATE_LIMIT_CACHE]
+
+    def get(self, key):
+        return self.cache.get(f'ratelimit:{key}')
+
+    def set(self, key, value, ttl):
+        self.cache.set(f'ratelimit:{key}', value, timeout=math.ceil(ttl) + 1)
+
+    def now(self):
+        # Wall-clock time, since the arrival times are compared across processes
+        return time.time()
+
+
+class RateLimit:
+    """A token bucket per key: ``per_minute`` tokens a minute, at most ``burst`` at once"""
+
+    def __init__(self, name, per_minute, burst, store):
+        self.name = name
+        self.interval = 60 / per_minute
+        self.window = burst * self.interval
+        self.store = store
+        self.allowed = 0
+        self.limited = 0
+
+    def peek(self, key, now):
+        """``(tat, wait)``: the arrival time after taking a token for ``key``, and
+        the seconds until one is free (0 when one is free now). Takes nothing."""
+        tat = max(self.store.get(f'{self.name}:{key}') or now, now) + self.interval
+        return tat, max(tat - now - self.window, 0)
+
+    def take(self, key, tat, now):
+        """Take the token ``peek`` found free"""
+        self.store.set(f'{self.name}:{key}', tat, tat - now)
+        self.allowed += 1
+
+    def hit(self, key, now=None):
+        """Take a token for ``key``; returns 0 if allowed, else the seconds until one is free"""
+        now = self.store.now() if now is None else now
+        tat, wait = self.peek(key, now)
+        if wait:
+            self.limited += 1
+            return wait
+        self.take(key, tat, now)
+        return 0
+
+
+class AnalysisSlots:
+    """Bounded number of richer-tier analyses running at once in this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._semaphore = None
+        self.in_use = 0
+        self.peak = 0
+        self.admitted = 0
+        self.shed = 0
+
+    @property
+    def semaphore(self):
+        if self._semaphore is None:
+            with self._lock:
+                if self._semaphore is None:
+                    self._semaphore = threading.BoundedSemaphore(settings.ANALYSIS_MAX_CONCURRENT)
+        return self._semaphore
+
+    def acquire(self, deadline):
+        """Take a slot, waiting up to ANALYSIS_ADMISSION_WAIT_MS but not past
+        ``deadline`` (time.monotonic()); False when none became free"""
+        wait = min(settings.ANALYSIS_ADMISSION_WAIT_MS / 1000, deadline - time.monotonic())
+        if not self.semaphore.acquire(timeout=max(wait, 0)):
+            with self._lock:
+                self.shed += 1
+            return False
+        with self._lock:
+            self.admitted += 1
+            self.in_use += 1
+            self.peak = max(self.peak, self.in_use)
+        return True
+
+    def release(self):
+        with self._lock:
+            self.in_use -= 1
+        self.semaphore.release()
+
+
+analysis_slots = AnalysisSlots()
+
+_limits = None
+_limits_lock = threading.Lock()
+
+
+def limits():
+    """The (user, ip) RateLimits, built from the settings on first use"""
+    global _limits
+    if _limits is None:
+        with _limits_lock:
+            if _limits is None:
+                store = import_string(settings.RATE_LIMIT_STORE)()
+                _limits = (
+                    RateLimit('user', settings.RATE_LIMIT_USER_PER_MINUTE, settings.RATE_LIMIT_USER_BURST, store),
+                    RateLimit('ip', settings.RATE_LIMIT_IP_PER_MINUTE, settings.RATE_LIMIT_IP_BURST, store),
+                )
+    return _limits
+
+
+def client_ip(request):
+    """Client address: REMOTE_ADDR, or the X-Forwarded-For entry added by the
+    outermost of RATE_LIMIT_PROXY_COUNT trusted proxies"""
+    if settings.RATE_LIMIT_PROXY_COUNT:
+        forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if len(forwarded) >= settings.RATE_LIMIT_PROXY_COUNT:
+            return forwarded[-settings.RATE_LIMIT_PROXY_COUNT]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def check(request):
+    """Seconds the client must wait before this request is admitted; 0 to admit it.
+    Both buckets are read before either is charged, so a request refused by
+    one bucket does not use up a token of the other."""
+    user_limit, ip_limit = limits()
+    buckets = [(ip_limit, client_ip(request))]
+    if request.user.is_authenticated:
+        buckets.append((user_limit, request.user.pk))
+    now = ip_limit.store.now()
+    checked = [(limit, key, *limit.peek(key, now)) for limit, key in buckets]
+    wait = max(limit_wait for *_, limit_wait in checked)
+    if wait:
+        for limit, _, _, limit_wait in checked:
+            if limit_wait:
+                limit.limited += 1
+        return wait
+    for limit, key, tat, _ in checked:
+        limit.take(key, tat, now)
+    return 0
+
+
+def retry_after(seconds):
+    """Retry-After header value: whole seconds, at least 1"""
+    return str(max(1, math.ceil(seconds)))
+
+
+def metrics():
+    """Counters of this process"""
+    return {
+        'store': settings.RATE_LIMIT_STORE,
+        'limits': {
+            limit.name: {
+                'per_minute': round(60 / limit.interval, 3),
+                'burst': round(limit.window / limit.interval),
+                'allowed': limit.allowed,
+                'limited': limit.limited,
+            }
+            for limit in limits()
+        },
+        'analysis': {
+            'max_concurrent': settings.ANALYSIS_MAX_CONCURRENT,
+            'in_use': analysis_slots.in_use,
+            'peak': analysis_slots.peak,
+            'admitted': analysis_slots.admitted,
+            'shed': analysis_slots.shed,
+        },
+    }
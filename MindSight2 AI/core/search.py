@@ -0,0 +1,281 @@
+"""
+Full-text search over ChatMessage.
+
+PostgreSQL uses a GIN expression index on ``(user_id, to_tsvector(...))``
+(``btree_gin`` lets the per-user filter live in the same index), so the index
+also covers every monthly partition. SQLite, used for local runs, gets an FTS5
+external-content table kept in sync by triggers. Both backends expose the
+same helpers: ``search_messages`` for the per-user search with ranking,
+filters and keyset pagination, and ``match_sql`` for the admin search.
+
+Only hot data is indexed; months moved to the archive tier are not searched.
+
+SQLite applies some schema changes (a NOT NULL column, a new foreign key) by
+copying the table, which silently drops the FTS5 triggers. After that, new
+messages would never be indexed. ``ensure_search_index`` therefore reinstalls
+and rebuilds a missing index. It runs after every ``migrate`` and once per
+process before the first search.
+"""
+import base64
+import json
+import logging
+import re
+
+from django.core.exceptions import ValidationError
+from django.db import connections, router
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'core_chatmessage'
+FTS_TABLE = 'core_chatmessage_fts'
+PG_INDEX = 'chatmsg_search_idx'
+PG_CONFIG = 'english'
+PG_DOCUMENT = (
+    f"to_tsvector('{PG_CONFIG}'::regconfig, "
+    f"coalesce(user_message, '') || ' ' || coalesce(bot_response, ''))"
+)
+PG_QUERY = f"websearch_to_tsquery('{PG_CONFIG}'::regconfig, %s)"
+
+# Same bands as ChatMessage.get_risk_category
+RISK_RANGES = {
+    'low': (0, 3),
+    'medium': (4, 6),
+    'high': (7, 10),
+}
+
+SQLITE_TRIGGERS = tuple(f'{FTS_TABLE}_{suffix}' for suffix in ('ai', 'ad', 'au'))
+
+SORT_RANK = 'rank'
+SORT_RECENT = 'recent'
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def supports_search(connection):
+    return connection.vendor in ('postgresql', 'sqlite')
+
+
+def install_search_index(connection):
+    """Create the text index for ``connection``'s backend and index existing rows"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON {TABLE} "
+                f"USING gin (user_id, ({PG_DOCUMENT}))"
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"user_message, bot_response, content='{TABLE}', content_rowid='id', "
+                f"tokenize='porter unicode61')"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN "
+                f"INSERT INTO {FTS_TABLE}(rowid, user_message, bot_response) "
+                f"VALUES (new.id, new.user_message, new.bot_response); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN "
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, user_message, bot_response) "
+                f"VALUES ('delete', old.id, old.user_message, old.bot_response); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au "
+                f"AFTER UPDATE OF user_message, bot_response ON {TABLE} BEGIN "
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, user_message, bot_response) "
+                f"VALUES ('delete', old.id, old.user_message, old.bot_response); "
+                f"INSERT INTO {FTS_TABLE}(rowid, user_message, bot_response) "
+                f"VALUES (new.id, new.user_message, new.bot_response); END"
+            )
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        else:
+            logger.warning(f"No full-text index for the {connection.vendor} backend")
+
+
+def search_index_missing(connection):
+    """Whether any part of the backend's text index is missing"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT count(*) FROM pg_indexes WHERE indexname = %s", [PG_INDEX])
+            return cursor.fetchone()[0] < 1
+        if connection.vendor == 'sqlite':
+            names = (FTS_TABLE, *SQLITE_TRIGGERS)
+            cursor.execute(
+                f"SELECT count(*) FROM sqlite_master WHERE name IN ({', '.join(['%s'] * len(names))})", names)
+            return cursor.fetchone()[0] < len(names)
+    return False
+
+
+_checked = set()
+
+
+def ensure_search_index(connection, force=False):
+    """Reinstall (and rebuild) the text index if a table rebuild dropped it.
+    Checked once per process and database unless ``force``; returns whether
+    it had to be reinstalled."""
+    if not supports_search(connection) or (connection.alias in _checked and not force):
+        return False
+    if TABLE not in connection.introspection.table_names():
+        return False  # core not migrated yet
+    missing = search_index_missing(connection)
+    if missing:
+        logger.warning(f"Full-text index on {connection.alias} was missing; reinstalling and rebuilding it")
+        install_search_index(connection)
+    _checked.add(connection.alias)
+    return missing
+
+
+def remove_search_index(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f"DROP INDEX IF EXISTS {PG_INDEX}")
+        elif connection.vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def fts5_query(text):
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix"""
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*']
+    return ' '.join(terms)
+
+
+def match_sql(connection, text):
+    """``(sql, params)`` selecting the ids of messages matching ``text``, or None"""
+    ensure_search_index(connection)
+    if connection.vendor == 'postgresql':
+        return f"SELECT id FROM {TABLE} WHERE {PG_DOCUMENT} @@ {PG_QUERY}", [text]
+    if connection.vendor == 'sqlite':
+        query = fts5_query(text)
+        if query is None:
+            return None
+        return f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [query]
+    return None
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of ``encode_cursor``; raises ValueError on a malformed cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid search cursor') from e
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError('Invalid search cursor')
+    return values
+
+
+def _search_sql(vendor, sort, filters):
+    """Build the ranked query for one backend. ``filters`` lists the optional
+    clauses in use; the keyset clause compares (sort key, id) row values."""
+    if vendor == 'postgresql':
+        rank = f"ts_rank_cd({PG_DOCUMENT}, q.query)"
+        source = f"{TABLE} m, {PG_QUERY} AS q(query)"
+        where = ["m.user_id = %s", f"{PG_DOCUMENT} @@ q.query"]
+    else:
+        rank = f"-bm25({FTS_TABLE})"
+        source = f"{FTS_TABLE} JOIN {TABLE} m ON m.id = {FTS_TABLE}.rowid"
+        where = [f"{FTS_TABLE} MATCH %s", "m.user_id = %s"]
+
+    if 'date_from' in filters:
+        where.append('m."timestamp" >= %s')
+    if 'date_to' in filters:
+        where.append('m."timestamp" < %s')
+    if 'risk' in filters:
+        where.append("m.risk_level BETWEEN %s AND %s")
+
+    key = rank if sort == SORT_RANK else 'm."timestamp"'
+    if 'cursor' in filters:
+        where.append(f"({key}, m.id) < (%s, %s)")
+    return (
+        f'SELECT m.id, m."timestamp", {rank} AS rank FROM {source} '
+        f"WHERE {' AND '.join(where)} "
+        f"ORDER BY {key} DESC, m.id DESC LIMIT %s"
+    )
+
+
+def search_messages(user, text, date_from=None, date_to=None, risk=None,
+                    sort=SORT_RANK, cursor=None, limit=20):
+    """Search ``user``'s messages for ``text``.
+
+    Returns ``(messages, next_cursor)``: ChatMessage instances best match first
+    (or newest first with ``sort='recent'``), each with a ``search_rank``
+    attribute, and an opaque cursor for the next page (None on the last page).
+    ``risk`` is a RISK_RANGES key; ``date_to`` is exclusive.
+    """
+    from .models import ChatMessage
+
+    alias = router.db_for_read(ChatMessage)
+    connection = connections[alias]
+    if not supports_search(connection):
+        raise NotImplementedError(f"Chat search is not available on {connection.vendor}")
+    if sort not in (SORT_RANK, SORT_RECENT):
+        raise ValueError(f"Unknown sort '{sort}'")
+    if risk is not None and risk not in RISK_RANGES:
+        raise ValueError(f"Unknown risk filter '{risk}'")
+
+    ensure_search_index(connection)
+    query = text if connection.vendor == 'postgresql' else fts5_query(text)
+    if not query or not text.strip():
+        return [], None
+
+    adapt = connection.ops.adapt_datetimefield_value
+    filters = []
+    params = [query, user.pk]
+    if date_from is not None:
+        filters.append('date_from')
+        params.append(adapt(date_from))
+    if date_to is not None:
+        filters.append('date_to')
+        params.append(adapt(date_to))
+    if risk is not None:
+        filters.append('risk')
+        params.extend(RISK_RANGES[risk])
+    if cursor:
+        key, last_id = decode_cursor(cursor)
+        try:
+            if sort == SORT_RANK:
+                key = float(key)
+            else:
+                key = adapt(ChatMessage._meta.get_field('timestamp').to_python(key))
+            last_id = int(last_id)
+        except (TypeError, ValueError, ValidationError) as e:
+            raise ValueError('Invalid search cursor') from e
+        filters.append('cursor')
+        params.extend([key, last_id])
+    params.append(limit + 1)
+
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(_search_sql(connection.vendor, sort, filters), params)
+        rows = db_cursor.fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    by_id = ChatMessage.objects.using(alias).in_bulk([row[0] for row in rows])
+    messages = []
+    for message_id, _timestamp, rank in rows:
+        message = by_id.get(message_id)
+        if message is None:
+            continue  # deleted between the two queries
+        message.search_rank = float(rank)
+        messages.append(message)
+
+    next_cursor = None
+    if has_more and rows:
+        last_id, last_timestamp, last_rank = rows[-1]
+        if sort == SORT_RANK:
+            key = float(last_rank)
+        else:
+            key = ChatMessage._meta.get_field('timestamp').to_python(last_timestamp).isoformat()
+        next_cursor = encode_cursor([key, last_id])
+    return messages, next_cursor
@@ -0,0 +1,353 @@
+"""
+Static asset pipeline: minified, content-hashed, precompressed files served
+with far-future cache headers.
+
+``CompressedManifestStorage`` (``STORAGES['staticfiles']``) extends Django's
+``ManifestStaticFilesStorage``. At ``collectstatic`` time it:
+
+1. minifies the collected ``.js`` and ``.css`` copies;
+2. lets the manifest storage write content-hashed names such as
+   ``js/chat.3f2a9c1e7b4d.js``;
+3. writes ``.gz`` and, when the ``brotli`` package is installed, ``.br``
+   variants next to every hashed text asset.
+
+``{% static %}`` then renders the hashed URL, so a changed file gets a new
+URL and an unchanged one can be cached indefinitely.
+
+``StaticAssetMiddleware`` serves ``STATIC_ROOT`` when Django runs without a
+front-end server for static files (``STATIC_SERVE``). It picks the smallest
+precompressed variant the client accepts and marks hashed files
+``immutable`` for a year. Other files get a short max-age and an ETag. Repeat
+page loads then fetch no asset bytes at all.
+
+The minifiers are deliberately conservative. They remove comments,
+indentation and redundant whitespace but keep line breaks in JavaScript, so
+automatic semicolon insertion behaves exactly as before. Strings, template
+literals and regular expressions are copied verbatim.
+"""
+import gzip
+import json
+import logging
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.deprecation import MiddlewareMixin
+
+from .lazy import lazy_import
+
+brotli = lazy_import('brotli')
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE = ('.css', '.js', '.json', '.map', '.svg', '.txt', '.xml', '.html')
+# Precompressed variants, preferred first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+MUTABLE_MAX_AGE = 60
+
+_IDENTIFIER = re.compile(r'[\w$]')
+# Keywords after which a '/' starts a regular expression rather than a division
+_REGEX_KEYWORDS = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw', 'case',
+                   'do', 'else', 'yield', 'await'}
+
+
+class _JsMinifier:
+    def __init__(self, source):
+        self.source = source
+        self.out = []
+        self.word = ''  # identifier or keyword just emitted
+        self.last = ''  # last significant character emitted
+
+    def emit(self, text, significant=True):
+        self.out.append(text)
+        if significant:
+            self.last = text[-1]
+
+    def space(self, newline):
+        """Collapse the whitespace run just read into one space or line break"""
+        if not self.out or self.out[-1] in ('\n', ' '):
+            if newline and self.out and self.out[-1] == ' ':
+                self.out[-1] = '\n'
+            return
+        self.out.append('\n' if newline else ' ')
+
+    def run(self):
+        self.code(0, in_template=False)
+        return ''.join(self.out).strip() + '\n'
+
+    def code(self, i, in_template):
+        """Copy code from ``i``; inside a ``${...}`` stop after its closing brace"""
+        s, n = self.source, len(self.source)
+        depth = 0
+        while i < n:
+            c = s[i]
+            if c in ' \t\r\n':
+                start = i
+                while i < n and s[i] in ' \t\r\n':
+                    i += 1
+                self.space('\n' in s[start:i])
+                continue
+            if c == '/' and s.startswith('//', i):
+                end = s.find('\n', i)
+                i = n if end == -1 else end
+                continue
+            if c == '/' and s.startswith('/*', i):
+                end = s.find('*/', i + 2)
+                end = n if end == -1 else end + 2
+                self.space('\n' in s[i:end])
+                i = end
+                continue
+            if c in '\'"':
+                i = self.quoted(i, c)
+            elif c == '`':
+                i = self.template(i)
+            elif c == '/' and (not self.last or self.last in '(,=:[!&|?{};+-*%<>~^' or self.word in _REGEX_KEYWORDS):
+                i = self.regex(i)
+            elif _IDENTIFIER.match(c):
+                start = i
+                while i < n and _IDENTIFIER.match(s[i]):
+                    i += 1
+                self.emit(s[start:i])
+                self.word = s[start:i]
+                continue
+            else:
+                if in_template and c == '{':
+                    depth += 1
+                elif in_template and c == '}':
+                    if depth == 0:
+                        self.emit(c)
+                        return i + 1
+                    depth -= 1
+                self.emit(c)
+                i += 1
+            self.word = ''
+        return i
+
+    def quoted(self, i, quote):
+        s = self.source
+        end = i + 1
+        while end < len(s) and s[end] != quote:
+            end += 2 if s[end] == '\\' else 1
+        self.emit(s[i:end + 1])
+        return end + 1
+
+    def template(self, i):
+        s = self.source
+        self.emit('`')
+        i += 1
+        while i < len(s):
+            if s[i] == '\\':
+                self.emit(s[i:i + 2], significant=False)
+                i += 2
+            elif s[i] == '`':
+                self.emit('`')
+                return i + 1
+            elif s.startswith('${', i):
+                self.emit('${')
+                i = self.code(i + 2, in_template=True)
+            else:
+                self.emit(s[i], significant=False)
+                i += 1
+        return i
+
+    def regex(self, i):
+        s = self.source
+        end = i + 1
+        in_class = False
+        while end < len(s) and s[end] != '\n':
+            if s[end] == '\\':
+                end += 2
+                continue
+            if s[end] == '[':
+                in_class = True
+            elif s[end] == ']':
+                in_class = False
+            elif s[end] == '/' and not in_class:
+                break
+            end += 1
+        self.emit(s[i:end + 1])
+        return end + 1
+
+
+def minify_js(source):
+    """Strip comments, indentation and blank lines from JavaScript"""
+    return _JsMinifier(source).run()
+
+
+_CSS_TOKENS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|(/\*.*?\*/)|(\s+)', re.S)
+
+
+def minify_css(source):
+    """Strip comments and redundant whitespace from CSS; strings are kept verbatim"""
+    def squeeze(text):
+        # A space before ':' can be significant (``a :hover``), one after it never is
+        text = re.sub(r' ?([{};,>]) ?', r'\1', re.sub(r' +', ' ', text))
+        return text.replace(': ', ':').replace(';}', '}')
+
+    parts, position, chunk = [], 0, []
+    for match in _CSS_TOKENS.finditer(source):
+        chunk.append(source[position:match.start()])
+        string, comment, _ = match.groups()
+        if string:
+            parts.append(squeeze(''.join(chunk)))
+            parts.append(string)
+            chunk = []
+        elif not comment:
+            chunk.append(' ')
+        position = match.end()
+    chunk.append(source[position:])
+    parts.append(squeeze(''.join(chunk)))
+    return ''.join(parts).strip() + '\n'
+
+
+MINIFIERS = {'.js': minify_js, '.css': minify_css}
+
+
+class CompressedManifestStorage(ManifestStaticFilesStorage):
+    """Manifest storage that minifies JS/CSS before hashing and writes
+    precompressed variants of every hashed text asset"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            yield from super().post_process(paths, dry_run, **options)
+            return
+        for name in paths:
+            minifier = MINIFIERS.get(os.path.splitext(name)[1])
+            if minifier is None or '.min.' in name:
+                continue
+            with self.open(name) as file:
+                source = file.read().decode('utf-8')
+            try:
+                minified = minifier(source)
+            except Exception as e:
+                logger.warning(f"Could not minify {name}, keeping it as is: {e}")
+                continue
+            self.delete(name)
+            self._save(name, ContentFile(minified.encode('utf-8')))
+        # Hash the minified copies in STATIC_ROOT rather than the sources
+        paths = {name: (self, name) for name in paths}
+
+        hashed_names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names.add(hashed_name)
+            yield name, hashed_name, processed
+        for hashed_name in sorted(hashed_names):
+            if hashed_name.endswith(COMPRESSIBLE):
+                self.compress(hashed_name)
+
+    def compress(self, name):
+        with self.open(name) as file:
+            content = file.read()
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        try:
+            variants.append(('.br', brotli.compress(content, quality=11)))
+        except ImportError:
+            pass
+        for suffix, compressed in variants:
+            # Not worth storing when compression does not pay for the header
+            if len(compressed) >= len(content) * 0.95:
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
+
+
+def accepted_encodings(header):
+    """Encodings the client accepts (q > 0) from an Accept-Encoding header"""
+    accepted = set()
+    for item in header.split(','):
+        encoding, _, params = item.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(encoding.strip().lower())
+    return accepted
+
+
+class StaticAsset:
+    def __init__(self, path, immutable):
+        self.path = path
+        self.immutable = immutable
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.variants = []  # (encoding, path, size, etag), smallest first, identity last
+        for encoding, suffix in ENCODINGS:
+            if os.path.exists(path + suffix):
+                self.variants.append((encoding, path + suffix))
+        self.variants.append((None, path))
+        stats = {variant_path: os.stat(variant_path) for _, variant_path in self.variants}
+        self.variants = sorted(
+            ((encoding, variant_path, stats[variant_path].st_size,
+              f'"{stats[variant_path].st_size:x}-{int(stats[variant_path].st_mtime):x}-{encoding or "identity"}"')
+             for encoding, variant_path in self.variants),
+            key=lambda variant: (variant[0] is None, variant[2]),
+        )
+        self.last_modified = formatdate(os.stat(path).st_mtime, usegmt=True)
+
+    def response(self, request):
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        encoding, path, size, etag = next(variant for variant in self.variants
+                                          if variant[0] is None or variant[0] in accepted)
+        if etag in [value.strip() for value in request.headers.get('If-None-Match', '').split(',')]:
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=self.content_type)
+            response['Content-Length'] = size
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Last-Modified'] = self.last_modified
+        response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = (f'public, max-age={IMMUTABLE_MAX_AGE}, immutable' if self.immutable
+                                     else f'public, max-age={MUTABLE_MAX_AGE}')
+        return response
+
+
+def index_static_root(root, manifest_name='staticfiles.json'):
+    """URL path (relative to STATIC_URL) -> StaticAsset for every collected file"""
+    hashed = set()
+    manifest_path = os.path.join(root, manifest_name)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as file:
+            hashed = set(json.load(file).get('paths', {}).values())
+    suffixes = tuple(suffix for _, suffix in ENCODINGS)
+    assets = {}
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            if filename.endswith(suffixes) or filename == manifest_name:
+                continue
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            assets[name] = StaticAsset(path, immutable=name in hashed)
+    return assets
+
+
+class StaticAssetMiddleware(MiddlewareMixin):
+    """Serve collected static files with precompressed variants and cache
+    headers. Removed from the stack when STATIC_SERVE is off, in DEBUG (where
+    runserver serves static files itself) or before collectstatic has run."""
+
+    def __init__(self, get_response):
+        if not settings.STATIC_SERVE or settings.DEBUG or not os.path.isdir(settings.STATIC_ROOT or ''):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.prefix = '/' + settings.STATIC_URL.strip('/') + '/'
+        self.assets = index_static_root(settings.STATIC_ROOT)
+        logger.info(f"Serving {len(self.assets)} static assets from {settings.STATIC_ROOT}")
+
+    def process_request(self, request):
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith(self.prefix):
+            return None
+        asset = self.assets.get(request.path[len(self.prefix):])
+        return asset.response(request) if asset else None
@@ -0,0 +1,9 @@
+"""Small statistics helpers shared by the job runner, traffic tools and benchmarks."""
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list; 0.0 when it is empty"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
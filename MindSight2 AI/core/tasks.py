@@ -0,0 +1,144 @@
+"""
+Background tasks run by ``manage.py runworker`` (see core/jobs.py).
+Every task may run more than once and is written to be idempotent.
+"""
+import logging
+from datetime import date, timedelta
+
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import Avg, Count
+from django.utils import timezone
+
+from .conditional import mark_chat_changed
+from .conversations import refresh as refresh_sessions
+from .jobs import task
+from .models import ChatMessage, ConversationSession, Job, MoodPoint, User, WeeklyReport
+from .timeseries import point_row, revise_messages
+
+logger = logging.getLogger(__name__)
+
+# Recent high-risk events kept in User.risk_history
+RISK_EVENTS_KEPT = 20
+PURGE_BATCH_SIZE = 1000
+# Risk level that queues escalate_risk
+HIGH_RISK_LEVEL = 7
+
+
+@task(priority=Job.CRITICAL, max_attempts=10)
+def escalate_risk(message_id):
+    """Record a high-risk message on the user's risk history and alert the on-call log.
+    Notification channels (emergency contact, clinician) hook in here."""
+    message = ChatMessage.objects.filter(pk=message_id).values('user_id', 'risk_level', 'timestamp').first()
+    if message is None:
+        return
+    with transaction.atomic():
+        user = User.objects.select_for_update().get(pk=message['user_id'])
+        history = user.risk_history if isinstance(user.risk_history, dict) else {}
+        events = history.get('events', [])
+        if any(event.get('message_id') == message_id for event in events):
+            return
+        events.append({
+            'message_id': message_id,
+            'risk_level': message['risk_level'],
+            'at': message['timestamp'].isoformat(),
+        })
+        history['events'] = events[-RISK_EVENTS_KEPT:]
+        history['high_risk_count'] = history.get('high_risk_count', 0) + 1
+        history['last_high_risk'] = message['timestamp'].isoformat()
+        user.risk_history = history
+        user.save(update_fields=['risk_history'])
+    logger.warning(f"Risk escalation: message {message_id} from user {message['user_id']} "
+                   f"scored {message['risk_level']}/10")
+
+
+@task(priority=Job.BATCH)
+def reanalyze_message(message_id):
+    """Fill in the analysis tiers shed when the message arrived, escalating
+    the message if only the richer tiers rate it high risk"""
+    from .analysis import analyze_text_full
+
+    message = ChatMessage.objects.filter(pk=message_id, analysis_tier__lt=ChatMessage.TIER_FULL).first()
+    if message is None:
+        return
+    analysis = analyze_text_full(message.user_message)
+    old_point = point_row(message)
+    old_risk = message.risk_level
+    message.sentiment_score = analysis['sentiment_score']
+    message.risk_level = analysis['risk_level']
+    message.emotions = analysis['emotions']
+    message.analysis_tier = analysis['tier']
+    message.save(update_fields=['sentiment_score', 'risk_level', 'emotions', 'analysis_tier'])
+    refresh_sessions([message.session_id])
+    revise_messages([old_point], [point_row(message)])
+    if message.risk_level >= HIGH_RISK_LEVEL > old_risk:
+        escalate_risk.delay(message.pk)
+
+
+@task()
+def purge_history(user_id):
+    """Delete a user's chat messages in short transactions, then their sessions
+    and mood series"""
+    messages = ChatMessage.objects.filter(user_id=user_id).order_by('pk')
+    deleted = 0
+    while True:
+        pks = list(messages.values_list('pk', flat=True)[:PURGE_BATCH_SIZE])
+        if not pks:
+            break
+        with transaction.atomic():
+            deleted += ChatMessage.objects.filter(pk__in=pks).delete()[0]
+            mark_chat_changed([user_id])
+    with transaction.atomic():
+        ConversationSession.objects.filter(user_id=user_id).delete()
+        MoodPoint.objects.filter(user_id=user_id).delete()
+        mark_chat_changed([user_id])
+    logger.info(f"Purged {deleted} chat messages of user {user_id}")
+
+
+@task(priority=Job.BATCH, max_attempts=3)
+def rescore_messages(**options):
+    """Run the rescore_messages command inline (see its --help for options)"""
+    call_command('rescore_messages', workers=1, **options)
+
+
+@task(priority=Job.BATCH)
+def build_weekly_report(user_id, week_start):
+    """Store the WeeklyReport of one user for the week starting ``week_start`` (ISO date)"""
+    from .views import generate_weekly_insights, generate_weekly_recommendations, summarize_emotions
+
+    week_start = date.fromisoformat(week_start)
+    week_end = week_start + timedelta(days=6)
+    chats = ChatMessage.objects.filter(user_id=user_id, timestamp__date__range=[week_start, week_end])
+    totals = chats.aggregate(total=Count('id'), sentiment=Avg('sentiment_score'), risk=Avg('risk_level'))
+    avg_sentiment = totals['sentiment'] or 0.0
+    avg_risk = totals['risk'] or 0.0
+    WeeklyReport.objects.update_or_create(
+        user_id=user_id,
+        week_start=week_start,
+        defaults={
+            'week_end': week_end,
+            'total_chats': totals['total'],
+            'average_sentiment': round(avg_sentiment, 2),
+            'average_risk': round(avg_risk, 1),
+            'dominant_emotion': summarize_emotions(chats)['dominant'],
+            'insights': generate_weekly_insights(chats, avg_sentiment, avg_risk),
+            'recommendations': generate_weekly_recommendations(avg_sentiment, avg_risk, totals['total']),
+        },
+    )
+
+
+@task(priority=Job.BATCH)
+def schedule_weekly_reports(week_start=None):
+    """Queue build_weekly_report for every user who chatted in the week
+    (by default the last complete week)"""
+    if week_start is None:
+        today = timezone.localdate()
+        week_start = (today - timedelta(days=today.weekday() + 7)).isoformat()
+    start = date.fromisoformat(week_start)
+    user_ids = (ChatMessage.objects.filter(timestamp__date__range=[start, start + timedelta(days=6)])
+                .order_by().values_list('user_id', flat=True).distinct())
+    queued = 0
+    for user_id in user_ids.iterator():
+        build_weekly_report.delay(user_id, week_start)
+        queued += 1
+    logger.info(f"Queued {queued} weekly reports for the week of {week_start}")
@@ -0,0 +1,369 @@
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+from concurrent.futures import Future
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+import numpy as np
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.archive import archive_month
+from core.ml.mlp_runtime import PARITY_TOLERANCE, MLPIntentModel, check_parity, export_keras_mlp
+from core.models import ChatMessage, ConversationSession, Job, MoodPoint, User
+from core.partitions import add_months, month_bounds, month_start
+from core import ratelimit
+from core.population import SENTIMENT_BINS, HyperLogLog, Sketch, user_hash
+from core.tasks import purge_history, reanalyze_message
+from core.timeseries import compact
+from core.views import generate_chatbot_response, keyword_lexicons
+from core.write_behind import WriteBehindBuffer
+
+try:
+    import tensorflow as tf
+except ImportError:
+    tf = None
+
+
+class MLPRuntimeTests(SimpleTestCase):
+    def test_forward_pass_of_loaded_npz(self):
+        rng = np.random.default_rng(0)
+        W0, b0 = rng.normal(size=(6, 4)).astype(np.float32), rng.normal(size=4).astype(np.float32)
+        W1, b1 = rng.normal(size=(4, 3)).astype(np.float32), rng.normal(size=3).astype(np.float32)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'mlp.npz')
+            np.savez_compressed(path, activations=np.array(['relu', 'softmax']), words=np.array(list('abcdef')),
+                                classes=np.array(['x', 'y', 'z']), W0=W0, b0=b0, W1=W1, b1=b1)
+            runtime = MLPIntentModel.load(path)
+
+        X = rng.integers(0, 2, size=(5, 6)).astype(np.float32)
+        logits = np.maximum(X @ W0 + b0, 0) @ W1 + b1
+        expected = np.exp(logits - logits.max(axis=1, keepdims=True))
+        expected /= expected.sum(axis=1, keepdims=True)
+        np.testing.assert_allclose(runtime.predict(X), expected, atol=1e-6)
+        np.testing.assert_allclose(runtime.predict(X[0]), expected[0], atol=1e-6)
+
+
+@unittest.skipIf(tf is None, 'TensorFlow is not installed')
+class MLPRuntimeParityTests(SimpleTestCase):
+    def test_exported_model_matches_keras(self):
+        # Same architecture as train_chatbot.py, on a small random vocabulary
+        words = [f'w{index}' for index in range(40)]
+        classes = [f'c{index}' for index in range(7)]
+        model = tf.keras.Sequential([
+            tf.keras.Input(shape=(len(words),)),
+            tf.keras.layers.Dense(128, activation='relu'),
+            tf.keras.layers.Dropout(0.5),
+            tf.keras.layers.Dense(64, activation='relu'),
+            tf.keras.layers.Dropout(0.5),
+            tf.keras.layers.Dense(len(classes), activation='softmax'),
+        ])
+        X = np.random.default_rng(0).integers(0, 2, size=(64, len(words))).astype(np.float32)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'chatbot_mlp.npz')
+            export_keras_mlp(model, words, classes, path)
+            runtime = MLPIntentModel.load(path)
+
+        self.assertEqual(runtime.classes, classes)
+        self.assertLessEqual(check_parity(model, runtime, X), PARITY_TOLERANCE)
+
+
+class ImportTimeTests(SimpleTestCase):
+    def test_startup_fits_the_default_budget(self):
+        # Raises CommandError when startup is over budget or imports a heavy library
+        call_command('importtime', stdout=io.StringIO())
+
+
+class ArchiveMonthTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('archived', password='secret')
+        self.month = add_months(month_start(date.today()), -13)
+        start, _ = month_bounds(self.month)
+        for day, (text, sentiment) in enumerate([('good day', 0.5), ('bad day', -0.5)]):
+            message = ChatMessage.objects.create(user=self.user, user_message=text, bot_response='ok',
+                                                 sentiment_score=sentiment, risk_level=2)
+            ChatMessage.objects.filter(pk=message.pk).update(timestamp=start + timedelta(days=day))
+            MoodPoint.objects.filter(user=self.user, resolution=MoodPoint.RAW, rolled_up=False,
+                                     start=message.timestamp).update(start=start + timedelta(days=day))
+        self.recent = ChatMessage.objects.create(user=self.user, user_message='today', bot_response='ok',
+                                                 sentiment_score=0.1, risk_level=1)
+
+    def test_dropping_a_month_refreshes_sessions_and_mood_buckets(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(CHAT_ARCHIVE_DIR=directory):
+            archive = archive_month(self.month)
+            self.assertEqual(archive.row_count, 2)
+
+            # The only session left is the one of the message still in the hot table
+            session = ConversationSession.objects.get(user=self.user)
+            self.assertEqual(session.message_count, 1)
+            self.assertEqual(session.sentiment_sum, 0.1)
+
+            start, end = month_bounds(self.month)
+            self.assertFalse(MoodPoint.objects.filter(user=self.user, resolution=MoodPoint.RAW, rolled_up=False,
+                                                      start__lt=end).exists())
+            bucket = MoodPoint.objects.get(user=self.user, resolution=MoodPoint.MONTH, start=start)
+            self.assertEqual(bucket.count, 2)
+            self.assertAlmostEqual(bucket.sentiment_sum, 0.0)
+            self.assertEqual(MoodPoint.objects.filter(user=self.user, resolution=MoodPoint.DAY).count(), 2)
+
+            self.client.force_login(self.user)
+            response = self.client.get(reverse('chat_export'))
+            rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['user_message'] for row in rows], ['good day', 'bad day', 'today'])
+
+
+class ChatSearchTests(TestCase):
+    def test_backend_without_search_returns_501(self):
+        user = User.objects.create_user('searcher', password='secret')
+        self.client.force_login(user)
+        with mock.patch('core.views.search_messages',
+                        side_effect=NotImplementedError('Chat search is not available on oracle')):
+            response = self.client.get(reverse('chat_search'), {'q': 'sleep'})
+        self.assertEqual(response.status_code, 501)
+        self.assertEqual(response.json(), {'error': 'Chat search is not available on oracle'})
+
+
+class MoodPointMaintenanceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('moody', password='secret')
+        self.message = ChatMessage.objects.create(user=self.user, user_message='rough week', bot_response='ok',
+                                                  sentiment_score=-0.2, risk_level=3,
+                                                  emotions={'sadness': 0.6, 'neutral': 0.4})
+        self.client.force_login(self.user)
+
+    def raw_point(self):
+        return MoodPoint.objects.get(user=self.user, resolution=MoodPoint.RAW)
+
+    def test_purge_deletes_the_mood_series(self):
+        compact()
+        purge_history(self.user.pk)
+        self.assertFalse(MoodPoint.objects.filter(user=self.user).exists())
+
+    def test_deleting_a_pending_message_deletes_its_raw_point(self):
+        self.client.post(reverse('delete_message', args=[self.message.pk]))
+        self.assertFalse(MoodPoint.objects.filter(user=self.user).exists())
+
+    def test_deleting_a_rolled_up_message_empties_its_buckets(self):
+        other = ChatMessage.objects.create(user=self.user, user_message='better', bot_response='ok',
+                                           sentiment_score=0.6, risk_level=1)
+        compact()
+        self.client.post(reverse('delete_message', args=[self.message.pk]))
+        buckets = MoodPoint.objects.filter(user=self.user).exclude(resolution=MoodPoint.RAW)
+        self.assertEqual({bucket.count for bucket in buckets}, {1})
+        for bucket in buckets:
+            self.assertAlmostEqual(bucket.sentiment_sum, other.sentiment_score)
+            self.assertAlmostEqual(bucket.emotion_sadness, 0.0)
+
+    def test_reanalysis_updates_the_pending_raw_point(self):
+        analysis = {'sentiment_score': -0.7, 'risk_level': 5, 'emotions': {'fear': 0.9}, 'tier': ChatMessage.TIER_FULL}
+        with mock.patch('core.analysis.analyze_text_full', return_value=analysis):
+            reanalyze_message(self.message.pk)
+        point = self.raw_point()
+        self.assertFalse(point.rolled_up)
+        self.assertEqual((point.sentiment_sum, point.risk_sum, point.risk_max), (-0.7, 5, 5))
+        self.assertEqual((point.emotion_fear, point.emotion_sadness), (0.9, 0.0))
+
+    def test_rescore_updates_raw_point_and_rolled_up_buckets(self):
+        compact()
+        rescored = [(0.4, 2, {'calm': 0.8}, ChatMessage.TIER_FULL)]
+        with mock.patch('core.management.commands.rescore_messages.score_batch', return_value=rescored):
+            call_command('rescore_messages', stdout=io.StringIO())
+        for point in MoodPoint.objects.filter(user=self.user):
+            self.assertEqual(point.count, 1)
+            self.assertAlmostEqual(point.sentiment_sum, 0.4)
+            self.assertAlmostEqual(point.risk_sum, 2)
+            self.assertAlmostEqual(point.emotion_calm, 0.8)
+            self.assertAlmostEqual(point.emotion_sadness, 0.0)
+
+
+class ReanalyzeMessageTests(TestCase):
+    def reanalyze(self, old_risk, new_risk):
+        user = User.objects.create_user(f'reanalyzed{old_risk}{new_risk}', password='secret')
+        message = ChatMessage.objects.create(user=user, user_message='cannot go on', bot_response='ok',
+                                             risk_level=old_risk, analysis_tier=ChatMessage.TIER_KEYWORD)
+        analysis = {'sentiment_score': -0.8, 'risk_level': new_risk, 'emotions': {}, 'tier': ChatMessage.TIER_FULL}
+        with mock.patch('core.analysis.analyze_text_full', return_value=analysis):
+            reanalyze_message(message.pk)
+        return Job.objects.filter(task='escalate_risk', args=[message.pk]).count()
+
+    def test_escalates_when_risk_crosses_the_threshold(self):
+        self.assertEqual(self.reanalyze(old_risk=3, new_risk=8), 1)
+
+    def test_does_not_escalate_twice_or_below_the_threshold(self):
+        self.assertEqual(self.reanalyze(old_risk=8, new_risk=9), 0)
+        self.assertEqual(self.reanalyze(old_risk=3, new_risk=6), 0)
+
+
+class WriteBehindFlushTests(TestCase):
+    def flush(self, messages):
+        buffer = WriteBehindBuffer(batch_size=len(messages), delay_ms=0)
+        futures = [(message, Future()) for message in messages]
+        with CaptureQueriesContext(connection) as queries:
+            buffer._flush(futures)
+        return [future for _, future in futures], len(queries)
+
+    def messages(self, users, per_user=3):
+        return [ChatMessage(user=user, user_message=f'note {index}', bot_response='ok', risk_level=1)
+                for user in users for index in range(per_user)]
+
+    def test_statements_do_not_grow_with_users(self):
+        users = [User.objects.create_user(f'writer{index}', password='secret') for index in range(12)]
+        _, few = self.flush(self.messages(users[:2]))
+        _, many = self.flush(self.messages(users[2:]))
+        self.assertEqual(few, many)
+        for user in users:
+            session = ConversationSession.objects.get(user=user)
+            self.assertEqual(session.message_count, 3)
+            self.assertEqual(session.messages.count(), 3)
+        # A second flush joins the existing sessions instead of opening new ones
+        self.flush(self.messages(users[:2]))
+        self.assertEqual(ConversationSession.objects.get(user=users[0]).message_count, 6)
+
+    def test_a_bad_row_does_not_lose_the_batch(self):
+        user = User.objects.create_user('writer', password='secret')
+        messages = self.messages([user], per_user=6)
+        messages[4].user_message = None
+        with self.assertLogs('core.write_behind', 'ERROR'):
+            futures, _ = self.flush(messages)
+        self.assertIsNotNone(futures[4].exception())
+        self.assertEqual([future.result().user_message for index, future in enumerate(futures) if index != 4],
+                         ['note 0', 'note 1', 'note 2', 'note 3', 'note 5'])
+        self.assertEqual(ConversationSession.objects.get(user=user).message_count, 5)
+        self.assertEqual(MoodPoint.objects.filter(user=user).count(), 5)
+
+
+class ChatbotResponseTests(SimpleTestCase):
+    GREETINGS = {"Hello! I'm MindSight AI. How are you feeling today?", 'Hello! How are you feeling today?',
+                 'Hi there! How can I help you?', 'Hello! Would you like to talk about something?'}
+
+    def test_greeting_only_matches_whole_words(self):
+        self.assertIn(generate_chatbot_response('hi'), self.GREETINGS)
+        for message in ('I think about ending it', 'this', 'think'):
+            self.assertNotIn(generate_chatbot_response(message), self.GREETINGS)
+
+    def test_crisis_message_gets_the_crisis_reply(self):
+        self.assertIn('988', generate_chatbot_response('I think about ending it'))
+
+
+class DashboardETagTests(TestCase):
+    def test_new_lexicon_version_changes_the_etag(self):
+        user = User.objects.create_user('dashboard', password='secret')
+        ChatMessage.objects.create(user=user, user_message='feeling hopeful', bot_response='ok')
+        self.client.force_login(user)
+        etag = self.client.get(reverse('dashboard_data'))['ETag']
+        self.assertEqual(self.client.get(reverse('dashboard_data'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with mock.patch.object(keyword_lexicons, 'version', keyword_lexicons.version + 1):
+            response = self.client.get(reverse('dashboard_data'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class PopulationSketchTests(SimpleTestCase):
+    FIELDS = ('count', 'high_risk_count', 'sentiment_histogram', 'risk_histogram', 'emotion_counts',
+              'hourly_counts', 'hourly_high_risk')
+
+    def messages(self, start, stop):
+        at = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+        return [(((index * 37) % 200 - 100) / 100, index % 11, index % 6, user_hash(index % 50),
+                 at + timedelta(hours=index % 24)) for index in range(start, stop)]
+
+    def sketch(self, messages):
+        sketch = Sketch()
+        for message in messages:
+            sketch.add(*message)
+        return sketch
+
+    def test_merge_equals_a_sketch_of_the_union(self):
+        merged = self.sketch(self.messages(0, 300)).merge(self.sketch(self.messages(300, 1000)))
+        whole = self.sketch(self.messages(0, 1000))
+        for field in self.FIELDS:
+            self.assertEqual(getattr(merged, field), getattr(whole, field), field)
+        self.assertAlmostEqual(merged.sentiment_sum, whole.sentiment_sum)
+        np.testing.assert_array_equal(merged.users.registers, whole.users.registers)
+
+    def test_quantile_interpolates_inside_the_bin(self):
+        width = 2 / SENTIMENT_BINS
+        sketch = Sketch()
+        self.assertIsNone(sketch.quantile(0.5))
+        at = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+        for sentiment in [-0.5] * 5 + [0.01] * 5:
+            sketch.add(sentiment, 0, 0, 1, at)
+        # -0.5 falls in the bin starting at -0.5, 0.01 in the one starting at 0
+        self.assertAlmostEqual(sketch.quantile(0.5), -0.5 + width)
+        self.assertAlmostEqual(sketch.quantile(0.6), width / 5)
+        self.assertAlmostEqual(sketch.quantile(0.2), -0.5 + width * 2 / 5)
+
+    def test_hyperloglog_error(self):
+        # Linear counting is close to exact for few users; about 1.6% standard error for many
+        for users, tolerance in ((10, 0), (100, 0.02), (1000, 0.05), (50000, 0.05)):
+            sketch = HyperLogLog()
+            for user_id in range(users):
+                sketch.add_hash(user_hash(user_id))
+            self.assertLessEqual(abs(sketch.count() - users), users * tolerance, users)
+        self.assertEqual(HyperLogLog(sketch.to_bytes()).count(), sketch.count())
+
+
+class ClockStore(ratelimit.LocalBucketStore):
+    clock = 100.0
+
+    def now(self):
+        return self.clock
+
+
+class RateLimitTests(SimpleTestCase):
+    def test_refusal_window_and_retry_after(self):
+        # One token a second, at most three at once
+        limit = ratelimit.RateLimit('test', per_minute=60, burst=3, store=ratelimit.LocalBucketStore())
+        self.assertEqual([limit.hit('key', now=100.0) for _ in range(3)], [0, 0, 0])
+        self.assertEqual(limit.hit('key', now=100.0), 1.0)
+        self.assertEqual(ratelimit.retry_after(limit.hit('key', now=100.5)), '1')
+        self.assertEqual(limit.hit('key', now=101.0), 0)
+        self.assertEqual(limit.hit('key', now=101.0), 1.0)
+        self.assertEqual((limit.allowed, limit.limited), (4, 3))
+        # A full bucket again after the burst window has drained
+        self.assertEqual([limit.hit('key', now=110.0) for _ in range(3)], [0, 0, 0])
+
+    def test_refused_request_does_not_charge_the_other_bucket(self):
+        store = ClockStore()
+        limits = (ratelimit.RateLimit('user', 60, 1, store), ratelimit.RateLimit('ip', 60, 5, store))
+        request = RequestFactory().post('/chat/message/', REMOTE_ADDR='10.0.0.1')
+        request.user = mock.Mock(is_authenticated=True, pk=7)
+        with mock.patch.object(ratelimit, '_limits', limits):
+            self.assertEqual(ratelimit.check(request), 0)
+            self.assertEqual(ratelimit.check(request), 1.0)
+            self.assertEqual(ratelimit.check(request), 1.0)
+        user_limit, ip_limit = limits
+        self.assertEqual((user_limit.allowed, user_limit.limited), (1, 2))
+        self.assertEqual((ip_limit.allowed, ip_limit.limited), (1, 0))
+        self.assertEqual(ip_limit.peek('10.0.0.1', store.clock), (store.clock + 2, 0))
+
+
+@override_settings(ANALYSIS_MAX_CONCURRENT=1, ANALYSIS_ADMISSION_WAIT_MS=0)
+class AnalysisSlotsTests(SimpleTestCase):
+    def test_sheds_when_no_slot_is_free(self):
+        slots = ratelimit.AnalysisSlots()
+        deadline = time.monotonic() + 1
+        self.assertTrue(slots.acquire(deadline))
+        self.assertFalse(slots.acquire(deadline))
+        slots.release()
+        self.assertTrue(slots.acquire(deadline))
+        slots.release()
+        self.assertEqual((slots.admitted, slots.shed, slots.peak, slots.in_use), (2, 1, 1, 0))
+
+    @override_settings(ANALYSIS_ADMISSION_WAIT_MS=1000)
+    def test_never_waits_past_the_deadline(self):
+        slots = ratelimit.AnalysisSlots()
+        self.assertTrue(slots.acquire(time.monotonic() + 1))
+        started = time.monotonic()
+        self.assertFalse(slots.acquire(started - 1))
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(slots.shed, 1)
@@ -0,0 +1,304 @@
+"""
+Multi-resolution mood time series (see ``MoodPoint``).
+
+Writes are one insert per chat message (``record_message``). ``compact``
+rolls pending raw points into hour, day and month buckets and prunes each
+tier after its retention period, so a chart reads at most a few hundred rows
+whatever the range: ``mood_series(user, 'year')`` reads about 366 day buckets
+plus the raw points not compacted yet.
+
+A raw point is matched to its message by user and timestamp. Deleting or
+rescoring messages goes through ``revise_messages``: a pending raw point is
+deleted or rewritten, and for one already rolled up the difference is applied
+to its buckets.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import EMOTIONS, MoodPoint
+
+logger = logging.getLogger(__name__)
+
+# How long each tier is kept (None keeps it forever)
+RETENTION = {
+    MoodPoint.RAW: timedelta(days=2),
+    MoodPoint.HOUR: timedelta(days=31),
+    MoodPoint.DAY: timedelta(days=731),
+    MoodPoint.MONTH: None,
+}
+
+# Chart range -> (bucket resolution, length of the range)
+RANGES = {
+    'week': (MoodPoint.HOUR, timedelta(days=7)),
+    'month': (MoodPoint.DAY, timedelta(days=31)),
+    'year': (MoodPoint.DAY, timedelta(days=366)),
+    'all': (MoodPoint.MONTH, None),
+}
+
+ROLLUP_RESOLUTIONS = (MoodPoint.HOUR, MoodPoint.DAY, MoodPoint.MONTH)
+EMOTION_SUMS = [f'emotion_{name}' for name in EMOTIONS]
+# ChatMessage columns a raw point is built from, for ``.values(*POINT_FIELDS)``
+POINT_FIELDS = ['user_id', 'timestamp', 'sentiment_score', 'risk_level'] + EMOTION_SUMS
+
+
+def bucket_start(value, resolution):
+    """Start of the UTC bucket containing ``value``"""
+    value = value.astimezone(dt_timezone.utc)
+    if resolution == MoodPoint.HOUR:
+        return value.replace(minute=0, second=0, microsecond=0)
+    if resolution == MoodPoint.DAY:
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == MoodPoint.MONTH:
+        return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return value
+
+
+def raw_point(row):
+    """Unsaved RAW point for a ChatMessage given as a dict of column values
+    (hot rows via ``.values()`` or archived rows)"""
+    risk = max(row.get('risk_level') or 0, 0)
+    return MoodPoint(
+        user_id=row['user_id'],
+        start=row['timestamp'],
+        sentiment_sum=row.get('sentiment_score') or 0.0,
+        risk_sum=risk,
+        risk_max=risk,
+        **{field: row.get(field) or 0.0 for field in EMOTION_SUMS},
+    )
+
+
+def point_row(message):
+    """POINT_FIELDS of a ChatMessage instance as a dict"""
+    return {field: getattr(message, field) for field in POINT_FIELDS}
+
+
+def record_message(message):
+    """Append the raw point for a newly saved ChatMessage"""
+    try:
+        raw_point(point_row(message)).save()
+    except Exception as e:
+        # The message itself is already stored; a missing point only thins the chart
+        logger.error(f"Could not record mood point for message {message.pk}: {e}")
+
+
+def record_messages(messages):
+    """record_message for a batch inserted with bulk_create (which skips save())"""
+    try:
+        MoodPoint.objects.bulk_create([raw_point(point_row(message)) for message in messages])
+    except Exception as e:
+        logger.error(f"Could not record mood points for {len(messages)} messages: {e}")
+
+
+def revise_messages(old_rows, new_rows=None, now=None):
+    """Bring the series in line with messages that were rescored (``new_rows``,
+    in the same order) or deleted (no ``new_rows``). Rows are dicts of
+    POINT_FIELDS; ``old_rows`` hold the values the points were recorded with.
+
+    A bucket's ``risk_max`` is only ever raised: lowering it would need the
+    other points of the bucket, which retention may have pruned."""
+    old_rows = list(old_rows)
+    if not old_rows:
+        return
+    new_rows = list(new_rows) if new_rows is not None else [None] * len(old_rows)
+    now = now or timezone.now()
+    with transaction.atomic():
+        raw = defaultdict(list)
+        for point in MoodPoint.objects.select_for_update().filter(
+                resolution=MoodPoint.RAW, user_id__in={row['user_id'] for row in old_rows},
+                start__in={row['timestamp'] for row in old_rows}):
+            raw[(point.user_id, point.start)].append(point)
+
+        to_delete, to_update, deltas = [], [], {}
+        for old, new in zip(old_rows, new_rows):
+            points = raw.get((old['user_id'], old['timestamp']))
+            point = points.pop() if points else None
+            if point is None:
+                # Pruned after roll-up, or never recorded if the message is recent
+                rolled_up = old['timestamp'] < now - RETENTION[MoodPoint.RAW]
+            else:
+                rolled_up = point.rolled_up
+                if new is None:
+                    to_delete.append(point.id)
+                else:
+                    replacement = raw_point(new)
+                    for field in MoodPoint.SUM_FIELDS + ['risk_max']:
+                        setattr(point, field, getattr(replacement, field))
+                    to_update.append(point)
+            if not rolled_up:
+                continue
+            # Difference between the new point (none when deleted) and the old one
+            delta = raw_point(old)
+            for field in MoodPoint.SUM_FIELDS:
+                setattr(delta, field, -getattr(delta, field))
+            delta.count = -1
+            delta.risk_max = 0
+            if new is not None:
+                _merge(delta, raw_point(new))
+            add_to_buckets(deltas, delta)
+
+        MoodPoint.objects.filter(id__in=to_delete).delete()
+        MoodPoint.objects.bulk_update(to_update, MoodPoint.SUM_FIELDS + ['risk_max'], batch_size=1000)
+
+        if deltas:
+            by_resolution = defaultdict(set)
+            for _, resolution, start in deltas:
+                by_resolution[resolution].add(start)
+            user_ids = {key[0] for key in deltas}
+            emptied, changed = [], []
+            for resolution, starts in by_resolution.items():
+                for bucket in MoodPoint.objects.select_for_update().filter(
+                        user_id__in=user_ids, resolution=resolution, start__in=starts):
+                    delta = deltas.get((bucket.user_id, bucket.resolution, bucket.start))
+                    if delta is None:
+                        continue
+                    _merge(bucket, delta)
+                    (changed if bucket.count > 0 else emptied).append(bucket)
+            MoodPoint.objects.filter(id__in=[bucket.id for bucket in emptied]).delete()
+            MoodPoint.objects.bulk_update(changed, ['count', 'risk_max'] + MoodPoint.SUM_FIELDS, batch_size=1000)
+
+
+def _merge(target, source):
+    target.count += source.count
+    for field in MoodPoint.SUM_FIELDS:
+        setattr(target, field, getattr(target, field) + getattr(source, field))
+    target.risk_max = max(target.risk_max, source.risk_max)
+
+
+def add_to_buckets(buckets, point):
+    """Fold a raw point into ``buckets``, a dict of unsaved hour/day/month
+    buckets keyed by ``(user_id, resolution, start)``"""
+    for resolution in ROLLUP_RESOLUTIONS:
+        key = (point.user_id, resolution, bucket_start(point.start, resolution))
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = MoodPoint(user_id=key[0], resolution=resolution, start=key[2], count=0)
+        _merge(bucket, point)
+
+
+def replace_buckets(user_ids, start, end, buckets, now=None):
+    """Swap the users' hour/day/month buckets inside ``[start, end)`` (whole
+    months) for ``buckets``, built with ``add_to_buckets`` from every one of
+    their messages in the range. Tiers past their retention are not recreated.
+    Pending raw points in the range are already in ``buckets``, so they are
+    marked rolled up and counted in the population analytics, as compaction
+    would have done."""
+    from . import population
+
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    now = now or timezone.now()
+    with transaction.atomic():
+        pending = list(MoodPoint.objects.select_for_update().filter(
+            user_id__in=user_ids, resolution=MoodPoint.RAW, rolled_up=False, start__gte=start, start__lt=end))
+        if pending:
+            population.record_points(pending)
+            MoodPoint.objects.filter(id__in=[point.id for point in pending]).update(rolled_up=True)
+        MoodPoint.objects.filter(user_id__in=user_ids, resolution__in=ROLLUP_RESOLUTIONS,
+                                 start__gte=start, start__lt=end).delete()
+        MoodPoint.objects.bulk_create([
+            bucket for (user_id, resolution, _), bucket in buckets.items()
+            if user_id in user_ids and (RETENTION[resolution] is None or bucket.start >= now - RETENTION[resolution])
+        ], batch_size=1000)
+
+
+def compact(batch_size=5000, now=None):
+    """Roll pending raw points into the hour/day/month tiers, then apply
+    retention. The same batches feed the population analytics (see
+    core/population.py). Returns ``(rolled_up, pruned)`` row counts. Run one
+    compactor at a time: buckets are updated read-modify-write."""
+    from . import population
+
+    rolled_up = 0
+    while True:
+        with transaction.atomic():
+            raw = list(
+                MoodPoint.objects.filter(resolution=MoodPoint.RAW, rolled_up=False)
+                .order_by('id')[:batch_size]
+            )
+            if not raw:
+                break
+
+            buckets = {}
+            for point in raw:
+                add_to_buckets(buckets, point)
+
+            existing = {}
+            by_resolution = defaultdict(set)
+            for user_id, resolution, start in buckets:
+                by_resolution[resolution].add(start)
+            user_ids = {key[0] for key in buckets}
+            for resolution, starts in by_resolution.items():
+                for point in MoodPoint.objects.select_for_update().filter(
+                        user_id__in=user_ids, resolution=resolution, start__in=starts):
+                    existing[(point.user_id, point.resolution, point.start)] = point
+
+            to_create, to_update = [], []
+            for key, bucket in buckets.items():
+                current = existing.get(key)
+                if current is None:
+                    to_create.append(bucket)
+                else:
+                    _merge(current, bucket)
+                    to_update.append(current)
+            MoodPoint.objects.bulk_create(to_create, batch_size=1000)
+            MoodPoint.objects.bulk_update(
+                to_update, ['count', 'risk_max'] + MoodPoint.SUM_FIELDS, batch_size=1000)
+            population.record_points(raw)
+            MoodPoint.objects.filter(id__in=[point.id for point in raw]).update(rolled_up=True)
+            rolled_up += len(raw)
+
+    now = now or timezone.now()
+    pruned = 0
+    for resolution, keep in RETENTION.items():
+        if keep is None:
+            continue
+        expired = MoodPoint.objects.filter(resolution=resolution, start__lt=now - keep)
+        if resolution == MoodPoint.RAW:
+            expired = expired.filter(rolled_up=True)
+        pruned += expired.delete()[0]
+    pruned += population.prune(now)
+    logger.info(f"Mood series compaction: {rolled_up} raw points rolled up, {pruned} expired rows pruned")
+    return rolled_up, pruned
+
+
+def mood_series(user, range_name='month', now=None):
+    """Chart points for ``user`` over a RANGES entry, oldest first.
+
+    Reads the range's bucket tier plus raw points the compactor has not
+    rolled up yet, so the newest messages show up immediately.
+    """
+    if range_name not in RANGES:
+        raise ValueError(f"Unknown range '{range_name}'")
+    resolution, length = RANGES[range_name]
+    now = now or timezone.now()
+    since = bucket_start(now - length, resolution) if length else None
+
+    points = MoodPoint.objects.filter(user=user).filter(
+        Q(resolution=resolution) | Q(resolution=MoodPoint.RAW, rolled_up=False))
+    if since is not None:
+        points = points.filter(start__gte=since)
+
+    buckets = {}
+    for point in points.order_by('start'):
+        key = bucket_start(point.start, resolution)
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = MoodPoint(resolution=resolution, start=key, count=0)
+        _merge(bucket, point)
+
+    return [{
+        'start': bucket.start.isoformat(),
+        'count': bucket.count,
+        'sentiment': round(bucket.sentiment_sum / bucket.count, 3),
+        'risk': round(bucket.risk_sum / bucket.count, 2),
+        'risk_max': bucket.risk_max,
+        'emotions': {
+            name: round(getattr(bucket, f'emotion_{name}') / bucket.count, 3) for name in EMOTIONS
+        },
+    } for bucket in sorted(buckets.values(), key=lambda bucket: bucket.start) if bucket.count]
@@ -0,0 +1,159 @@
+"""
+Chat traffic capture and replay for performance testing.
+
+Capture is opt-in (``TRAFFIC_CAPTURE_PATH``). Every chat message POST appends
+one JSON line to the log:
+
+    {"t": 1760870400.123, "u": "3f9a1c0b7e", "e": "chat_message", "n": 42, "x": "..."}
+
+``t`` is the arrival time, ``u`` a keyed hash of the user id (stable within a
+deployment, not reversible without SECRET_KEY), ``e`` the endpoint, ``n`` the
+message length and ``x`` the text as selected by ``TRAFFIC_CAPTURE_TEXT``:
+
+- ``synthetic`` (default): words found in the analysis lexicons are kept and
+  every other word becomes a same-length pseudo-word, so sentiment, risk and
+  intent scoring behave like the original while the content is unreadable;
+- ``length``: no text, replay generates filler of the recorded length;
+- ``raw``: the original message, for local debugging only.
+
+``replay_traffic`` drives a log against the Django test client or a running
+server and reports throughput, latency percentiles and query counts.
+"""
+import json
+import logging
+import os
+import re
+import string
+import time
+
+from django.utils.crypto import salted_hmac
+
+logger = logging.getLogger(__name__)
+
+CAPTURED_ENDPOINTS = ('chat_message', 'chat_message_stream')
+TEXT_MODES = ('synthetic', 'length', 'raw')
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_TOKEN_RE = re.compile(r'\w+|\W+', re.UNICODE)
+_FILLER_WORDS = ('today', 'about', 'there', 'which', 'thing', 'where', 'would', 'other')
+
+
+def pseudonymize_user(user_id):
+    return salted_hmac('core.traffic.user', str(user_id)).hexdigest()[:10]
+
+
+def preserved_words():
+    """Words that drive scoring and survive synthetic anonymization: the
+    keyword artifacts, chatbot patterns and the sentiment lexicon"""
+    from .ml.artifacts import discover
+    from .ml.lexicon import get_lexicon_scorer
+
+    words = set()
+
+    def add(phrases):
+        for phrase in phrases:
+            words.update(phrase.lower().split())
+
+    artifacts = discover()
+    lexicons = artifacts['keyword_lexicons'].get()
+    add(lexicons['positive'])
+    add(lexicons['negative'])
+    for _, emotion_words, _, _ in lexicons['emotions']:
+        add(emotion_words)
+    for risk_words, _ in lexicons['risk']:
+        add(risk_words)
+    add(artifacts['risk_keywords'].get()['keyword_weights'])
+    for patterns in artifacts['chatbot_responses'].get()['patterns'].values():
+        add(patterns)
+    scorer = get_lexicon_scorer()
+    if scorer is not None:
+        words.update(word for word in scorer.words if word.isalpha())
+    return frozenset(words)
+
+
+def _pseudo_word(word):
+    """Deterministic same-length stand-in keeping case and digit positions"""
+    digest = salted_hmac('core.traffic.word', word.lower(), algorithm='sha256').digest()
+    letters = []
+    for index, char in enumerate(word):
+        byte = digest[index % len(digest)] + index
+        if char.isdigit():
+            letters.append(string.digits[byte % 10])
+        elif char.isupper():
+            letters.append(string.ascii_uppercase[byte % 26])
+        else:
+            letters.append(string.ascii_lowercase[byte % 26])
+    return ''.join(letters)
+
+
+def synthesize_text(text, keep):
+    """Replace every word not in ``keep`` with a same-length pseudo-word;
+    punctuation and whitespace are preserved"""
+    tokens = _TOKEN_RE.findall(text)
+    return ''.join(
+        _pseudo_word(token) if _WORD_RE.fullmatch(token) and token.lower() not in keep else token
+        for token in tokens
+    )
+
+
+def filler_text(length, seed=0):
+    """Neutral text of exactly ``length`` characters for logs recorded without text"""
+    words = []
+    size = 0
+    index = seed
+    while size < length:
+        word = _FILLER_WORDS[index % len(_FILLER_WORDS)]
+        words.append(word)
+        size += len(word) + 1
+        index += 1
+    return ' '.join(words)[:length]
+
+
+class TrafficRecorder:
+    def __init__(self, path, text_mode='synthetic', sample_rate=1.0):
+        if text_mode not in TEXT_MODES:
+            raise ValueError(f"TRAFFIC_CAPTURE_TEXT must be one of {', '.join(TEXT_MODES)}")
+        self.path = path
+        self.text_mode = text_mode
+        self.sample_rate = sample_rate
+        self._keep = None
+
+    def sampled(self, user_id):
+        """Sample whole users, not single messages, so sessions stay intact"""
+        if self.sample_rate >= 1:
+            return True
+        bucket = int(pseudonymize_user(user_id)[:8], 16) / 0xFFFFFFFF
+        return bucket < self.sample_rate
+
+    def record(self, endpoint, user_id, message, arrival=None):
+        arrival = arrival or time.time()
+        if not self.sampled(user_id):
+            return
+        entry = {
+            't': round(arrival, 3),
+            'u': pseudonymize_user(user_id),
+            'e': endpoint,
+            'n': len(message),
+        }
+        if self.text_mode == 'raw':
+            entry['x'] = message
+        elif self.text_mode == 'synthetic':
+            if self._keep is None:
+                self._keep = preserved_words()
+            entry['x'] = synthesize_text(message, self._keep)
+        line = (json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        # One O_APPEND write per line keeps lines from several workers intact
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+
+def read_log(path):
+    """Yield log entries in recorded order"""
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
@@ -5,18 +5,26 @@ from . import views
 urlpatterns = [
     path('', views.home, name='home'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/data/', views.dashboard_data, name='dashboard_data'),
     path('login/', views.user_login, name='login'),
     path('logout/', views.user_logout, name='logout'),
     path('register/', views.register, name='register'),
     path('chat/', views.chat_view, name='chat'),
     path('chat/message/', views.chat_message, name='chat_message'),
+    path('chat/message/stream/', views.chat_message_stream, name='chat_message_stream'),
     path('chat/history/', views.chat_history, name='chat_history'),
+    path('chat/search/', views.chat_search, name='chat_search'),
+    path('chat/sessions/', views.chat_sessions, name='chat_sessions'),
     path('chat/clear-history/', views.clear_history, name='clear_history'),
     path('reports/weekly/', views.weekly_report, name='weekly_report'),
+    path('reports/weekly/data/', views.weekly_report_data, name='weekly_report_data'),
+    path('reports/trends/', views.mood_trends, name='mood_trends'),
     path('chat/faq_quiz/', views.faq_quiz, name='faq_quiz'),
     path('chat/history/', views.chat_history, name='chat_history'),
     path('chat/history/clear/', views.clear_history, name='clear_history'),
+    path('chat/history/export/', views.chat_export, name='chat_export'),
     path('chat/history/delete/<int:message_id>/', views.delete_single_message, name='delete_message'),
+    path('ops/admission/', views.admission_metrics, name='admission_metrics'),
 
     # Auth URLs
     path('login/', views.user_login, name='login'),
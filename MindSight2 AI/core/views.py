@@ -2,18 +2,59 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse, StreamingHttpResponse
 from django.contrib import messages
+from django.core.serializers.json import DjangoJSONEncoder
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
-from .models import User, ChatMessage, TextAnalysisSession, ImageReflectionTest
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_GET, require_http_methods
+from django.db.models import Avg, Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .analysis import analyze_text, TIER_NAMES
+from .archive import iter_chat_history
+from .conditional import chat_data_condition, mark_chat_changed
+from .conversations import refresh as refresh_sessions
+from .ratelimit import metrics as admission_stats
+from .routers import use_read_replica
+from .search import search_messages
+from .tasks import escalate_risk, purge_history, reanalyze_message
+from .write_behind import write_chat_message
+from .timeseries import mood_series, revise_messages, POINT_FIELDS, RANGES
+from .ml.artifacts import Artifact
+from .ml.chatbot import ChatbotInterface
+from .ml.recommendation_engine import recommendations
+from .models import (User, ChatMessage, ConversationSession, TextAnalysisSession, ImageReflectionTest, MoodPoint,
+                     EMOTIONS)
+import asyncio
 import json
-import random
 import logging
 from datetime import datetime, timedelta
+from asgiref.sync import sync_to_async
 
 logger = logging.getLogger(__name__)
 
+chatbot = ChatbotInterface()
+
+
+def compile_keyword_lexicons(data):
+    """Keyword lists behind the *_simple analyzers; emotions keep their file order"""
+    return {
+        'positive': tuple(data['sentiment']['positive']),
+        'negative': tuple(data['sentiment']['negative']),
+        'base_neutral': float(data['base_neutral']),
+        'emotions': [
+            (entry['emotion'], tuple(entry['words']), float(entry['score']), float(entry['neutral']))
+            for entry in data['emotions'] if entry['emotion'] in EMOTIONS
+        ],
+        'risk': [(tuple(tier['words']), tier['weight']) for tier in data['risk']],
+    }
+
+
+keyword_lexicons = Artifact('keyword_lexicons', compile_keyword_lexicons)
+
 # Custom User Creation Form
 class CustomUserCreationForm(UserCreationForm):
     class Meta:
@@ -27,47 +68,64 @@ def home(request):
         return redirect('dashboard')
     return render(request, 'base.html')
 
+def dashboard_period():
+    """First day of the dashboard's rolling week (today and the six days before)"""
+    return timezone.localdate() - timedelta(days=6)
+
+
+def report_week():
+    """Monday of the current week"""
+    today = timezone.localdate()
+    return today - timedelta(days=today.weekday())
+
+
 @login_required
 def dashboard(request):
-    """Dashboard view with REAL data"""
-    try:
-        # Get real data from database
-        user_chats = ChatMessage.objects.filter(user=request.user)
-        
-        # Calculate real metrics
-        total_chats = user_chats.count()
-        
-        # Get last week's data for trends
-        week_ago = datetime.now() - timedelta(days=7)
-        recent_chats = user_chats.filter(timestamp__gte=week_ago)
-        
-        # Calculate real sentiment from chat history
-        sentiment_data = calculate_real_sentiment(recent_chats)
-        risk_data = calculate_real_risk_level(recent_chats)
-        
-        # Get recent chat preview
-        recent_messages = list(recent_chats.order_by('-timestamp')[:5])
-        
-        context = {
-            'total_chats': total_chats,
-            'recent_chats_count': recent_chats.count(),
-            'sentiment_data': sentiment_data,
-            'risk_data': risk_data,
-            'recent_messages': recent_messages,
-            'user': request.user
-        }
-        return render(request, 'dashboard.html', context)
-        
-    except Exception as e:
-        logger.error(f"Dashboard error: {str(e)}")
-        # Fallback to basic dashboard
-        return render(request, 'dashboard.html', {
-            'total_chats': 0,
-            'recent_chats_count': 0,
-            'sentiment_data': {'positive': 0, 'neutral': 100, 'negative': 0},
-            'risk_data': {'level': 0, 'category': 'low'},
-            'recent_messages': []
-        })
+    """Dashboard page; the metrics are fetched from dashboard_data"""
+    return render(request, 'dashboard.html', {'user': request.user})
+
+
+@require_GET
+@login_required
+@use_read_replica
+@cache_control(private=True, no_cache=True)
+@chat_data_condition('dashboard', dashboard_period, artifacts=[keyword_lexicons])
+def dashboard_data(request):
+    """Dashboard metrics as JSON; 304 when the user's chats have not changed"""
+    user_chats = ChatMessage.objects.filter(user=request.user)
+    since = timezone.make_aware(datetime.combine(dashboard_period(), datetime.min.time()))
+    recent_chats = user_chats.filter(timestamp__gte=since)
+    last_session = ConversationSession.objects.filter(user=request.user).first()
+    return JsonResponse({
+        'total_chats': user_chats.count(),
+        'recent_chats_count': recent_chats.count(),
+        'sentiment_data': calculate_real_sentiment(recent_chats),
+        'risk_data': calculate_real_risk_level(recent_chats),
+        'emotion_data': summarize_emotions(recent_chats),
+        'recent_messages': [{
+            'id': chat.id,
+            'user_message': chat.user_message,
+            'timestamp': chat.timestamp.isoformat(),
+            'sentiment_score': chat.sentiment_score,
+            'risk_level': chat.risk_level,
+        } for chat in recent_chats.order_by('-timestamp')[:5]],
+        'last_session': last_session.summary() if last_session else None,
+    })
+
+def summarize_emotions(chats):
+    """Average the typed emotion columns and find the most frequent dominant emotion in SQL"""
+    averages = chats.aggregate(**{name: Avg(f'emotion_{name}') for name in EMOTIONS})
+    top = (
+        chats.order_by()
+        .values('dominant_emotion')
+        .annotate(total=Count('id'))
+        .order_by('-total', 'dominant_emotion')
+        .first()
+    )
+    return {
+        'averages': {name: round(value or 0.0, 3) for name, value in averages.items()},
+        'dominant': EMOTIONS[top['dominant_emotion']] if top else 'neutral',
+    }
 
 def calculate_real_sentiment(chats):
     """Calculate real sentiment from chat messages"""
@@ -167,79 +225,209 @@ def chat_message(request):
         # Generate chatbot response
         bot_response = generate_chatbot_response(message)
         
-        # Analyze message with ML
-        sentiment_score = analyze_sentiment_simple(message)
-        risk_data = assess_risk_simple(message)
-        emotions = analyze_emotions_simple(message)
+        # Analyze message with ML (richer tiers are shed under load)
+        analysis = analyze_text(message)
         
-        # Save to database with ML analysis
-        chat = ChatMessage.objects.create(
+        # Save to database with ML analysis (batched when CHAT_WRITE_BEHIND is on)
+        saved = write_chat_message(ChatMessage(
             user=request.user,
             user_message=message,
             bot_response=bot_response,
-            sentiment_score=sentiment_score,
-            risk_level=risk_data['risk_level'],
-            emotions=emotions
-        )
+            sentiment_score=analysis['sentiment_score'],
+            risk_level=analysis['risk_level'],
+            emotions=analysis['emotions'],
+            analysis_tier=analysis['tier']
+        ))
+        if saved.done():
+            # Written synchronously; result() re-raises a failed insert
+            queue_followups(saved.result(), analysis)
+        else:
+            saved.add_done_callback(lambda done: after_chat_saved(done, analysis))
         
         return JsonResponse({
             'success': True, 
             'response': bot_response,
             'user_message': message,
-            'sentiment_score': sentiment_score,
-            'risk_level': risk_data['risk_level'],
-            'emotions': emotions
+            'sentiment_score': analysis['sentiment_score'],
+            'risk_level': analysis['risk_level'],
+            'emotions': analysis['emotions'],
+            'analysis_tier': TIER_NAMES[analysis['tier']]
         })
         
     except Exception as e:
         logger.error(f"Chat message error: {str(e)}")
         return JsonResponse({'success': False, 'error': 'Internal server error'})
 
+def queue_followups(chat, analysis):
+    """Background work for a new message: escalation for high risk, and
+    re-analysis when richer tiers were shed under load"""
+    try:
+        if analysis['risk_level'] >= 7:
+            escalate_risk.delay(chat.id)
+        if analysis['tier'] < ChatMessage.TIER_FULL:
+            reanalyze_message.delay(chat.id)
+    except Exception as e:
+        logger.error(f"Could not queue follow-up jobs for message {chat.id}: {e}")
+
+def after_chat_saved(saved, analysis):
+    """Done-callback of write_chat_message for callers that do not wait on it"""
+    error = saved.exception()
+    if error is not None:
+        logger.error(f"Chat message could not be saved: {error}")
+        return
+    queue_followups(saved.result(), analysis)
+
+def sse_event(event, data):
+    """Format a single server-sent event frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_chat_events(user, message):
+    """Yield the bot reply first, then the analysis and recommendations as they finish"""
+    try:
+        bot_response = generate_chatbot_response(message)
+        yield sse_event('reply', {'response': bot_response, 'user_message': message})
+
+        # Analyzers may be slow, so run them off the event loop
+        analysis = await sync_to_async(analyze_text, thread_sensitive=False)(message)
+        emotions = analysis['emotions']
+        yield sse_event('analysis', {
+            'analysis': {
+                'emotions': emotions,
+                'dominant_emotion': max(emotions.items(), key=lambda x: x[1])[0],
+                'sentiment_score': analysis['sentiment_score'],
+                'tier': TIER_NAMES[analysis['tier']]
+            },
+            'risk_assessment': {'risk_level': analysis['risk_level'], 'risk_category': analysis['risk_category']},
+        })
+
+        saved = await sync_to_async(write_chat_message)(ChatMessage(
+            user=user,
+            user_message=message,
+            bot_response=bot_response,
+            sentiment_score=analysis['sentiment_score'],
+            risk_level=analysis['risk_level'],
+            emotions=emotions,
+            analysis_tier=analysis['tier']
+        ))
+        chat = await asyncio.wrap_future(saved)
+        await sync_to_async(queue_followups)(chat, analysis)
+
+        yield sse_event('recommendations', {
+            'recommendations': get_simple_recommendations(analysis['risk_level'])
+        })
+        yield sse_event('done', {'success': True, 'message_id': chat.id})
+
+    except Exception as e:
+        logger.error(f"Chat stream error: {str(e)}")
+        yield sse_event('error', {'success': False, 'error': 'Internal server error'})
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def chat_message_stream(request):
+    """Stream the chat reply and its analysis as server-sent events.
+    Events are delivered progressively when served over ASGI."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'success': False, 'error': 'Authentication required'}, status=401)
+
+    message = request.POST.get('message', '').strip()
+    if not message:
+        return JsonResponse({'success': False, 'error': 'Empty message'})
+
+    response = StreamingHttpResponse(stream_chat_events(user, message), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+    return response
+
 def generate_chatbot_response(message):
-    """Enhanced chatbot response generator"""
-    message_lower = message.lower()
-    
-    # Mental health focused responses
-    if any(word in message_lower for word in ['hello', 'hi', 'hey']):
-        return "Hello! I'm MindSight AI. How are you feeling today?"
-    elif any(word in message_lower for word in ['sad', 'depressed', 'unhappy', 'down']):
-        return "I'm sorry you're feeling this way. It takes courage to acknowledge these feelings. Would you like to talk about what's been on your mind?"
-    elif any(word in message_lower for word in ['anxious', 'nervous', 'worried', 'panic']):
-        return "Anxiety can feel overwhelming. Let's explore what might be causing these feelings together. Remember to breathe deeply."
-    elif any(word in message_lower for word in ['happy', 'good', 'great', 'awesome']):
-        return "That's wonderful to hear! Celebrating positive moments is important. What's been going well for you?"
-    elif any(word in message_lower for word in ['stress', 'stressed', 'overwhelmed']):
-        return "Stress can be challenging. Let's break down what's causing this feeling and explore some coping strategies."
-    elif any(word in message_lower for word in ['lonely', 'alone', 'isolated']):
-        return "Feeling lonely can be difficult. Remember that reaching out is a sign of strength. Would you like to explore ways to build connections?"
-    elif any(word in message_lower for word in ['angry', 'mad', 'frustrated']):
-        return "Anger is a natural emotion. Let's explore what's triggering these feelings and find healthy ways to express them."
-    elif any(word in message_lower for word in ['thank', 'thanks', 'appreciate']):
-        return "You're welcome! I'm here to support you on your mental wellness journey."
-    elif any(word in message_lower for word in ['bye', 'goodbye', 'see you']):
-        return "Take care of yourself! Remember to practice self-care. I'm here whenever you need to talk."
-    elif any(word in message_lower for word in ['help', 'emergency', 'crisis']):
-        return "If you're in crisis, please contact emergency services or a crisis helpline immediately. You can also call 988 for mental health support."
-    else:
-        responses = [
-            "I understand. Could you tell me more about how you're feeling?",
-            "Thank you for sharing. What's been on your mind lately?",
-            "I'm listening. How has your day been going?",
-            "That sounds important. Would you like to explore this further?",
-            "I appreciate you opening up. Let's continue our conversation."
-        ]
-        return random.choice(responses)
+    """Reply from the chatbot_responses table: the intent of the closest
+    pattern, matched on whole words, or a default reply when no pattern
+    scores INTENT_MIN_SCORE"""
+    return chatbot.chat(message)
+
+
+def parse_search_params(params):
+    """Validate chat search query parameters into search_messages() kwargs.
+    Dates are YYYY-MM-DD and both ends are inclusive; search_messages() checks
+    the risk band, sort and cursor. Raises ValueError."""
+    filters = {}
+    for name, key, days in (('from', 'date_from', 0), ('to', 'date_to', 1)):
+        value = params.get(name)
+        if value:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(f"'{name}' must be a YYYY-MM-DD date")
+            filters[key] = timezone.make_aware(datetime.combine(day + timedelta(days=days), datetime.min.time()))
+    for name in ('risk', 'sort', 'cursor'):
+        if params.get(name):
+            filters[name] = params[name]
+    return filters
+
+
+@login_required
+@use_read_replica
+def chat_search(request):
+    """JSON search over the user's chat history, best match first, paged by cursor"""
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'error': "Missing 'q'"}, status=400)
+    try:
+        filters = parse_search_params(request.GET)
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 100)
+        results, next_cursor = search_messages(request.user, query, limit=limit, **filters)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except NotImplementedError as e:
+        # No full-text index on this database backend
+        return JsonResponse({'error': str(e)}, status=501)
+
+    return JsonResponse({
+        'query': query,
+        'results': [{
+            'id': chat.id,
+            'timestamp': chat.timestamp.isoformat(),
+            'user_message': chat.user_message,
+            'bot_response': chat.bot_response,
+            'sentiment_score': chat.sentiment_score,
+            'risk_level': chat.risk_level,
+            'rank': chat.search_rank,
+        } for chat in results],
+        'next_cursor': next_cursor,
+    })
 
 
 @login_required
+@use_read_replica
+def chat_sessions(request):
+    """JSON summaries of the user's recent conversation sessions, newest first"""
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 100)
+    except ValueError:
+        return JsonResponse({'error': "'limit' must be an integer"}, status=400)
+    sessions = ConversationSession.objects.filter(user=request.user)[:limit]
+    return JsonResponse({'sessions': [session.summary() for session in sessions]})
+
+
+@login_required
+@use_read_replica
 def chat_history(request):
     """Chat history page with REAL data"""
     print(f"📖 CHAT HISTORY - User: {request.user}, Authenticated: {request.user.is_authenticated}")
+    search_query = request.GET.get('q', '').strip()
     try:
-        recent_chats = ChatMessage.objects.filter(user=request.user).order_by('-timestamp')[:50]
+        next_page = None
+        if search_query:
+            filters = parse_search_params(request.GET)
+            recent_chats, next_cursor = search_messages(request.user, search_query, limit=50, **filters)
+            if next_cursor:
+                params = request.GET.copy()
+                params['cursor'] = next_cursor
+                next_page = f"?{params.urlencode()}"
+        else:
+            recent_chats = ChatMessage.objects.filter(user=request.user).order_by('-timestamp')[:50]
         
         # Calculate statistics
-        total_chats = recent_chats.count()
+        total_chats = len(recent_chats)
         if total_chats > 0:
             avg_sentiment = sum(chat.sentiment_score for chat in recent_chats if chat.sentiment_score) / total_chats
             avg_risk = sum(chat.risk_level for chat in recent_chats if chat.risk_level) / total_chats
@@ -252,6 +440,9 @@ def chat_history(request):
             'total_chats': total_chats,
             'avg_sentiment': round(avg_sentiment, 2),
             'avg_risk': round(avg_risk, 1),
+            'search_query': search_query,
+            'search_params': request.GET,
+            'next_page': next_page,
             'user': request.user  # ✅ FIX: Pass the user object, not just username
         }
         return render(request, 'chat/history.html', context)
@@ -263,19 +454,37 @@ def chat_history(request):
             'total_chats': 0,
             'avg_sentiment': 0,
             'avg_risk': 0,
-            'error': 'Unable to load chat history',
+            'error': str(e) if isinstance(e, ValueError) else 'Unable to load chat history',
+            'search_query': search_query,
+            'search_params': request.GET,
             'user': request.user  # ✅ FIX: Always pass user object
         })
+# Message columns included in a history export
+EXPORT_FIELDS = ('timestamp', 'user_message', 'bot_response', 'sentiment_score', 'risk_level', 'emotions')
+
+
+@login_required
+@require_GET
+def chat_export(request):
+    """Download the user's full chat history, archived months included, as NDJSON"""
+    def lines():
+        for row in iter_chat_history(request.user):
+            yield json.dumps({field: row[field] for field in EXPORT_FIELDS}, cls=DjangoJSONEncoder) + '\n'
+
+    response = StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="mindsight-chat-history-{timezone.localdate()}.ndjson"'
+    return response
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 @login_required
 def clear_history(request):
-    """Clear all chat history"""
+    """Clear all chat history (the delete runs as a background job)"""
     try:
-        deleted_count, _ = ChatMessage.objects.filter(user=request.user).delete()
-        
-        if deleted_count > 0:
-            messages.success(request, f'All {deleted_count} messages cleared successfully.')
+        if ChatMessage.objects.filter(user=request.user).exists():
+            purge_history.delay(request.user.id)
+            messages.success(request, 'Your chat history is being cleared.')
         else:
             messages.info(request, 'No messages to clear.')
             
@@ -294,9 +503,14 @@ def delete_single_message(request, message_id):
         print(f"Deleting message {message_id} for user {request.user}")
         
         # Simple delete using filter
-        deleted_count, _ = ChatMessage.objects.filter(id=message_id, user=request.user).delete()
+        message = ChatMessage.objects.filter(id=message_id, user=request.user)
+        rows = list(message.values('session_id', *POINT_FIELDS))
+        deleted_count, _ = message.delete()
         
         if deleted_count > 0:
+            refresh_sessions(row['session_id'] for row in rows)
+            revise_messages(rows)
+            mark_chat_changed([request.user.id])
             messages.success(request, 'Message deleted successfully.')
             print(f"✅ Deleted {deleted_count} message(s)")
         else:
@@ -311,130 +525,96 @@ def delete_single_message(request, message_id):
 
 @login_required
 def weekly_report(request):
-    """Weekly report page with REAL data"""
-    try:
-        # Calculate date range for this week
-        today = datetime.now().date()
-        week_start = today - timedelta(days=today.weekday())
-        week_end = week_start + timedelta(days=6)
-        
-        # Get this week's chats
-        week_chats = ChatMessage.objects.filter(
+    """Weekly report page; the figures and charts are fetched from weekly_report_data"""
+    week_start = report_week()
+    return render(request, 'reports/weekly.html', {
+        'week_start': week_start.strftime('%Y-%m-%d'),
+        'week_end': (week_start + timedelta(days=6)).strftime('%Y-%m-%d'),
+    })
+
+
+@require_GET
+@login_required
+@use_read_replica
+@cache_control(private=True, no_cache=True)
+@chat_data_condition('weekly', report_week)
+def weekly_report_data(request):
+    """This week's report figures and chart series as JSON; 304 when the user's
+    chats have not changed this week"""
+    week_start = report_week()
+    week_end = week_start + timedelta(days=6)
+    week_days = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+    week_chats = ChatMessage.objects.filter(user=request.user, timestamp__date__range=[week_start, week_end])
+
+    totals = week_chats.aggregate(
+        total=Count('id'), sentiment=Avg('sentiment_score'), risk=Avg('risk_level'),
+        low=Count('id', filter=Q(risk_level__lt=4)),
+        medium=Count('id', filter=Q(risk_level__gte=4, risk_level__lt=7)),
+        high=Count('id', filter=Q(risk_level__gte=7)),
+    )
+    total_chats = totals['total']
+    avg_sentiment = totals['sentiment'] or 0
+    avg_risk = totals['risk'] or 0
+
+    daily_messages = [0] * 7
+    daily_sentiment = [0] * 7
+    if total_chats > 0:
+        dominant_emotion = summarize_emotions(week_chats)['dominant']
+
+        # Risk trend (simple comparison with last week)
+        last_week_risk = ChatMessage.objects.filter(
             user=request.user,
-            timestamp__date__range=[week_start, week_end]
-        )
-        
-        # Calculate real metrics
-        total_chats = week_chats.count()
-        
-        if total_chats > 0:
-            sentiment_scores = [chat.sentiment_score for chat in week_chats if chat.sentiment_score is not None]
-            risk_levels = [chat.risk_level for chat in week_chats if chat.risk_level is not None]
-            
-            avg_sentiment = sum(sentiment_scores) / len(sentiment_scores) if sentiment_scores else 0
-            avg_risk = sum(risk_levels) / len(risk_levels) if risk_levels else 0
-            
-            # Determine dominant emotion based on sentiment
-            if avg_sentiment > 0.3:
-                dominant_emotion = 'positive'
-            elif avg_sentiment < -0.3:
-                dominant_emotion = 'concerned'
-            else:
-                dominant_emotion = 'neutral'
-                
-            # Risk trend (simple comparison with last week)
-            last_week_start = week_start - timedelta(days=7)
-            last_week_end = week_start - timedelta(days=1)
-            last_week_chats = ChatMessage.objects.filter(
-                user=request.user,
-                timestamp__date__range=[last_week_start, last_week_end]
-            )
-            
-            if last_week_chats.count() > 0:
-                last_week_risk = sum(chat.risk_level for chat in last_week_chats if chat.risk_level) / last_week_chats.count()
-                risk_trend = 'decreasing' if avg_risk < last_week_risk else 'increasing' if avg_risk > last_week_risk else 'stable'
-            else:
-                risk_trend = 'stable'
-                
-            # **NEW: Calculate daily data for charts**
-            week_days = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-            daily_messages = []
-            daily_sentiment = []
-            
-            # Calculate data for each day of the week
-            for i in range(7):
-                day_date = week_start + timedelta(days=i)
-                day_chats = week_chats.filter(timestamp__date=day_date)
-                
-                # Daily message count
-                daily_messages.append(day_chats.count())
-                
-                # Daily average sentiment
-                if day_chats.exists():
-                    day_sentiments = [chat.sentiment_score for chat in day_chats if chat.sentiment_score is not None]
-                    daily_sentiment.append(round(sum(day_sentiments) / len(day_sentiments), 2) if day_sentiments else 0)
-                else:
-                    daily_sentiment.append(0)
-            
-            # **NEW: Calculate risk distribution**
-            low_risk_count = week_chats.filter(risk_level__lt=4).count()
-            medium_risk_count = week_chats.filter(risk_level__gte=4, risk_level__lt=7).count()
-            high_risk_count = week_chats.filter(risk_level__gte=7).count()
-            
-            total_risk_chats = low_risk_count + medium_risk_count + high_risk_count
-            if total_risk_chats > 0:
-                risk_distribution = [
-                    round((low_risk_count / total_risk_chats) * 100),
-                    round((medium_risk_count / total_risk_chats) * 100),
-                    round((high_risk_count / total_risk_chats) * 100)
-                ]
-            else:
-                risk_distribution = [0, 0, 0]
-                
-        else:
-            avg_sentiment = 0
-            avg_risk = 0
-            dominant_emotion = 'neutral'
+            timestamp__date__range=[week_start - timedelta(days=7), week_start - timedelta(days=1)],
+        ).aggregate(risk=Avg('risk_level'))['risk']
+        if last_week_risk is None:
             risk_trend = 'stable'
-            # **NEW: Empty data for no chats**
-            week_days = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-            daily_messages = [0, 0, 0, 0, 0, 0, 0]
-            daily_sentiment = [0, 0, 0, 0, 0, 0, 0]
-            risk_distribution = [0, 0, 0]
-        
-        # Generate insights based on real data
-        insights = generate_weekly_insights(week_chats, avg_sentiment, avg_risk)
-        recommendations = generate_weekly_recommendations(avg_sentiment, avg_risk, total_chats)
-        
-        context = {
-            'week_start': week_start.strftime('%Y-%m-%d'),
-            'week_end': week_end.strftime('%Y-%m-%d'),
-            'total_chats': total_chats,
-            'average_sentiment': round(avg_sentiment, 2),
-            'dominant_emotion': dominant_emotion,
-            'risk_trend': risk_trend,
-            'average_risk': round(avg_risk, 1),
-            'insights': insights,
-            'recommendations': recommendations,
-            'has_data': total_chats > 0,
-            # **NEW: Chart data**
-            'week_days': week_days,
-            'daily_messages': daily_messages,
-            'daily_sentiment': daily_sentiment,
-            'risk_distribution': risk_distribution,
-        }
-        return render(request, 'reports/weekly.html', context)
-        
-    except Exception as e:
-        logger.error(f"Weekly report error: {str(e)}")
-        return render(request, 'reports/weekly.html', {
-            'error': 'Unable to generate weekly report',
-            'has_data': False,
-            'week_days': ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'],
-            'daily_messages': [0, 0, 0, 0, 0, 0, 0],
-            'daily_sentiment': [0, 0, 0, 0, 0, 0, 0],
-            'risk_distribution': [0, 0, 0],
-        })
+        else:
+            risk_trend = ('decreasing' if avg_risk < last_week_risk
+                          else 'increasing' if avg_risk > last_week_risk else 'stable')
+
+        # Daily series for the charts, grouped in SQL
+        for day in (week_chats.annotate(day=TruncDate('timestamp')).order_by().values('day')
+                    .annotate(count=Count('id'), sentiment=Avg('sentiment_score'))):
+            index = (day['day'] - week_start).days
+            daily_messages[index] = day['count']
+            daily_sentiment[index] = round(day['sentiment'] or 0, 2)
+
+        risk_distribution = [round(totals[band] / total_chats * 100) for band in ('low', 'medium', 'high')]
+    else:
+        dominant_emotion = 'neutral'
+        risk_trend = 'stable'
+        risk_distribution = [0, 0, 0]
+
+    return JsonResponse({
+        'week_start': week_start.strftime('%Y-%m-%d'),
+        'week_end': week_end.strftime('%Y-%m-%d'),
+        'total_chats': total_chats,
+        'average_sentiment': round(avg_sentiment, 2),
+        'dominant_emotion': dominant_emotion,
+        'risk_trend': risk_trend,
+        'average_risk': round(avg_risk, 1),
+        'insights': generate_weekly_insights(week_chats, avg_sentiment, avg_risk),
+        'recommendations': generate_weekly_recommendations(avg_sentiment, avg_risk, total_chats),
+        'has_data': total_chats > 0,
+        'week_days': week_days,
+        'daily_messages': daily_messages,
+        'daily_sentiment': daily_sentiment,
+        'risk_distribution': risk_distribution,
+    })
+
+@login_required
+@use_read_replica
+def mood_trends(request):
+    """Chart data: sentiment, risk and emotion trend for ?range=week|month|year|all"""
+    range_name = request.GET.get('range', 'month')
+    if range_name not in RANGES:
+        return JsonResponse({'error': f"'range' must be one of {', '.join(RANGES)}"}, status=400)
+    resolution, _ = RANGES[range_name]
+    return JsonResponse({
+        'range': range_name,
+        'resolution': dict(MoodPoint.RESOLUTION_CHOICES)[resolution],
+        'points': mood_series(request.user, range_name),
+    })
 
 def generate_weekly_insights(chats, avg_sentiment, avg_risk):
     """Generate insights based on real chat data"""
@@ -525,18 +705,18 @@ def analyze_message(request):
             return JsonResponse({'error': 'No message provided'}, status=400)
         
         # ML analysis
-        sentiment_score = analyze_sentiment_simple(message)
-        emotions = analyze_emotions_simple(message)
-        risk_data = assess_risk_simple(message)
+        analysis = analyze_text(message)
+        emotions = analysis['emotions']
         
         response_data = {
             'analysis': {
                 'emotions': emotions,
                 'dominant_emotion': max(emotions.items(), key=lambda x: x[1])[0],
-                'sentiment_score': sentiment_score
+                'sentiment_score': analysis['sentiment_score'],
+                'tier': TIER_NAMES[analysis['tier']]
             },
-            'risk_assessment': risk_data,
-            'recommendations': get_simple_recommendations(risk_data['risk_level']),
+            'risk_assessment': {'risk_level': analysis['risk_level'], 'risk_category': analysis['risk_category']},
+            'recommendations': get_simple_recommendations(analysis['risk_level']),
             'ml_available': True
         }
         
@@ -546,16 +726,20 @@ def analyze_message(request):
         logger.error(f"Message analysis error: {str(e)}")
         return JsonResponse({'error': 'Analysis failed'}, status=500)
 
+@require_GET
+@staff_member_required
+def admission_metrics(request):
+    """Rate limit and analysis admission counters of the worker process serving the request"""
+    return JsonResponse(admission_stats())
+
 # ML Helper Functions
 def analyze_sentiment_simple(text):
     """Enhanced sentiment analysis using keyword matching"""
     text_lower = text.lower()
+    lexicons = keyword_lexicons.get()
     
-    positive_words = ['good', 'great', 'happy', 'joy', 'love', 'nice', 'well', 'better', 'amazing', 'wonderful', 'excited', 'proud', 'grateful', 'thankful', 'calm', 'peaceful']
-    negative_words = ['bad', 'sad', 'angry', 'hate', 'terrible', 'awful', 'worst', 'depressed', 'anxious', 'stressed', 'overwhelmed', 'lonely', 'scared', 'fear', 'panic', 'hopeless']
-    
-    positive_count = sum(1 for word in positive_words if word in text_lower)
-    negative_count = sum(1 for word in negative_words if word in text_lower)
+    positive_count = sum(1 for word in lexicons['positive'] if word in text_lower)
+    negative_count = sum(1 for word in lexicons['negative'] if word in text_lower)
     
     total = positive_count + negative_count
     if total == 0:
@@ -567,45 +751,16 @@ def analyze_sentiment_simple(text):
 def analyze_emotions_simple(text):
     """Enhanced emotion analysis using keyword matching"""
     text_lower = text.lower()
+    lexicons = keyword_lexicons.get()
     
-    emotions = {
-        'joy': 0.0,
-        'sadness': 0.0, 
-        'anger': 0.0,
-        'fear': 0.0,
-        'calm': 0.0,
-        'neutral': 0.3  # Base neutral level
-    }
-    
-    # Joy indicators
-    joy_words = ['happy', 'joy', 'excited', 'good', 'great', 'love', 'wonderful', 'amazing', 'proud', 'grateful']
-    if any(word in text_lower for word in joy_words):
-        emotions['joy'] = 0.8
-        emotions['neutral'] = 0.1
-    
-    # Sadness indicators
-    sadness_words = ['sad', 'depressed', 'unhappy', 'cry', 'tears', 'hopeless', 'empty', 'alone']
-    if any(word in text_lower for word in sadness_words):
-        emotions['sadness'] = 0.7
-        emotions['neutral'] = 0.2
-    
-    # Anger indicators  
-    anger_words = ['angry', 'mad', 'hate', 'furious', 'annoyed', 'frustrated', 'rage']
-    if any(word in text_lower for word in anger_words):
-        emotions['anger'] = 0.6
-        emotions['neutral'] = 0.3
+    emotions = {name: 0.0 for name in EMOTIONS}
+    emotions['neutral'] = lexicons['base_neutral']
     
-    # Fear indicators
-    fear_words = ['scared', 'afraid', 'fear', 'anxious', 'worried', 'nervous', 'panic', 'terrified']
-    if any(word in text_lower for word in fear_words):
-        emotions['fear'] = 0.6
-        emotions['neutral'] = 0.3
-    
-    # Calm indicators
-    calm_words = ['calm', 'peaceful', 'relaxed', 'serene', 'content', 'okay', 'fine']
-    if any(word in text_lower for word in calm_words):
-        emotions['calm'] = 0.7
-        emotions['neutral'] = 0.2
+    # Each matching emotion sets its score; the last match sets the neutral level
+    for emotion, words, score, neutral in lexicons['emotions']:
+        if any(word in text_lower for word in words):
+            emotions[emotion] = score
+            emotions['neutral'] = neutral
     
     # Normalize to sum to 1.0
     total = sum(emotions.values())
@@ -618,15 +773,10 @@ def assess_risk_simple(text):
     """Enhanced risk assessment"""
     text_lower = text.lower()
     
-    high_risk_words = ['suicide', 'kill myself', 'want to die', 'end it all', 'harm myself', 'better off dead']
-    medium_risk_words = ['depressed', 'hopeless', 'cant cope', 'overwhelmed', 'cant take it', 'giving up']
-    low_risk_words = ['sad', 'anxious', 'stressed', 'worried', 'nervous', 'upset']
-    
-    high_count = sum(1 for word in high_risk_words if word in text_lower)
-    medium_count = sum(1 for word in medium_risk_words if word in text_lower) 
-    low_count = sum(1 for word in low_risk_words if word in text_lower)
-    
-    risk_level = high_count * 8 + medium_count * 4 + low_count * 2
+    risk_level = sum(
+        weight * sum(1 for word in words if word in text_lower)
+        for words, weight in keyword_lexicons.get()['risk']
+    )
     risk_level = min(10, max(0, risk_level))
     
     if risk_level >= 7:
@@ -640,44 +790,8 @@ def assess_risk_simple(text):
 
 def get_simple_recommendations(risk_level):
     """Get recommendations based on risk level"""
-    recommendations = [
-        {
-            'id': 1,
-            'title': 'Deep Breathing',
-            'description': 'Take 5 deep breaths to calm your mind',
-            'type': 'anxiety',
-            'duration': 2,
-            'icon': '🌬️'
-        },
-        {
-            'id': 2, 
-            'title': 'Positive Reflection',
-            'description': 'Recall one positive thing from today',
-            'type': 'depression',
-            'duration': 1,
-            'icon': '💭'
-        }
+    return [
+        {key: value for key, value in item.items() if key != 'min_risk'}
+        for item in recommendations.get()['quick_recommendations']
+        if risk_level >= item.get('min_risk', 0)
     ]
-    
-    if risk_level >= 7:
-        recommendations.append({
-            'id': 3,
-            'title': 'Emergency Support',
-            'description': 'Contact crisis helpline for immediate help',
-            'type': 'emergency', 
-            'duration': 0,
-            'icon': '🚨',
-            'emergency': True
-        })
-    
-    if risk_level >= 4:
-        recommendations.append({
-            'id': 4,
-            'title': 'Grounding Exercise',
-            'description': 'Name 5 things you can see, 4 you can touch, 3 you can hear',
-            'type': 'anxiety',
-            'duration': 3,
-            'icon': '🎯'
-        })
-    
-    return recommendations
\ No newline at end of file
@@ -0,0 +1,191 @@
+"""
+Write-behind batching of ChatMessage inserts (opt-in, ``CHAT_WRITE_BEHIND``).
+
+With it enabled, ``write_chat_message`` hands the unsaved message to a
+per-process flusher thread instead of running its own INSERT and commit. The
+flusher collects messages until ``CHAT_WRITE_BEHIND_BATCH`` are waiting or
+``CHAT_WRITE_BEHIND_MS`` have passed since the first one, and writes them in
+one transaction: one locking read, insert and update for their sessions, one
+``bulk_create`` of the messages, one changed-at stamp for their users and,
+after the commit, one insert of their mood points. Under burst load thousands
+of tiny commits become a few batched ones.
+
+``write_chat_message`` returns a ``concurrent.futures.Future`` that resolves
+to the saved message (with its primary key) once its batch is committed;
+callers that need the id wait on it, others attach callbacks or ignore it.
+If a batch fails, it is retried as two halves, recursively, so a single bad
+row cannot lose the others and the good rows are still written in batches.
+Only a message that fails on its own is retried with a plain ``save()``.
+
+Messages are written synchronously, bypassing the buffer, when:
+
+- they are high risk (``risk_level`` 7 or more), so they are durable before
+  the user sees the reply;
+- write-behind is off;
+- the database cannot return primary keys from a bulk insert.
+
+The buffer is flushed at interpreter exit (graceful worker shutdown). A
+worker killed with SIGKILL loses at most the messages of the batch being
+collected.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from .conditional import mark_chat_changed
+from .conversations import assign_sessions
+from .models import ChatMessage
+from .timeseries import record_messages
+
+logger = logging.getLogger(__name__)
+
+HIGH_RISK_LEVEL = 7
+
+_STOP = object()
+
+
+class WriteBehindBuffer:
+    def __init__(self, batch_size, delay_ms, using='default'):
+        self.batch_size = batch_size
+        self.delay = delay_ms / 1000
+        self.using = using
+        self.flushes = 0
+        self.rows = 0
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        atexit.register(self.close)
+
+    def submit(self, message):
+        """Queue an unsaved message; returns a Future resolving to the saved message"""
+        future = Future()
+        if self._closed:
+            return _write_now(message, future)
+        self._ensure_thread()
+        self._queue.put((message, future))
+        return future
+
+    def _ensure_thread(self):
+        # Started lazily and per process, so servers that fork after import work
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='chat-write-behind', daemon=True)
+            self._thread.start()
+
+    def close(self, timeout=10):
+        """Flush everything queued and stop the flusher thread"""
+        self._closed = True
+        thread = self._thread
+        if thread is None or self._pid != os.getpid() or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def _run(self):
+        try:
+            stop = False
+            while not stop:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.delay
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+                self._flush(batch)
+        finally:
+            connections.close_all()
+
+    def _flush(self, batch):
+        messages = [message for message, _ in batch]
+        for message in messages:
+            message.sync_emotion_columns()
+        try:
+            with transaction.atomic(using=self.using):
+                assign_sessions(messages)
+                ChatMessage.objects.using(self.using).bulk_create(messages)
+                mark_chat_changed({message.user_id for message in messages}, using=self.using)
+        except Exception as e:
+            for message in messages:
+                message.pk = None
+                message.session = None  # its session update was rolled back too
+                message._state.adding = True
+            if len(batch) == 1:
+                logger.error(f"Batched insert of a chat message failed, writing it directly: {e}")
+                _write_now(*batch[0])
+                return
+            logger.error(f"Batched insert of {len(messages)} chat messages failed, retrying in halves: {e}")
+            middle = len(batch) // 2
+            self._flush(batch[:middle])
+            self._flush(batch[middle:])
+            return
+        self.flushes += 1
+        self.rows += len(messages)
+        record_messages(messages)
+        for message, future in batch:
+            future.set_result(message)
+
+
+def _write_now(message, future):
+    try:
+        message.save()
+    except Exception as e:
+        future.set_exception(e)
+    else:
+        future.set_result(message)
+    return future
+
+
+_buffer = None
+_unsupported = False
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """The process-wide buffer, or None when write-behind is off or unsupported"""
+    global _buffer, _unsupported
+    if not settings.CHAT_WRITE_BEHIND or _unsupported:
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None and not _unsupported:
+                if not connections['default'].features.can_return_rows_from_bulk_insert:
+                    logger.warning("Database cannot return ids from bulk inserts; chat write-behind disabled")
+                    _unsupported = True
+                    return None
+                _buffer = WriteBehindBuffer(settings.CHAT_WRITE_BEHIND_BATCH, settings.CHAT_WRITE_BEHIND_MS)
+    return _buffer
+
+
+def write_chat_message(message):
+    """Insert an unsaved ChatMessage through the buffer, or directly for
+    high-risk messages. Returns a Future resolving to the saved message."""
+    buffer = get_buffer()
+    if buffer is None or message.risk_level >= HIGH_RISK_LEVEL:
+        return _write_now(message, Future())
+    return buffer.submit(message)
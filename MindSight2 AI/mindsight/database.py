@@ -0,0 +1,68 @@
+"""
+Database configuration driven by environment variables.
+
+    DB_ENGINE                 postgresql (default) or sqlite
+    DB_NAME / DB_USER / DB_PASSWORD / DB_HOST / DB_PORT
+    DB_CONN_MAX_AGE           seconds to keep persistent connections (default 60)
+    DB_CONN_HEALTH_CHECKS     check persistent connections before reuse (default true)
+    DB_POOL                   use psycopg 3 connection pooling instead of persistent
+                              connections (default false, PostgreSQL only)
+    DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE / DB_POOL_TIMEOUT
+    DB_REPLICA_HOSTS          comma separated host[:port] list of read replicas
+
+Replicas are registered as ``replica_0``, ``replica_1``... and mirror
+``default`` under the test runner, so tests only ever need one database.
+"""
+import os
+
+
+def env_bool(name, default):
+    return os.getenv(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+def database_settings(base_dir):
+    engine = os.getenv('DB_ENGINE', 'postgresql').lower()
+
+    if engine == 'sqlite':
+        return {
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.getenv('DB_NAME', os.path.join(base_dir, 'db.sqlite3')),
+            }
+        }
+
+    default = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('DB_NAME', 'mindsight'),
+        'USER': os.getenv('DB_USER', 'postgres'),
+        'PASSWORD': os.getenv('DB_PASSWORD', ''),
+        'HOST': os.getenv('DB_HOST', 'localhost'),
+        'PORT': os.getenv('DB_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': env_bool('DB_CONN_HEALTH_CHECKS', True),
+        'OPTIONS': {},
+    }
+
+    if env_bool('DB_POOL', False):
+        # Django's pool replaces persistent connections and requires CONN_MAX_AGE = 0
+        default['CONN_MAX_AGE'] = 0
+        default['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        }
+
+    databases = {'default': default}
+
+    replica_hosts = [host.strip() for host in os.getenv('DB_REPLICA_HOSTS', '').split(',') if host.strip()]
+    for index, host in enumerate(replica_hosts):
+        host, _, port = host.partition(':')
+        databases[f'replica_{index}'] = {
+            **default,
+            'OPTIONS': dict(default['OPTIONS']),
+            'HOST': host,
+            'PORT': port or default['PORT'],
+            'TEST': {'MIRROR': 'default'},
+        }
+
+    return databases
@@ -6,6 +6,8 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 
+from .database import database_settings
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -33,12 +35,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.staticfiles.StaticAssetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.RateLimitMiddleware',
+    'core.middleware.TrafficCaptureMiddleware',
 ]
 
 ROOT_URLCONF = 'mindsight.urls'
@@ -61,17 +66,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'mindsight.wsgi.application'
 
-# Database
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'mindsight',
-        'USER': 'postgres',
-        'PASSWORD': 'Divyanjali@7',
-        'HOST': 'localhost',
-        'PORT': '5432',
-    }
-}
+# Database (configured from DB_* environment variables, see mindsight/database.py)
+DATABASES = database_settings(BASE_DIR)
+DATABASE_ROUTERS = ['core.routers.ReadReplicaRouter']
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -104,11 +101,70 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# collectstatic minifies, fingerprints and precompresses assets (see core/staticfiles.py);
+# STATIC_SERVE lets Django serve them when no front-end server does
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'core.staticfiles.CompressedManifestStorage'},
+}
+STATIC_SERVE = os.getenv('STATIC_SERVE', 'True').lower() == 'true'
 
 # Media files (User uploaded files)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Chat message archive tier (monthly NDJSON-gz files for data older than the hot window)
+CHAT_ARCHIVE_DIR = os.getenv('CHAT_ARCHIVE_DIR', os.path.join(BASE_DIR, 'archive'))
+CHAT_HOT_MONTHS = int(os.getenv('CHAT_HOT_MONTHS', '12'))
+CHAT_PARTITION_MONTHS_AHEAD = int(os.getenv('CHAT_PARTITION_MONTHS_AHEAD', '3'))
+
+# Hot-reloadable ML data artifacts (keyword lists, weights, response tables)
+ML_ARTIFACT_DIR = os.getenv('ML_ARTIFACT_DIR', os.path.join(BASE_DIR, 'core', 'ml', 'data'))
+ML_ARTIFACT_CHECK_SECONDS = float(os.getenv('ML_ARTIFACT_CHECK_SECONDS', '5'))
+
+# Opt-in capture of anonymized chat traffic for replay_traffic (see core/traffic.py)
+TRAFFIC_CAPTURE_PATH = os.getenv('TRAFFIC_CAPTURE_PATH', '')
+TRAFFIC_CAPTURE_TEXT = os.getenv('TRAFFIC_CAPTURE_TEXT', 'synthetic')
+TRAFFIC_CAPTURE_SAMPLE_RATE = float(os.getenv('TRAFFIC_CAPTURE_SAMPLE_RATE', '1.0'))
+
+# Tiered chat analysis: deadline for the richer tiers, their thread pool, and the
+# 1-minute load average per CPU above which only the keyword tier runs (see core/analysis.py)
+ANALYSIS_BUDGET_MS = float(os.getenv('ANALYSIS_BUDGET_MS', '150'))
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', '4'))
+ANALYSIS_MAX_LOAD = float(os.getenv('ANALYSIS_MAX_LOAD', '0.9'))
+# Admission control for the analysis endpoints (see core/ratelimit.py): token buckets per
+# user and per client IP, and a per-process cap on the richer analysis tiers running at once
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+RATE_LIMIT_USER_PER_MINUTE = float(os.getenv('RATE_LIMIT_USER_PER_MINUTE', '30'))
+RATE_LIMIT_USER_BURST = int(os.getenv('RATE_LIMIT_USER_BURST', '10'))
+RATE_LIMIT_IP_PER_MINUTE = float(os.getenv('RATE_LIMIT_IP_PER_MINUTE', '120'))
+RATE_LIMIT_IP_BURST = int(os.getenv('RATE_LIMIT_IP_BURST', '40'))
+RATE_LIMIT_STORE = os.getenv('RATE_LIMIT_STORE', 'core.ratelimit.LocalBucketStore')
+RATE_LIMIT_CACHE = os.getenv('RATE_LIMIT_CACHE', 'default')
+# Number of trusted reverse proxies appending to X-Forwarded-For; 0 uses REMOTE_ADDR
+RATE_LIMIT_PROXY_COUNT = int(os.getenv('RATE_LIMIT_PROXY_COUNT', '0'))
+ANALYSIS_MAX_CONCURRENT = int(os.getenv('ANALYSIS_MAX_CONCURRENT', '16'))
+ANALYSIS_ADMISSION_WAIT_MS = float(os.getenv('ANALYSIS_ADMISSION_WAIT_MS', '50'))
+# Messages longer than this are analyzed incrementally (see core/chunked_analysis.py)
+ANALYSIS_CHUNKED_CHARS = int(os.getenv('ANALYSIS_CHUNKED_CHARS', '8000'))
+
+# Minimum cosine similarity for ChatbotInterface to use a matched intent (see core/ml/retrieval.py)
+INTENT_MIN_SCORE = float(os.getenv('INTENT_MIN_SCORE', '0.3'))
+
+# Background job queue (see core/jobs.py and manage.py runworker)
+JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', '1'))
+JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', '900'))
+JOB_RETRY_BASE_SECONDS = float(os.getenv('JOB_RETRY_BASE_SECONDS', '15'))
+JOB_RETRY_MAX_SECONDS = float(os.getenv('JOB_RETRY_MAX_SECONDS', '3600'))
+
+# Chat messages more than this many minutes apart start a new conversation session
+CONVERSATION_GAP_MINUTES = float(os.getenv('CONVERSATION_GAP_MINUTES', '30'))
+
+# Write-behind batching of chat message inserts (see core/write_behind.py); off by default
+CHAT_WRITE_BEHIND = os.getenv('CHAT_WRITE_BEHIND', 'False').lower() == 'true'
+CHAT_WRITE_BEHIND_BATCH = int(os.getenv('CHAT_WRITE_BEHIND_BATCH', '200'))
+CHAT_WRITE_BEHIND_MS = float(os.getenv('CHAT_WRITE_BEHIND_MS', '5'))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -0,0 +1,284 @@
+// Chat page (templates/chat/chat.html). Server values come from data attributes on #chat-form.
+const chatForm = document.getElementById('chat-form');
+
+// ML Analysis Functions
+async function analyzeMessageWithML(message) {
+    try {
+        const response = await fetch('/api/analyze/', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCsrfToken(),
+            },
+            body: JSON.stringify({
+                message: message,
+                user_id: chatForm.dataset.userId
+            })
+        });
+        
+        const result = await response.json();
+        
+        if (result.ml_available !== false) {
+            displayMLResults(result);
+            updateRiskIndicator(result.risk_assessment);
+            showRecommendations(result.recommendations);
+            handleEmergencyResources(result.emergency_resources);
+        }
+        
+        return result;
+    } catch (error) {
+        console.error('ML Analysis failed:', error);
+        return null;
+    }
+}
+
+function displayMLResults(result) {
+    // Show ML header
+    document.getElementById('ml-header').style.display = 'block';
+    
+    // Update dominant emotion
+    const dominantEmotion = document.querySelector('.dominant-emotion');
+    dominantEmotion.textContent = result.analysis.dominant_emotion.charAt(0).toUpperCase() + 
+                                 result.analysis.dominant_emotion.slice(1);
+    
+    // Update emotion visualization
+    const emotionBar = document.getElementById('emotion-visualization');
+    emotionBar.innerHTML = '';
+    
+    Object.entries(result.analysis.emotions).forEach(([emotion, score]) => {
+        const emotionItem = document.createElement('div');
+        emotionItem.className = 'emotion-item';
+        emotionItem.style.width = `${score * 100}%`;
+        emotionItem.style.background = getEmotionColor(emotion);
+        emotionItem.setAttribute('data-emotion', `${emotion}: ${Math.round(score * 100)}%`);
+        emotionBar.appendChild(emotionItem);
+    });
+}
+
+function getEmotionColor(emotion) {
+    const colors = {
+        joy: 'linear-gradient(90deg, #FFD700, #FFEC8B)',
+        sadness: 'linear-gradient(90deg, #4682B4, #87CEEB)',
+        anger: 'linear-gradient(90deg, #FF6347, #FF7F50)',
+        fear: 'linear-gradient(90deg, #9370DB, #BA55D3)',
+        surprise: 'linear-gradient(90deg, #32CD32, #00FA9A)',
+        neutral: 'linear-gradient(90deg, #B0C4DE, #D3D3D3)',
+        optimism: 'linear-gradient(90deg, #FFA500, #FFD700)',
+        curiosity: 'linear-gradient(90deg, #20B2AA, #40E0D0)',
+        calm: 'linear-gradient(90deg, #1E90FF, #87CEFA)'
+    };
+    return colors[emotion] || 'linear-gradient(90deg, #778899, #B0C4DE)';
+}
+
+function updateRiskIndicator(riskData) {
+    const riskElement = document.getElementById('risk-assessment');
+    const riskText = document.getElementById('risk-text');
+    
+    riskElement.className = 'risk-indicator';
+    
+    if (riskData.risk_category === 'high') {
+        riskElement.classList.add('risk-high');
+        riskText.innerHTML = `<i class="fas fa-exclamation-triangle me-2"></i>High Risk - Please Seek Help`;
+    } else if (riskData.risk_category === 'medium') {
+        riskElement.classList.add('risk-medium');
+        riskText.innerHTML = `<i class="fas fa-info-circle me-2"></i>Medium Risk - Monitor Closely`;
+    } else {
+        riskElement.classList.add('risk-low');
+        riskText.innerHTML = `<i class="fas fa-check-circle me-2"></i>Low Risk - You're Doing Well`;
+    }
+}
+
+function showRecommendations(recommendations) {
+    const recommendationsPanel = document.getElementById('recommendations-panel');
+    
+    if (recommendations && recommendations.length > 0) {
+        recommendationsPanel.innerHTML = '<h6 class="text-light mb-3">Recommended Exercises</h6>';
+        
+        recommendations.forEach(rec => {
+            const recCard = document.createElement('div');
+            recCard.className = 'recommendation-card';
+            recCard.innerHTML = `
+                <div class="d-flex align-items-start">
+                    <div class="me-3" style="font-size: 1.2rem;">${rec.icon || '💡'}</div>
+                    <div class="flex-grow-1">
+                        <h6 class="text-light mb-1">${rec.title}</h6>
+                        <p class="text-muted small mb-2">${rec.description}</p>
+                        <div class="d-flex justify-content-between align-items-center">
+                            <small class="text-info">${rec.duration} min</small>
+                            <small class="text-warning">${rec.difficulty || 'Beginner'}</small>
+                        </div>
+                    </div>
+                </div>
+            `;
+            recommendationsPanel.appendChild(recCard);
+        });
+    }
+}
+
+function handleEmergencyResources(emergencyData) {
+    const emergencyPanel = document.getElementById('emergency-resources');
+    const emergencyContacts = document.getElementById('emergency-contacts');
+    
+    if (emergencyData) {
+        emergencyPanel.style.display = 'block';
+        emergencyContacts.innerHTML = '';
+        
+        if (emergencyData.emergency) {
+            emergencyContacts.innerHTML = `
+                <p class="small mb-3">${emergencyData.message}</p>
+                ${emergencyData.resources.map(resource => `
+                    <div class="mb-2 p-2 bg-dark rounded">
+                        <strong class="text-warning">${resource.name}</strong><br>
+                        <span class="text-light">${resource.number}</span>
+                    </div>
+                `).join('')}
+            `;
+        }
+    } else {
+        emergencyPanel.style.display = 'none';
+    }
+}
+
+// Enhanced Chat Form Handler
+chatForm.addEventListener('submit', async function(e) {
+    e.preventDefault();
+    const input = document.getElementById('chat-input');
+    const sendBtn = document.getElementById('send-btn');
+    const chatWindow = document.getElementById('chat-window');
+    const text = input.value.trim();
+    
+    if(!text) return;
+    
+    // Add user message to UI
+    const userDiv = document.createElement('div');
+    userDiv.className = 'text-end mb-2';
+    userDiv.innerHTML = `<div class="chat-message-user">${text}</div>`;
+    chatWindow.appendChild(userDiv);
+    input.value = '';
+    chatWindow.scrollTop = chatWindow.scrollHeight;
+
+    // Show typing indicator
+    const typingDiv = document.createElement('div');
+    typingDiv.className = 'text-start mb-2';
+    typingDiv.innerHTML = `
+        <div class="typing-indicator">
+            <div class="typing-dot"></div>
+            <div class="typing-dot"></div>
+            <div class="typing-dot"></div>
+        </div>
+    `;
+    chatWindow.appendChild(typingDiv);
+    chatWindow.scrollTop = chatWindow.scrollHeight;
+
+    // Disable UI
+    sendBtn.disabled = true;
+    sendBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i>';
+    input.disabled = true;
+    
+    try {
+        // Stream the reply first, then the analysis and recommendations
+        const response = await fetch(chatForm.dataset.streamUrl, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/x-www-form-urlencoded',
+                'Accept': 'text/event-stream',
+                'X-Requested-With': 'XMLHttpRequest',
+                'X-CSRFToken': getCsrfToken()
+            },
+            body: `message=${encodeURIComponent(text)}`
+        });
+
+        const isStream = (response.headers.get('Content-Type') || '').startsWith('text/event-stream');
+        if (!response.ok || !isStream) {
+            const data = await response.json().catch(() => ({}));
+            throw new Error(data.error || 'An error occurred. Please try again.');
+        }
+
+        await readEventStream(response, {
+            reply(data) {
+                // Remove typing indicator
+                typingDiv.remove();
+                
+                // Add bot response to UI
+                const botDiv = document.createElement('div');
+                botDiv.className = 'text-start mb-2';
+                botDiv.innerHTML = `<div class="chat-message-bot">${data.response}</div>`;
+                chatWindow.appendChild(botDiv);
+                chatWindow.scrollTop = chatWindow.scrollHeight;
+            },
+            analysis(data) {
+                displayMLResults(data);
+                updateRiskIndicator(data.risk_assessment);
+            },
+            recommendations(data) {
+                showRecommendations(data.recommendations);
+            },
+            error(data) {
+                throw new Error(data.error || 'An error occurred. Please try again.');
+            }
+        });
+        typingDiv.remove();
+    } catch(err) {
+        console.error('Error:', err);
+        // Remove typing indicator
+        typingDiv.remove();
+        
+        // Show error message
+        const errorDiv = document.createElement('div');
+        errorDiv.className = 'text-center mb-2';
+        errorDiv.innerHTML = `<div class="chat-message-bot text-danger">${err.message || 'Network error. Please check your connection and try again.'}</div>`;
+        chatWindow.appendChild(errorDiv);
+    } finally {
+        // Reset UI state
+        sendBtn.disabled = false;
+        sendBtn.innerHTML = '<i class="fas fa-paper-plane"></i>';
+        input.disabled = false;
+        input.focus();
+        chatWindow.scrollTop = chatWindow.scrollHeight;
+    }
+});
+
+// Read a text/event-stream response body and dispatch each event to its handler
+async function readEventStream(response, handlers) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            const dataLines = [];
+            frame.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+            });
+            if (dataLines.length && handlers[event]) {
+                handlers[event](JSON.parse(dataLines.join('\n')));
+            }
+        }
+    }
+}
+
+// CSRF Token Helper
+function getCsrfToken() {
+    return document.querySelector('[name=csrfmiddlewaretoken]').value;
+}
+
+// Auto-scroll to bottom
+function scrollToBottom() {
+    const chatWindow = document.getElementById('chat-window');
+    chatWindow.scrollTop = chatWindow.scrollHeight;
+}
+
+// Initialize
+document.addEventListener('DOMContentLoaded', function() {
+    scrollToBottom();
+});
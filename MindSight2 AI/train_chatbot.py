@@ -7,6 +7,7 @@ import nltk
 from nltk.stem import WordNetLemmatizer
 import pickle
 import random
+from core.ml.mlp_runtime import MLPIntentModel, check_parity, export_keras_mlp
 
 # Download required NLTK data
 nltk.download('punkt')
@@ -85,4 +86,10 @@ model_data = {
 }
 
 pickle.dump(model_data, open('chatbot_model.pkl', 'wb'))
-print("Model created and saved successfully!")
\ No newline at end of file
+print("Model created and saved successfully!")
+
+# Export weights for the NumPy runtime (serving without TensorFlow) and check parity
+export_keras_mlp(model, words, classes, 'chatbot_mlp.npz')
+runtime = MLPIntentModel.load('chatbot_mlp.npz')
+max_diff = check_parity(model, runtime, np.array(train_x))
+print(f"NumPy runtime exported to chatbot_mlp.npz (max abs diff vs Keras: {max_diff:.2e})")
\ No newline at end of file